@@ -0,0 +1,189 @@
+"""
+Benchmarks the filter engines on seeded synthetic ID sets and writes the
+results as JSON, so runs of different versions can be diffed.
+
+Every case (message count x layout x ID width) is run through each engine
+and max_filters value, recording wall time, the engine's CalcStats
+(collision evaluations, merges, per-phase time), sets used and
+collisions. Small random cases are also solved by brute force to show how
+far each engine is from the fewest possible collisions.
+
+Example:
+    python benchmarks/bench_engines.py --output bench.json
+    python benchmarks/bench_engines.py --quick
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import synthetic
+
+from filter_calculator import ENGINES, EXT_ID_BITS, CalcStats, STD_ID_BITS, calculate_mask_filter, make_id_index, run_engine
+
+SIZES = (50, 200, 500, 1000, 2000)
+QUICK_SIZES = (50, 200)
+MAX_FILTERS = (4, 16)
+# The pairwise greedy engine is cubic in the selection size
+GREEDY_MAX_SELECTED = 100
+REFERENCE_CASES = 20
+REFERENCE_SELECTED = 7
+REFERENCE_UNSELECTED = 30
+REFERENCE_MAX_FILTERS = (1, 2, 3)
+
+
+def run_case(engine, selected, unselected, max_filters, bits, exact_budget):
+    stats = CalcStats()
+    start = time.perf_counter()
+    results, collisions, gap = run_engine(engine, selected, unselected, max_filters, bits, exact_budget, stats=stats)
+    seconds = time.perf_counter() - start
+    return {
+        "engine": engine,
+        "max_filters": max_filters,
+        "seconds": round(seconds, 6),
+        "evaluations": stats.counters.get("collision_checks", 0),
+        "counters": stats.counters,
+        "phases_s": {phase: round(t, 6) for phase, t in stats.phases.items()},
+        "filters": len(results),
+        "collisions": len(collisions),
+        "optimality_gap": gap,
+    }
+
+
+def single_pair(selected, unselected, bits):
+    """calculate_mask_filter over the whole selection: one set, timed."""
+    start = time.perf_counter()
+    mask, filter_val = calculate_mask_filter(selected, bits)
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": round(seconds, 6),
+        "mask_bits": bin(mask).count("1"),
+        "collisions": make_id_index(unselected, bits).count(mask, filter_val),
+    }
+
+
+def _partitions(items, max_blocks):
+    """Every partition of `items` into at most `max_blocks` blocks."""
+    if not items:
+        yield []
+        return
+    first, rest = items[0], items[1:]
+    for partition in _partitions(rest, max_blocks):
+        for i in range(len(partition)):
+            yield partition[:i] + [[first] + partition[i]] + partition[i + 1:]
+        if len(partition) < max_blocks:
+            yield [[first]] + partition
+
+
+def brute_force_collisions(selected, unselected, max_filters, bits):
+    """Fewest unselected IDs any `max_filters` mask/filter pairs covering `selected` accept."""
+    index = make_id_index(unselected, bits)
+    best = None
+    for partition in _partitions(list(selected), max_filters):
+        # The tightest pair of a block is contained in every pair covering it
+        accepted = 0
+        for block in partition:
+            accepted |= index.match_set(*calculate_mask_filter(block, bits))
+        count = index.count_set(accepted)
+        if best is None or count < best:
+            best = count
+            if best == 0:
+                break
+    return best
+
+
+def reference_quality(engines, seed, exact_budget):
+    """Excess collisions of every engine over the brute-force optimum on small cases."""
+    rng = random.Random(f"{seed}-reference")
+    quality = {engine: {"cases": 0, "optimal": 0, "excess_collisions": 0} for engine in engines}
+    for case in range(REFERENCE_CASES):
+        bits = STD_ID_BITS if case % 2 == 0 else EXT_ID_BITS
+        layout = synthetic.LAYOUTS[(case // 2) % len(synthetic.LAYOUTS)]
+        ids = synthetic.generate_ids(REFERENCE_SELECTED + REFERENCE_UNSELECTED, bits, layout, rng)
+        selected, unselected = synthetic.split_selection(ids, layout, rng, REFERENCE_SELECTED / len(ids))
+        for max_filters in REFERENCE_MAX_FILTERS:
+            best = brute_force_collisions(selected, unselected, max_filters, bits)
+            for engine in engines:
+                _, collisions, _ = run_engine(engine, selected, unselected, max_filters, bits, exact_budget)
+                entry = quality[engine]
+                entry["cases"] += 1
+                entry["optimal"] += len(collisions) == best
+                entry["excess_collisions"] += len(collisions) - best
+    return quality
+
+
+def run_benchmarks(sizes, engines, max_filters_values, seed, exact_budget, log=None):
+    cases = []
+    for bits in (STD_ID_BITS, EXT_ID_BITS):
+        for layout in synthetic.LAYOUTS:
+            for count in sizes:
+                selected, unselected = synthetic.generate_case(count, bits, layout, seed)
+                case = {
+                    "messages": count,
+                    "bits": bits,
+                    "layout": layout,
+                    "selected": len(selected),
+                    "single_pair": single_pair(selected, unselected, bits),
+                    "runs": [],
+                }
+                for engine in engines:
+                    if engine == "greedy" and len(selected) > GREEDY_MAX_SELECTED:
+                        continue
+                    for max_filters in max_filters_values:
+                        run = run_case(engine, selected, unselected, max_filters, bits, exact_budget)
+                        case["runs"].append(run)
+                        if log is not None:
+                            log(f"{bits:2d}-bit {layout:9s} {count:5d} msgs  {engine:11s} max {max_filters:2d}: "
+                                f"{run['seconds']:8.3f} s  {run['evaluations']:9d} evals  "
+                                f"{run['filters']:3d} sets  {run['collisions']:5d} collisions")
+                cases.append(case)
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mask/filter engines on synthetic ID sets.")
+    parser.add_argument("--sizes", type=int, nargs="+", help=f"Message counts (default {' '.join(map(str, SIZES))})")
+    parser.add_argument("--quick", action="store_true", help=f"Only {' and '.join(map(str, QUICK_SIZES))} messages")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--max-filters", type=int, nargs="+", default=list(MAX_FILTERS))
+    parser.add_argument("--exact-budget", type=float, default=1.0, help="Seconds for the exact engine per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-reference", action="store_true", help="Skip the brute-force quality comparison")
+    parser.add_argument("--write-dbc", metavar="DIR", help="Also write the synthetic buses as DBC files into DIR")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    log = lambda line: print(line, file=sys.stderr)
+
+    output = {
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "exact_budget": args.exact_budget,
+        "cases": run_benchmarks(sizes, args.engines, args.max_filters, args.seed, args.exact_budget, log),
+    }
+    if not args.no_reference:
+        output["reference"] = reference_quality(args.engines, args.seed, args.exact_budget)
+
+    if args.write_dbc:
+        os.makedirs(args.write_dbc, exist_ok=True)
+        for bits in (STD_ID_BITS, EXT_ID_BITS):
+            for layout in synthetic.LAYOUTS:
+                for count in sizes:
+                    messages = synthetic.generate_messages(count, bits, layout, args.seed)
+                    synthetic.write_dbc(os.path.join(args.write_dbc, f"synthetic_{bits}bit_{layout}_{count}.dbc"), messages)
+
+    text = json.dumps(output, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Seeded synthetic CAN ID sets and DBC files for the benchmarks.
+
+Layouts:
+    clustered  IDs come in blocks of nearby values, as when every node
+               owns a range of IDs; selections take whole blocks
+    scattered  IDs are spread uniformly over the ID space; selections
+               are a random sample
+
+The same (count, bits, layout, seed) always gives the same IDs.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from dbc_model import MessageInfo
+
+LAYOUTS = ("clustered", "scattered")
+SELECTED_FRACTION = 0.2
+# Blocks a clustered ID set is split into for selecting
+SELECTION_BLOCKS = 20
+CYCLE_TIMES = (10, 20, 50, 100, 200, 1000, 0)
+LENGTHS = (1, 2, 4, 8)
+
+
+def generate_ids(count, bits, layout, rng):
+    """`count` distinct IDs below 2**bits, sorted."""
+    space = 1 << bits
+    if count > space:
+        raise ValueError(f"{count} IDs do not fit in {bits} bits")
+    if layout == "scattered":
+        return sorted(rng.sample(range(space), count))
+    if layout != "clustered":
+        raise ValueError(f"Unknown layout: {layout}")
+
+    ids = set()
+    while len(ids) < count:
+        width = rng.choice((8, 16, 32, 64))
+        base = rng.randrange(space) & ~(width - 1)
+        for offset in range(width):
+            if len(ids) < count and rng.random() < 0.8:
+                ids.add((base + offset) % space)
+    return sorted(ids)
+
+
+def split_selection(ids, layout, rng, fraction=SELECTED_FRACTION):
+    """
+    (selected, unselected) lists of `ids`. Clustered sets select whole
+    blocks of neighbouring IDs, scattered sets a random sample.
+    """
+    wanted = max(1, int(len(ids) * fraction))
+    if layout == "scattered":
+        selected = set(rng.sample(ids, wanted))
+    else:
+        size = max(1, len(ids) // SELECTION_BLOCKS)
+        blocks = [ids[i:i + size] for i in range(0, len(ids), size)]
+        rng.shuffle(blocks)
+        selected = set()
+        for block in blocks:
+            if len(selected) >= wanted:
+                break
+            selected.update(block[:wanted - len(selected)])
+    return sorted(selected), [can_id for can_id in ids if can_id not in selected]
+
+
+def generate_case(count, bits, layout, seed, fraction=SELECTED_FRACTION):
+    """(selected, unselected) ID lists of one benchmark case."""
+    rng = random.Random(f"{seed}-{count}-{bits}-{layout}")
+    ids = generate_ids(count, bits, layout, rng)
+    return split_selection(ids, layout, rng, fraction)
+
+
+def generate_messages(count, bits, layout, seed, nodes=8):
+    """
+    MessageInfo list of a synthetic bus; neighbouring IDs share a sender
+    node and every message has one to three other nodes as receivers.
+    """
+    rng = random.Random(f"{seed}-{count}-{bits}-{layout}-messages")
+    receiver_rng = random.Random(f"{seed}-{count}-{bits}-{layout}-receivers")
+    ids = generate_ids(count, bits, layout, rng)
+    node_names = [f"NODE_{n}" for n in range(nodes)]
+    per_node = max(1, -(-count // nodes))
+    messages = []
+    for i, can_id in enumerate(ids):
+        sender = node_names[min(i // per_node, nodes - 1)]
+        others = [node for node in node_names if node != sender]
+        receivers = sorted(receiver_rng.sample(others, min(len(others), receiver_rng.randint(1, 3))))
+        messages.append(MessageInfo(can_id, f"MSG_{i}", rng.choice(LENGTHS), [sender], rng.choice(CYCLE_TIMES), bits > 11,
+                                    receivers=receivers))
+    return messages
+
+
+def dbc_text(messages):
+    """DBC file text for a MessageInfo list, with signal receivers and GenMsgCycleTime attributes."""
+    nodes = sorted({node for msg in messages for node in msg.senders + msg.receivers})
+    lines = [
+        'VERSION ""',
+        "",
+        "NS_ :",
+        "",
+        "BS_:",
+        "",
+        "BU_: " + " ".join(nodes),
+        "",
+    ]
+    for msg in messages:
+        dbc_id = msg.frame_id | 0x80000000 if msg.is_extended_frame else msg.frame_id
+        lines.append(f"BO_ {dbc_id} {msg.name}: {msg.length} {msg.senders[0] if msg.senders else 'Vector__XXX'}")
+        lines.append(f' SG_ {msg.name}_SIG : 0|{8 * msg.length}@1+ (1,0) [0|0] "" {",".join(msg.receivers) or "Vector__XXX"}')
+        lines.append("")
+    lines.append('BA_DEF_ BO_  "GenMsgCycleTime" INT 0 65535;')
+    lines.append('BA_DEF_DEF_  "GenMsgCycleTime" 0;')
+    for msg in messages:
+        if msg.cycle_time:
+            dbc_id = msg.frame_id | 0x80000000 if msg.is_extended_frame else msg.frame_id
+            lines.append(f'BA_ "GenMsgCycleTime" BO_ {dbc_id} {msg.cycle_time};')
+    return "\n".join(lines) + "\n"
+
+
+def write_dbc(path, messages):
+    with open(path, "w") as f:
+        f.write(dbc_text(messages))
@@ -0,0 +1,292 @@
+"""
+Bus-load model for classical CAN and CAN FD.
+
+Frame lengths follow ISO 11898-1:
+    classical, 11-bit   47 + 8n bits, 34 + 8n of them (SOF to the end of
+                        the CRC) subject to bit stuffing
+    classical, 29-bit   67 + 8n bits, 54 + 8n of them stuffed
+    CAN FD              arbitration (SOF to BRS) and the end of frame (CRC
+                        delimiter, ACK, EOF, IFS) at the nominal bitrate,
+                        ESI to the CRC at the data bitrate when BRS is set.
+                        Dynamic stuffing ends with the data field; the stuff
+                        count and CRC carry one fixed stuff bit per 4 bits.
+
+Stuffing models:
+    none     no stuff bits
+    typical  the stuff bits of the known header bits (ID, control field)
+             exactly, plus the expected number for random data and CRC
+    worst    the worst case of Davis et al., floor((g - 1) / 4) for g
+             stuffed bits
+
+Does not import tkinter.
+"""
+from array import array
+from functools import lru_cache
+
+from dbc_model import DEFAULT_BAUD_RATE, DEFAULT_SENDER, bus_load_status
+
+STUFFING = ("none", "typical", "worst")
+NOMINAL_BITRATES = (125000, 250000, 500000, 1000000)
+DATA_BITRATES = (1000000, 2000000, 4000000, 5000000, 8000000)
+DEFAULT_DATA_BITRATE = 2000000.0
+# Payload sizes a CAN FD DLC can encode
+FD_PAYLOAD_SIZES = (0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64)
+
+# CRC delimiter, ACK slot and delimiter, EOF, intermission
+_FRAME_END_BITS = 1 + 2 + 7 + 3
+_STUFF_RUN = 5
+
+
+def fd_payload_length(length):
+    """Smallest CAN FD payload size that holds `length` bytes."""
+    for size in FD_PAYLOAD_SIZES:
+        if size >= length:
+            return size
+    return FD_PAYLOAD_SIZES[-1]
+
+
+def _dlc(length):
+    if length <= 8:
+        return length
+    return FD_PAYLOAD_SIZES.index(fd_payload_length(length))
+
+
+def _bits(value, width):
+    return [(value >> i) & 1 for i in range(width - 1, -1, -1)]
+
+
+def _header_bits(frame_id, extended, length, fd):
+    """
+    Known bits from SOF to the DLC (ESI included for CAN FD) and the index
+    of the first bit sent at the data bitrate (len(bits) when there is none).
+    """
+    if extended:
+        # Base ID, SRR, IDE, ID extension
+        bits = [0] + _bits(frame_id >> 18, 11) + [1, 1] + _bits(frame_id & 0x3FFFF, 18)
+    else:
+        # ID, RTR/RRS, IDE
+        bits = [0] + _bits(frame_id, 11) + [0, 0]
+    dlc = _bits(_dlc(length), 4)
+    if fd:
+        # RTR/RRS (extended), FDF, res, BRS | ESI, DLC
+        if extended:
+            bits.append(0)
+        bits += [1, 0, 1]
+        return bits + [0] + dlc, len(bits)
+    if extended:
+        # RTR, r1, r0
+        bits += [0, 0, 0]
+    else:
+        # r0
+        bits.append(0)
+    bits += dlc
+    return bits, len(bits)
+
+
+def _stuff_known(bits, split):
+    """
+    Stuff bits inserted into `bits` before and after index `split`, and the
+    run length of equal bits at the end.
+    """
+    before = after = 0
+    run = 0
+    last = None
+    for i, bit in enumerate(bits):
+        if bit == last:
+            run += 1
+        else:
+            run = 1
+            last = bit
+        if run == _STUFF_RUN:
+            if i < split:
+                before += 1
+            else:
+                after += 1
+            # The stuff bit has the opposite level and starts a new run
+            last = 1 - bit
+            run = 1
+    return before, after, run
+
+
+@lru_cache(maxsize=None)
+def _expected_random_stuffing(run, count):
+    """Expected stuff bits in `count` random bits after a run of `run` equal bits."""
+    # dist[r]: probability that the current run has length r (1..4)
+    dist = [0.0] * _STUFF_RUN
+    dist[run] = 1.0
+    expected = 0.0
+    for _ in range(count):
+        new = [0.0] * _STUFF_RUN
+        for r in range(1, _STUFF_RUN):
+            p = dist[r] * 0.5
+            if not p:
+                continue
+            # Opposite bit starts a new run
+            new[1] += p
+            if r + 1 == _STUFF_RUN:
+                # Equal bit completes a run: a stuff bit starts the next one
+                expected += p
+                new[1] += p
+            else:
+                new[r + 1] += p
+        dist = new
+    return expected
+
+
+def _worst_stuffing(bits):
+    return (bits - 1) // 4 if bits > 0 else 0
+
+
+@lru_cache(maxsize=None)
+def _frame_bits(frame_id, extended, length, fd, stuffing, brs):
+    header, split = _header_bits(frame_id, extended, length, fd)
+    if fd:
+        payload = fd_payload_length(length)
+        crc = 17 if payload <= 16 else 21
+        # Stuff count (3 bits + parity) and CRC, one fixed stuff bit per 4 bits
+        fixed = 4 + crc
+        fixed += (fixed + 3) // 4
+        # Dynamic stuffing covers SOF to the end of the data field
+        random_bits = 8 * payload
+    else:
+        payload = length
+        fixed = 0
+        random_bits = 8 * payload + 15
+    arbitration = split
+    data_phase = len(header) - split + random_bits + fixed
+    stuffed = len(header) + random_bits
+
+    if stuffing == "worst":
+        before = _worst_stuffing(arbitration)
+        after = _worst_stuffing(stuffed) - before
+    elif stuffing == "typical":
+        before, after, run = _stuff_known(header, split)
+        after += _expected_random_stuffing(run, random_bits)
+    else:
+        before = after = 0
+
+    nominal = arbitration + before + _FRAME_END_BITS
+    data = data_phase + after
+    if not (fd and brs):
+        return nominal + data, 0
+    return nominal, data
+
+
+def frame_bit_counts(frame_id, extended=False, length=8, fd=False, stuffing="worst", brs=True):
+    """
+    (nominal bits, data-phase bits) of one frame. Data-phase bits are sent at
+    the data bitrate and are 0 for classical frames and CAN FD frames
+    without bit rate switch. "typical" stuffing gives a float.
+    """
+    if stuffing not in STUFFING:
+        raise ValueError(f"Unknown stuffing model: {stuffing}")
+    if not fd:
+        length = min(length, 8)
+    if stuffing != "typical":
+        # Only "typical" stuffing depends on the ID bits
+        frame_id = 0
+    return _frame_bits(frame_id, bool(extended), length, bool(fd), stuffing, bool(brs))
+
+
+def frame_time(frame_id, extended=False, length=8, fd=False, bitrate=DEFAULT_BAUD_RATE,
+               data_bitrate=DEFAULT_DATA_BITRATE, stuffing="worst", brs=True):
+    """Seconds one frame occupies the bus."""
+    nominal, data = frame_bit_counts(frame_id, extended, length, fd, stuffing, brs)
+    return nominal / bitrate + data / data_bitrate
+
+
+def frame_times(table, rows, bitrate=DEFAULT_BAUD_RATE, data_bitrate=DEFAULT_DATA_BITRATE, stuffing="worst", brs=True):
+    """Bus time per frame (seconds) of every row in `rows`, as an array('d')."""
+    frame_ids = table.frame_ids
+    extended = table.extended
+    lengths = table.lengths
+    fd = table.fd
+    times = array('d', bytes(8 * len(rows)))
+    for i, row in enumerate(rows):
+        nominal, data = frame_bit_counts(frame_ids[row], extended[row], lengths[row], fd[row], stuffing, brs)
+        times[i] = nominal / bitrate + data / data_bitrate
+    return times
+
+
+def bus_load(table, rows=None, bitrate=DEFAULT_BAUD_RATE, data_bitrate=DEFAULT_DATA_BITRATE, stuffing="worst", brs=True):
+    """
+    Bus load of the MessageTable rows `rows` (all rows when None) from their
+    cycle times. Messages without a cycle time add no load.
+
+    Returns a dict with the settings, frames_per_sec, bytes_per_sec
+    (payload), busy_time_per_sec, bus_load_percent, status, fd_messages and the
+    per-node and per-message shares, busiest first. Each node entry has
+    node, messages, bus_load_percent and share_percent; each message entry
+    has id, name, node, frames_per_sec, frame_time_us, bus_load_percent
+    and share_percent.
+    """
+    if rows is None:
+        rows = range(len(table))
+    rows = [row for row in rows if table.frequency[row] > 0]
+    times = frame_times(table, rows, bitrate, data_bitrate, stuffing, brs)
+
+    frequency = table.frequency
+    busy = array('d', (frequency[row] * t for row, t in zip(rows, times)))
+    total_busy = sum(busy)
+    share = (100.0 / total_busy) if total_busy > 0 else 0.0
+
+    fd_messages = sum(1 for row in rows if table.fd[row])
+    node_busy = {}
+    node_count = {}
+    messages = []
+    for row, t, b in zip(rows, times, busy):
+        node = table.node_names[table.node_index[row]] if table.node_names else DEFAULT_SENDER
+        node_busy[node] = node_busy.get(node, 0.0) + b
+        node_count[node] = node_count.get(node, 0) + 1
+        messages.append({
+            "id": f"0x{table.frame_ids[row]:X}",
+            "name": table.names[row],
+            "node": node,
+            "frames_per_sec": frequency[row],
+            "frame_time_us": t * 1e6,
+            "bus_load_percent": b * 100.0,
+            "share_percent": b * share,
+        })
+    messages.sort(key=lambda item: item["bus_load_percent"], reverse=True)
+    nodes = [
+        {"node": node, "messages": node_count[node], "bus_load_percent": b * 100.0, "share_percent": b * share}
+        for node, b in sorted(node_busy.items(), key=lambda item: item[1], reverse=True)
+    ]
+
+    bus_load_percent = total_busy * 100.0
+    return {
+        "bitrate": bitrate,
+        "data_bitrate": data_bitrate,
+        "stuffing": stuffing,
+        "frames_per_sec": sum(frequency[row] for row in rows),
+        "bytes_per_sec": sum(table.bytes_per_sec[row] for row in rows),
+        "busy_time_per_sec": total_busy,
+        "bus_load_percent": bus_load_percent,
+        "status": bus_load_status(bus_load_percent),
+        "fd_messages": fd_messages,
+        "nodes": nodes,
+        "messages": messages,
+    }
+
+
+def format_bus_load(report, top=10):
+    """Plain-text summary of a bus_load result for the GUI."""
+    settings = f"{report['bitrate'] / 1000:g} kbit/s"
+    if report["fd_messages"]:
+        settings += f", FD data {report['data_bitrate'] / 1000:g} kbit/s"
+    lines = [
+        f"Bus load @ {settings}, {report['stuffing']} bit stuffing:",
+        f"  Load:   {report['bus_load_percent']:.2f} %",
+        f"  Status: {report['status']}",
+        f"  Frames: {report['frames_per_sec']:.2f} frames/s, payload {report['bytes_per_sec']:.2f} B/s",
+        "",
+        "Share per node:",
+    ]
+    for item in report["nodes"]:
+        lines.append(f"  {item['node']}: {item['bus_load_percent']:.2f} % ({item['share_percent']:.1f} % of the load, {item['messages']} msgs)")
+    if report["messages"]:
+        lines += ["", f"Busiest messages (top {min(top, len(report['messages']))}):"]
+        for item in report["messages"][:top]:
+            lines.append(f"  {item['id']} {item['name']}: {item['bus_load_percent']:.2f} % "
+                         f"({item['share_percent']:.1f} %, {item['frame_time_us']:.1f} us/frame)")
+    return "\n".join(lines) + "\n"
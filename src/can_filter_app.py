@@ -1,12 +1,63 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import cantools
+import argparse
+import multiprocessing
 import os
-from filter_calculator import calculate_mask_filter, calculate_multiple_masks_filters, format_hex_bin
+import queue
+import threading
+import time
+from bus_load import DATA_BITRATES, NOMINAL_BITRATES, bus_load, format_bus_load
+from dbc_cache import load_messages, load_table
+from dbc_model import DEFAULT_BAUD_RATE, MessageSearchIndex, MessageTable, build_node_structure, generate_header_text
+from filter_banks import PROFILES, bank_pairs, format_bank_plan, plan_filter_banks
+from filter_calculator import CalcStats, CalculationCancelled, IncrementalFilterSolver, calculate_filter_curve, run_engine, format_hex_bin, STD_ID_BITS, EXT_ID_BITS
+from log_replay import format_replay_report, replay_log
+from message_tree import LAZY_FILL_ROWS, MessageTreeView
+from node_plans import format_node_plans, node_plans_header_text, plan_all_nodes
+from response_time import format_response_times, response_times
+from rx_fifo import DEFAULT_FIFOS, assign_fifos, format_fifo_assignment
+
+# Delay between the last keystroke in the search box and re-filtering the list
+SEARCH_DEBOUNCE_MS = 150
+# How often the UI picks up progress and results of a running calculation
+CALC_POLL_MS = 100
+# Width of the tree column: just the expand arrow of a node
+TREE_COLUMN_WIDTH = 28
+
+# Engine labels shown in the GUI -> filter_calculator.ENGINES
+ENGINE_NAMES = {
+    "Incremental": "incremental",
+    "Prime Cover": "prime_cover",
+    "Greedy": "greedy",
+    "Exact": "exact",
+    "Refine": "refine",
+}
+
+# Objective labels shown in the GUI -> dbc_model.OBJECTIVES
+OBJECTIVE_NAMES = {
+    "Collisions": "collisions",
+    "Frames/s": "frames",
+    "Bytes/s": "bytes",
+}
+# What the exact engine's optimality gap counts, per objective
+GAP_UNITS = {
+    "collisions": "collisions",
+    "frames": "unwanted frames/s",
+    "bytes": "unwanted B/s",
+}
+
+# Bit stuffing labels shown in the GUI -> bus_load.STUFFING
+STUFFING_NAMES = {
+    "Worst case": "worst",
+    "Typical": "typical",
+    "None": "none",
+}
 
 class CanFilterApp:
-    def __init__(self, root):
+    def __init__(self, root, lean=False):
         self.root = root
+        # Lean mode keeps only the MessageTable of a loaded DBC and reports memory use
+        self.lean = lean
         self.root.title("CAN Mask/Filter Calculator")
         self.root.geometry("1200x1000")
         
@@ -17,9 +68,16 @@ class CanFilterApp:
         self.style.configure("Treeview.Heading", font=('Segoe UI', 10))
         
         # Data
-        self.db = None
-        self.all_messages = [] # List of (id, name)
-        self.displayed_messages = [] # Filtered list
+        self.all_messages = [] # List of MessageInfo
+        self.table = MessageTable([]) # Per-message columns used by every view
+        self.search_index = MessageSearchIndex(self.table)
+        self.search_after_id = None # Pending debounced search
+        self.calc_cancel = None # threading.Event of the running calculation
+        self.calc_generation = 0 # Bumped on every start/cancel, stale workers are ignored
+        self.live_solvers = {} # {bits: IncrementalFilterSolver} while Live mode is on
+        self.live_settings = None # (max_filters, objective) the live solvers were built for
+        self.last_results = None # (selected IDs, {bits: [(mask, filter), ...]}) of the last calculation
+        self.last_node_plans = None # plan_all_nodes result of the last "Plan All Nodes"
         
         # Layout
         self.create_widgets()
@@ -36,7 +94,7 @@ class CanFilterApp:
         self.clear_btn.pack(side=tk.LEFT, padx=5)
         
         self.search_var = tk.StringVar()
-        self.search_var.trace_add("write", self.filter_list)
+        self.search_var.trace_add("write", self.schedule_filter)
         self.search_entry = ttk.Entry(top_frame, textvariable=self.search_var, width=30, font=('Segoe UI', 10))
         self.search_entry.pack(side=tk.LEFT, padx=5)
         self.search_entry.insert(0, "Search ID or Name...")
@@ -51,7 +109,8 @@ class CanFilterApp:
         
         # Treeview for multi-column list
         columns = ("Select", "ID", "Name", "CycleTime", "Freq", "BytesPerSec")
-        self.tree = ttk.Treeview(mid_frame, columns=columns, show="headings", selectmode="none")
+        # The tree column (#0) only holds the expand arrows of the nodes
+        self.tree = ttk.Treeview(mid_frame, columns=columns, show="tree headings", selectmode="none")
         
         self.tree.heading("Select", text="[ ]", command=self.toggle_all)
         self.tree.heading("ID", text="ID (Hex)")
@@ -60,6 +119,7 @@ class CanFilterApp:
         self.tree.heading("Freq", text="Freq (Hz)")
         self.tree.heading("BytesPerSec", text="Bytes/s")
         
+        self.tree.column("#0", width=TREE_COLUMN_WIDTH, minwidth=TREE_COLUMN_WIDTH, stretch=False)
         self.tree.column("Select", width=60, anchor="center")
         self.tree.column("ID", width=80)
         self.tree.column("Name", width=300)
@@ -73,6 +133,7 @@ class CanFilterApp:
         
         # Bind click for checkbox
         self.tree.bind("<Button-1>", self.on_tree_click)
+        self.tree.bind("<Double-Button-1>", self.on_tree_double_click)
         
         # Scrollbar
         scrollbar = ttk.Scrollbar(mid_frame, orient=tk.VERTICAL, command=self.tree.yview)
@@ -98,12 +159,84 @@ class CanFilterApp:
         config_frame.pack(side=tk.LEFT, padx=(0, 10), fill=tk.Y)
         
         ttk.Label(config_frame, text="Max Filters:").pack(side=tk.LEFT, padx=5)
-        self.max_filters_spin = ttk.Spinbox(config_frame, from_=1, to=20, textvariable=self.max_filters_var, width=5)
+        self.max_filters_spin = ttk.Spinbox(config_frame, from_=1, to=20, textvariable=self.max_filters_var, width=5, command=self.live_update)
         self.max_filters_spin.pack(side=tk.LEFT, padx=5)
         
         self.auto_check = ttk.Checkbutton(config_frame, text="Auto", variable=self.auto_filters_var, command=self.toggle_max_filters)
         self.auto_check.pack(side=tk.LEFT, padx=5)
 
+        # Engine used by "Calculate Mask & Filter"
+        self.engine_var = tk.StringVar(value="Incremental")
+        self.exact_budget_var = tk.DoubleVar(value=5.0)
+        self.seed_var = tk.StringVar()
+
+        ttk.Label(config_frame, text="Engine:").pack(side=tk.LEFT, padx=5)
+        self.engine_combo = ttk.Combobox(config_frame, textvariable=self.engine_var, values=list(ENGINE_NAMES), state="readonly", width=11)
+        self.engine_combo.pack(side=tk.LEFT, padx=5)
+        self.engine_combo.bind("<<ComboboxSelected>>", lambda e: self.toggle_engine())
+
+        ttk.Label(config_frame, text="Budget (s):").pack(side=tk.LEFT, padx=5)
+        self.exact_budget_spin = ttk.Spinbox(config_frame, from_=1, to=300, textvariable=self.exact_budget_var, width=5)
+        self.exact_budget_spin.pack(side=tk.LEFT, padx=5)
+
+        # A refine seed runs every annealing step instead of stopping at the budget
+        ttk.Label(config_frame, text="Seed:").pack(side=tk.LEFT, padx=5)
+        self.seed_entry = ttk.Entry(config_frame, textvariable=self.seed_var, width=6)
+        self.seed_entry.pack(side=tk.LEFT, padx=5)
+
+        # What an accepted unselected ID costs when scoring merges
+        self.objective_var = tk.StringVar(value="Collisions")
+        ttk.Label(config_frame, text="Minimize:").pack(side=tk.LEFT, padx=5)
+        self.objective_combo = ttk.Combobox(config_frame, textvariable=self.objective_var, values=list(OBJECTIVE_NAMES), state="readonly", width=10)
+        self.objective_combo.pack(side=tk.LEFT, padx=5)
+        self.objective_combo.bind("<<ComboboxSelected>>", lambda e: self.live_update())
+
+        # Live mode: results follow every checkbox change
+        self.live_var = tk.BooleanVar(value=False)
+        self.live_check = ttk.Checkbutton(config_frame, text="Live", variable=self.live_var, command=self.toggle_live)
+        self.live_check.pack(side=tk.LEFT, padx=5)
+
+        # Engine counters and phase timings under every result
+        self.stats_var = tk.BooleanVar(value=False)
+        self.stats_check = ttk.Checkbutton(config_frame, text="Stats", variable=self.stats_var)
+        self.stats_check.pack(side=tk.LEFT, padx=5)
+
+        # Bus settings used by "Calculate Data Rate" and "Response Times"
+        bus_frame = ttk.LabelFrame(bottom_frame, text="Bus", padding="5")
+        bus_frame.pack(fill=tk.X, pady=(0, 5))
+
+        self.bitrate_var = tk.StringVar(value=f"{int(DEFAULT_BAUD_RATE)}")
+        ttk.Label(bus_frame, text="Bitrate (bit/s):").pack(side=tk.LEFT, padx=5)
+        self.bitrate_combo = ttk.Combobox(bus_frame, textvariable=self.bitrate_var, values=[str(b) for b in NOMINAL_BITRATES], width=9)
+        self.bitrate_combo.pack(side=tk.LEFT, padx=5)
+
+        self.data_bitrate_var = tk.StringVar(value=str(DATA_BITRATES[1]))
+        ttk.Label(bus_frame, text="FD data bitrate (bit/s):").pack(side=tk.LEFT, padx=5)
+        self.data_bitrate_combo = ttk.Combobox(bus_frame, textvariable=self.data_bitrate_var, values=[str(b) for b in DATA_BITRATES], width=9)
+        self.data_bitrate_combo.pack(side=tk.LEFT, padx=5)
+
+        self.stuffing_var = tk.StringVar(value="Worst case")
+        ttk.Label(bus_frame, text="Bit stuffing:").pack(side=tk.LEFT, padx=5)
+        self.stuffing_combo = ttk.Combobox(bus_frame, textvariable=self.stuffing_var, values=list(STUFFING_NAMES), state="readonly", width=10)
+        self.stuffing_combo.pack(side=tk.LEFT, padx=5)
+
+        # Controller used by "Plan Filter Banks"
+        self.bank_profile_var = tk.StringVar(value=next(iter(PROFILES)))
+        ttk.Label(bus_frame, text="Filter banks:").pack(side=tk.LEFT, padx=5)
+        self.bank_profile_combo = ttk.Combobox(bus_frame, textvariable=self.bank_profile_var, values=list(PROFILES), state="readonly", width=10)
+        self.bank_profile_combo.pack(side=tk.LEFT, padx=5)
+
+        # Computed filters are spread over the RX FIFOs
+        self.fifos_var = tk.IntVar(value=DEFAULT_FIFOS)
+        ttk.Label(bus_frame, text="RX FIFOs:").pack(side=tk.LEFT, padx=5)
+        self.fifos_spin = ttk.Spinbox(bus_frame, from_=1, to=4, textvariable=self.fifos_var, width=3)
+        self.fifos_spin.pack(side=tk.LEFT, padx=5)
+
+        self.priority_below_var = tk.StringVar(value="")
+        ttk.Label(bus_frame, text="Own FIFO for IDs below:").pack(side=tk.LEFT, padx=5)
+        self.priority_below_entry = ttk.Entry(bus_frame, textvariable=self.priority_below_var, width=8)
+        self.priority_below_entry.pack(side=tk.LEFT, padx=5)
+
         # Actions Frame
         actions_frame = ttk.LabelFrame(control_panel, text="Actions", padding="5")
         actions_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
@@ -112,7 +245,10 @@ class CanFilterApp:
         actions_frame.columnconfigure(1, weight=1)
 
         self.calc_btn = ttk.Button(actions_frame, text="Calculate Mask & Filter", command=self.calculate)
-        self.calc_btn.grid(row=0, column=0, columnspan=2, padx=5, pady=2, sticky="ew")
+        self.calc_btn.grid(row=0, column=0, padx=5, pady=2, sticky="ew")
+
+        self.cancel_btn = ttk.Button(actions_frame, text="Cancel", command=self.cancel_calculation, state=tk.DISABLED)
+        self.cancel_btn.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
 
         self.rate_btn = ttk.Button(actions_frame, text="Calculate Data Rate", command=self.calculate_data_rate)
         self.rate_btn.grid(row=1, column=0, padx=5, pady=2, sticky="ew")
@@ -120,8 +256,33 @@ class CanFilterApp:
         self.gen_header_btn = ttk.Button(actions_frame, text="Generate .h", command=self.generate_header)
         self.gen_header_btn.grid(row=1, column=1, padx=5, pady=2, sticky="ew")
 
+        self.curve_btn = ttk.Button(actions_frame, text="Sets vs. Collisions", command=self.calculate_curve)
+        self.curve_btn.grid(row=2, column=0, padx=5, pady=2, sticky="ew")
+
+        self.replay_btn = ttk.Button(actions_frame, text="Replay Log...", command=self.replay_log)
+        self.replay_btn.grid(row=2, column=1, padx=5, pady=2, sticky="ew")
+
+        self.response_btn = ttk.Button(actions_frame, text="Response Times", command=self.calculate_response_times)
+        self.response_btn.grid(row=3, column=0, padx=5, pady=2, sticky="ew")
+
+        self.banks_btn = ttk.Button(actions_frame, text="Plan Filter Banks", command=self.plan_banks)
+        self.banks_btn.grid(row=3, column=1, padx=5, pady=2, sticky="ew")
+
+        self.nodes_btn = ttk.Button(actions_frame, text="Plan All Nodes", command=self.plan_nodes)
+        self.nodes_btn.grid(row=4, column=0, padx=5, pady=2, sticky="ew")
+
+        self.save_plans_btn = ttk.Button(actions_frame, text="Save Node Plans .h", command=self.save_node_plans)
+        self.save_plans_btn.grid(row=4, column=1, padx=5, pady=2, sticky="ew")
+
+        # Progress of the running calculation
+        self.progress_var = tk.StringVar(value="")
+        self.progress_bar = ttk.Progressbar(actions_frame, mode="determinate", maximum=100)
+        self.progress_bar.grid(row=5, column=0, padx=5, pady=2, sticky="ew")
+        ttk.Label(actions_frame, textvariable=self.progress_var).grid(row=5, column=1, padx=5, pady=2, sticky="w")
+
         # Initialize state based on default value
         self.toggle_max_filters()
+        self.toggle_engine()
         
         # Result Display
         self.result_frame = ttk.LabelFrame(bottom_frame, text="Results", padding="10")
@@ -136,14 +297,43 @@ class CanFilterApp:
         
         self.set_result_text("Load a DBC file and select IDs to calculate.")
         
-        self.checked_ids = set() # Keep track of checked IDs
+        self.checked_ids = set() # Keys (frame_id, extended) of the checked messages
         self.node_structure = {} # {NodeName: [msg_obj, ...]}
+        
+        # Rows are inserted once and detached/reattached while filtering
+        self.tree_view = MessageTreeView(self.tree, self.checked_ids)
+        self.tree.bind("<<TreeviewOpen>>", self.tree_view.on_open)
 
     def toggle_max_filters(self):
         if self.auto_filters_var.get():
             self.max_filters_spin.configure(state=tk.DISABLED)
         else:
             self.max_filters_spin.configure(state=tk.NORMAL)
+        self.live_update()
+
+    def get_max_filters(self):
+        """Returns (max_filters, label for the results header)."""
+        try:
+            if self.auto_filters_var.get():
+                # In Auto mode, we allow as many filters as needed to avoid collisions
+                # We simply pass a large number (e.g. number of selected IDs or a high hardware limit like 20)
+                # If the algorithm finds 0-collision merges, it takes them. 
+                # If it hits a wall where merging causes collisions, it stops if we are under max_filters.
+                max_filters = 20 # Common hardware limit, or could be len(selected_ids)
+            else:
+                max_filters = int(self.max_filters_var.get())
+        except:
+            max_filters = 1
+        mode_str = "Auto" if self.auto_filters_var.get() else str(max_filters)
+        return max_filters, mode_str
+
+    def toggle_engine(self):
+        # The time budget only applies to the exact search and refinement
+        if self.engine_var.get() in ("Exact", "Refine"):
+            self.exact_budget_spin.configure(state=tk.NORMAL)
+        else:
+            self.exact_budget_spin.configure(state=tk.DISABLED)
+        self.seed_entry.configure(state=tk.NORMAL if self.engine_var.get() == "Refine" else tk.DISABLED)
 
     def load_dbc(self):
         file_path = filedialog.askopenfilename(filetypes=[("DBC Files", "*.dbc"), ("All Files", "*.*")])
@@ -151,52 +341,49 @@ class CanFilterApp:
             return
             
         try:
-            self.db = cantools.database.load_file(file_path)
-            self.all_messages = []
-            self.node_structure = {}
-            
-            # Group by Node
-            # We need to look at senders. cantools msg.senders is a list.
-            for msg in self.db.messages:
-                self.all_messages.append(msg)
-                
-                senders = msg.senders
-                if not senders:
-                    senders = ["Vector__XXX"] # or "No Sender"
-                
-                for sender in senders:
-                    if sender not in self.node_structure:
-                        self.node_structure[sender] = []
-                    self.node_structure[sender].append(msg)
-            
-            # Sort messages within nodes by ID
-            for node in self.node_structure:
-                self.node_structure[node].sort(key=lambda x: x.frame_id)
+            # Served from the parsed-DBC cache unless the file changed
+            memory = None
+            if self.lean:
+                # The message list is released once the table is built
+                self.all_messages, self.node_structure = [], {}
+                self.table, memory = load_table(file_path, measure=True)
+            else:
+                # The cantools database is not kept; everything reads the MessageInfo list
+                self.all_messages = load_messages(file_path)[0]
+                self.table = MessageTable(self.all_messages)
+                # Group by Node (sender), messages sorted by ID
+                self.node_structure = build_node_structure(self.all_messages)
+            self.search_index = MessageSearchIndex(self.table)
                 
             self.checked_ids.clear()
-            self.update_list(self.node_structure)
+            self.live_settings = None # Live solvers are rebuilt for the new DBC
+            self.last_results = None
+            self.last_node_plans = None
+            self.tree_view.load(self.table)
+            self.search_var.set("Search ID or Name...")
             
             # Check availability of GenMsgCycleTime or msg.cycle_time for Data Rate button
-            has_cycle_info = False
-            for msg in self.all_messages:
-                # Check safe access to attributes
-                has_attr_cycle = False
-                if hasattr(msg, 'attributes') and msg.attributes and 'GenMsgCycleTime' in msg.attributes:
-                    has_attr_cycle = True
-                
-                if (hasattr(msg, 'cycle_time') and msg.cycle_time) or has_attr_cycle:
-                    has_cycle_info = True
-                    break
+            has_cycle_info = any(self.table.cycle_ms)
             
             if has_cycle_info:
                 self.rate_btn.configure(state=tk.NORMAL)
             else:
                 self.rate_btn.configure(state=tk.DISABLED)
 
-            messagebox.showinfo("Success", f"Loaded {len(self.all_messages)} messages in {len(self.node_structure)} nodes.")
+            info = f"Loaded {len(self.table)} messages in {len(self.table.node_rows)} nodes."
+            if memory is not None:
+                info += (f"\nMemory: {memory['loaded'] / 1e6:.1f} MB after parsing (peak {memory['peak'] / 1e6:.1f} MB), "
+                         f"{memory['kept'] / 1e6:.1f} MB kept.")
+            messagebox.showinfo("Success", info)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load DBC: {e}")
 
+    def session_messages(self):
+        """MessageInfo list of the loaded DBC, rebuilt from the table in lean mode."""
+        if self.lean:
+            return self.table.messages()
+        return self.all_messages
+
     def set_result_text(self, text):
         self.result_text.config(state=tk.NORMAL)
         self.result_text.delete("1.0", tk.END)
@@ -211,119 +398,36 @@ class CanFilterApp:
             self.result_frame.config(text="Results")
 
     def clear_selection(self):
+        removed = list(self.checked_ids)
         self.checked_ids.clear()
         self.search_var.set("Search ID or Name...")
-        self.update_list(self.node_structure)
+        self.update_list(self.table.node_rows)
+        self.live_update(removed=removed)
+
+    def schedule_filter(self, *args):
+        """Re-filters once typing pauses instead of on every keystroke."""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.filter_list)
 
     def filter_list(self, *args):
+        self.search_after_id = None
         query = self.search_var.get().lower()
         if query == "search id or name...":
             return
             
         if not query:
-            self.update_list(self.node_structure)
+            self.update_list(self.table.node_rows)
             return
             
-        # For filtering, we might flatten or keep structure only if node matches or child matches
-        filtered_structure = {}
-        
-        for node, msgs in self.node_structure.items():
-            node_matches = query in node.lower()
-            matching_msgs = []
-            for msg in msgs:
-                if node_matches or (query in hex(msg.frame_id).lower()) or (query in msg.name.lower()):
-                    matching_msgs.append(msg)
-            
-            if matching_msgs:
-                filtered_structure[node] = matching_msgs
-                
-        self.update_list(filtered_structure)
+        self.update_list(self.search_index.search(query))
 
     def update_list(self, structure):
-        # Clear current
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        # Sort nodes by name
-        sorted_nodes = sorted(structure.keys())
-        
-        for node_name in sorted_nodes:
-            msgs = structure[node_name]
-            
-            # Calculate Node Totals
-            node_bytes_per_sec = 0.0
-            node_total_freq = 0.0 # Just for reference, bytes is more important
-            
-            node_children_ids = []
-            
-            for msg in msgs:
-                node_children_ids.append(msg.frame_id)
-                
-                # Cycle Time and Freq
-                cycle_time = 0
-                if msg.cycle_time:
-                    cycle_time = msg.cycle_time
-                elif hasattr(msg, 'attributes') and msg.attributes and 'GenMsgCycleTime' in msg.attributes:
-                     # cantools might put it in .attributes dictionary depending on parsing
-                     try:
-                         cycle_time = int(msg.attributes['GenMsgCycleTime'])
-                     except:
-                         pass
-                
-                freq = 0.0
-                if cycle_time > 0:
-                    freq = 1000.0 / cycle_time
-                    
-                bytes_s = freq * msg.length
-                node_bytes_per_sec += bytes_s
-            
-            # Determine Node Check State
-            all_checked = all(mid in self.checked_ids for mid in node_children_ids)
-            any_checked = any(mid in self.checked_ids for mid in node_children_ids)
-            
-            node_check = "☐"
-            if all_checked and msgs:
-                node_check = "☑"
-            elif any_checked:
-                node_check = "☒" # Mixed state representation
-                
-            # Insert Node Row
-            # We use a custom ID prefix for nodes to distinguish them
-            node_iid = f"NODE_{node_name}"
-            
-            # Format numbers
-            node_s_str = f"{node_bytes_per_sec:.1f}" if node_bytes_per_sec > 0 else "-"
-            
-            self.tree.insert("", tk.END, iid=node_iid, values=(node_check, "", f"Node: {node_name} ({len(msgs)} msgs)", "", "", node_s_str), open=True, tags=('node_row',))
-            
-            # Insert Messages
-            for msg in msgs:
-                mid = msg.frame_id
-                
-                cycle_time = "0"
-                if msg.cycle_time:
-                    cycle_time = str(msg.cycle_time)
-                elif hasattr(msg, 'attributes') and msg.attributes and 'GenMsgCycleTime' in msg.attributes:
-                     cycle_time = str(msg.attributes['GenMsgCycleTime'])
-
-                freq_str = "-"
-                bytes_str = "-"
-                
-                try:
-                    c_val = int(cycle_time)
-                    if c_val > 0:
-                        f_val = 1000.0 / c_val
-                        freq_str = f"{f_val:.1f}"
-                        b_val = f_val * msg.length
-                        bytes_str = f"{b_val:.1f}"
-                except:
-                    pass
-                
-                is_checked = mid in self.checked_ids
-                check_mark = "☑" if is_checked else "☐"
-                tags = ('checked',) if is_checked else ()
-                
-                self.tree.insert(node_iid, tk.END, iid=str(mid), values=(check_mark, f"0x{mid:X}", msg.name, cycle_time, freq_str, bytes_str), tags=tags)
+        """Shows {NodeName: [table row, ...]} in the tree."""
+        # Small result sets are expanded; large ones fill nodes as they are opened
+        visible_count = sum(len(rows) for rows in structure.values())
+        self.tree_view.show(structure, expand=visible_count <= LAZY_FILL_ROWS)
+        self.tree_view.refresh_all()
 
     def on_tree_click(self, event):
         region = self.tree.identify("region", event.x, event.y)
@@ -333,6 +437,10 @@ class CanFilterApp:
                 self.toggle_all()
             return
 
+        # The tree column opens/closes the node without toggling it
+        if self.tree.identify_column(event.x) == "#0":
+            return
+
         item_id = self.tree.identify_row(event.y)
         if not item_id:
             return
@@ -340,9 +448,19 @@ class CanFilterApp:
         # Toggle Logic
         self.toggle_item(item_id)
 
+    def on_tree_double_click(self, event):
+        """
+        The first click of a double-click already toggled the row; the
+        second is dropped so it neither toggles back nor opens the node.
+        In the tree column a double-click still opens/closes the node.
+        """
+        if self.tree.identify_column(event.x) != "#0":
+            return "break"
+
     def toggle_item(self, item_id):
-        if item_id.startswith("NODE_"):
-            # Node Clicked - Toggle All Children
+        node = self.tree_view.node_of(item_id)
+        if node is not None:
+            # Node Clicked - Toggle All Visible Children
             node_val = self.tree.item(item_id, "values")
             current_mark = node_val[0]
             
@@ -350,102 +468,63 @@ class CanFilterApp:
             # If unchecked -> Check all
             should_check = (current_mark == "☐")
             
-            children = self.tree.get_children(item_id)
-            for child_id in children:
-                mid = int(child_id)
+            changed = [key for key in self.tree_view.visible_keys(node) if (key in self.checked_ids) != should_check]
+            for key in changed:
                 if should_check:
-                    self.checked_ids.add(mid)
+                    self.checked_ids.add(key)
                 else:
-                    if mid in self.checked_ids:
-                        self.checked_ids.remove(mid)
+                    self.checked_ids.discard(key)
             
-            # Refresh this node's visual state
-            self.refresh_node_visuals(item_id)
+            # Messages with several senders also appear under other nodes
+            self.tree_view.refresh_all()
+            if should_check:
+                self.live_update(added=changed)
+            else:
+                self.live_update(removed=changed)
             
         else:
             # Message Clicked
-            mid = int(item_id)
-            if mid in self.checked_ids:
-                self.checked_ids.remove(mid)
+            key = self.tree_view.key(item_id)
+            if key is None:
+                return
+            if key in self.checked_ids:
+                self.checked_ids.remove(key)
+                self.live_update(removed=[key])
             else:
-                self.checked_ids.add(mid)
+                self.checked_ids.add(key)
+                self.live_update(added=[key])
                 
-            # Update this row
-            self.refresh_row_visuals(str(mid))
-            
-            # Update Parent Node
-            parent_id = self.tree.parent(item_id)
-            if parent_id:
-                self.refresh_node_visuals(parent_id)
-
-    def refresh_row_visuals(self, item_id):
-        if item_id.startswith("NODE_"):
-            return 
-        mid = int(item_id)
-        is_checked = mid in self.checked_ids
-        check_mark = "☑" if is_checked else "☐"
-        tags = ('checked',) if is_checked else ()
-        
-        # Preserve other values
-        current = self.tree.item(item_id, "values")
-        new_vals = [check_mark] + list(current)[1:]
-        self.tree.item(item_id, values=new_vals, tags=tags)
-
-    def refresh_node_visuals(self, node_id):
-        children = self.tree.get_children(node_id)
-        if not children:
-            return
-            
-        child_mids = [int(c) for c in children]
-        all_checked = all(mid in self.checked_ids for mid in child_mids)
-        any_checked = any(mid in self.checked_ids for mid in child_mids)
-        
-        node_check = "☐"
-        if all_checked:
-            node_check = "☑"
-        elif any_checked:
-            node_check = "☒"
-            
-        current = self.tree.item(node_id, "values")
-        new_vals = [node_check] + list(current)[1:]
-        self.tree.item(node_id, values=new_vals)
-        
-        # Also refresh all children visuals to ensure consistency
-        for child in children:
-            self.refresh_row_visuals(child)
+            # Update its rows and their nodes
+            self.tree_view.refresh_key(key)
 
     def toggle_all(self):
         # Determine target state based on global selection
         # If any visible item is unchecked -> check all
         # Else -> uncheck all
-        
-        all_visible_nodes = self.tree.get_children() # Root level items (Nodes)
-        all_child_mids = []
-        for node in all_visible_nodes:
-            # Add node's children
-            children = self.tree.get_children(node)
-            for c in children:
-                all_child_mids.append(int(c))
+        all_child_keys = self.tree_view.visible_keys()
                 
-        if not all_child_mids:
+        if not all_child_keys:
             return
 
-        all_checked = all(mid in self.checked_ids for mid in all_child_mids)
+        all_checked = all(key in self.checked_ids for key in all_child_keys)
         should_check = not all_checked
         
-        for mid in all_child_mids:
+        changed = set(key for key in all_child_keys if (key in self.checked_ids) != should_check)
+        for key in changed:
             if should_check:
-                self.checked_ids.add(mid)
+                self.checked_ids.add(key)
             else:
-                if mid in self.checked_ids:
-                    self.checked_ids.remove(mid)
+                self.checked_ids.discard(key)
                     
         # Refresh all nodes
-        for node in all_visible_nodes:
-            self.refresh_node_visuals(node)
+        self.tree_view.refresh_all()
+        if should_check:
+            self.live_update(added=changed)
+        else:
+            self.live_update(removed=changed)
 
     def generate_header(self):
-        if not self.db:
+        if not len(self.table):
              messagebox.showerror("Error", "No DBC loaded.")
              return
 
@@ -461,56 +540,8 @@ class CanFilterApp:
             
         try:
             with open(file_path, 'w') as f:
-                # File Header
-                f.write("/*\n")
-                f.write(" * can_id_list.h\n")
-                f.write(" */\n\n")
-                
-                f.write("#ifndef INC_CAN_ID_LIST_H_\n")
-                f.write("#define INC_CAN_ID_LIST_H_\n\n")
-                
-                # Optional: Add standard IDs if needed, or leave blank as requested
-                f.write("#define SAFE_STATE_ID \t0\n")
-                f.write("#define ERROR_MSG_ID\t1\n\n")
-
-                # Sort nodes
-                sorted_nodes = sorted(self.node_structure.keys())
-                
-                for node_name in sorted_nodes:
-                    f.write(f"/*\n * {node_name}\n */\n\n")
-                    
-                    msgs = self.node_structure[node_name]
-                    # Sort messages by ID
-                    msgs.sort(key=lambda x: x.frame_id)
-                    
-                    for msg in msgs:
-                        # Construct Macro Name
-                        # [ModuleName]_[ShortMessageName]_ID
-                        
-                        n_str = node_name.upper().replace(" ", "_")
-                        m_str = msg.name.upper().replace(" ", "_")
-                        
-                        # Heuristic to avoid duplication (e.g. RCD_RCD_Error -> RCD_ERROR)
-                        if m_str.startswith(n_str + "_"):
-                            base_name = m_str
-                        elif m_str == n_str: # Unusual but possible
-                            base_name = m_str
-                        else:
-                            base_name = f"{n_str}_{m_str}"
-                            
-                        macro_name = f"CANID_{base_name}"
-                        
-                        # Sanitize
-                        macro_name = "".join(c if c.isalnum() or c == '_' else '_' for c in macro_name)
-                        
-                        # ID in Hex
-                        hex_id = f"0x{msg.frame_id:X}"
-                        
-                        f.write(f"#define {macro_name} {hex_id}\n")
-                    
-                    f.write("\n")
-                
-                f.write("#endif /* INC_CAN_ID_LIST_H_ */\n")
+                node_structure = build_node_structure(self.session_messages()) if self.lean else self.node_structure
+                f.write(generate_header_text(node_structure))
             
             messagebox.showinfo("Success", f"File saved to {file_path}")
             
@@ -522,127 +553,517 @@ class CanFilterApp:
             self.set_result_text("Please select at least one ID.")
             return
 
-        if not self.db:
+        if not len(self.table):
              self.set_result_text("No DBC loaded.")
              return
 
-        total_bytes_sec = 0.0
-        total_frames_sec = 0.0
-        total_bits_sec = 0.0
-        
-        sorted_ids = sorted(list(self.checked_ids))
-        
-        for mid in sorted_ids:
-            try:
-                msg = self.db.get_message_by_frame_id(mid)
-            except:
-                continue
-                
-            cycle_time = 0
-            if msg.cycle_time:
-                cycle_time = msg.cycle_time
-            elif hasattr(msg, 'attributes') and msg.attributes and 'GenMsgCycleTime' in msg.attributes:
-                 try:
-                     cycle_time = int(msg.attributes['GenMsgCycleTime'])
-                 except:
-                     pass
-            
-            if cycle_time > 0:
-                freq = 1000.0 / cycle_time
-                bytes_s = freq * msg.length
-                
-                # Estimate bits on bus (Standard CAN 11-bit)
-                # Overhead approx 47 bits + data (8 * length)
-                # Does not strictly account for bit stuffing (which adds ~20%)
-                bits_per_frame = 47 + (8 * msg.length)
-                bits_s = freq * bits_per_frame
-                
-                total_frames_sec += freq
-                total_bits_sec += bits_s
+        settings = self.bus_settings()
+        if settings is None:
+            return
 
-        # Bus Load Calculation (500 kbps)
-        baud_rate = 500000.0
-        bus_load_percent = (total_bits_sec / baud_rate) * 100.0
-        
-        # Total Data Rate (including overhead)
-        # Convert total bits/sec to bytes/sec
-        total_bytes_on_wire_sec = total_bits_sec / 8.0
-        
-        # Determine Status
-        status_msg = ""
-        if bus_load_percent <= 30:
-            status_msg = "OK (Low Load)"
-        elif bus_load_percent <= 50:
-            status_msg = "Standard Load"
-        elif bus_load_percent <= 70:
-            status_msg = "Warning: Load is getting high"
-        else:
-            status_msg = "CRITICAL: Bus overload likely!"
+        rows = self.table.rows_for(sorted(self.checked_ids))
+        load = bus_load(self.table, rows, *settings)
 
-        res_text = f"Data Rate Calculation for {len(sorted_ids)} selected IDs:\n\n"
-        res_text += f"Total Data Rate:  {total_bytes_on_wire_sec:.2f} B/s ({total_bytes_on_wire_sec/1024:.2f} kB/s)\n"
-        res_text += f"Total Frame Rate: {total_frames_sec:.2f} frames/s\n\n"
-        
-        res_text += f"Bus Load (approx. @ 500kbps):\n"
-        res_text += f"  Load:   {bus_load_percent:.2f} %\n"
-        res_text += f"  Status: {status_msg}\n"
-        
-        res_text += "\nNote: Bus load estimation uses 47 bits overhead per frame."
-        res_text += "\nBit stuffing is not calculated (add ~20% for worst case)."
+        res_text = f"Data Rate Calculation for {len(rows)} selected IDs:\n\n"
+        res_text += format_bus_load(load)
         
         self.set_result_text(res_text)
 
+    def bus_settings(self):
+        """(bitrate, data bitrate, stuffing model) from the Bus row, None after an error message."""
+        try:
+            bitrate = float(self.bitrate_var.get())
+            data_bitrate = float(self.data_bitrate_var.get())
+            if bitrate <= 0 or data_bitrate <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Bitrates must be positive numbers (bit/s).")
+            return None
+        return bitrate, data_bitrate, STUFFING_NAMES[self.stuffing_var.get()]
+
+    def search_limits(self):
+        """(time budget, refine seed or None) from the Engine row, None after an error message."""
+        try:
+            budget = float(self.exact_budget_var.get())
+        except:
+            budget = 5.0
+        text = self.seed_var.get().strip()
+        try:
+            seed = int(text) if text else None
+        except ValueError:
+            messagebox.showerror("Error", "Seed must be a whole number, or empty to stop at the time budget.")
+            return None
+        return budget, seed
+
+    def calculate_response_times(self):
+        """Worst-case response times of the checked messages against the whole bus."""
+        if not len(self.table):
+            self.set_result_text("No DBC loaded.")
+            return
+
+        if not self.checked_ids:
+            self.set_result_text("Please select at least one ID.")
+            return
+
+        settings = self.bus_settings()
+        if settings is None:
+            return
+
+        report = response_times(self.table, self.table.rows_for(sorted(self.checked_ids)), *settings)
+        self.set_result_text(format_response_times(report))
+
+    def selection_groups(self):
+        """
+        Splits the checked IDs into ID groups: [(label, bits, selected,
+        unselected), ...]. Standard and extended frames go through separate
+        filter banks.
+        """
+        groups = []
+        for label, bits, extended in (("Standard IDs (11-bit)", STD_ID_BITS, False), ("Extended IDs (29-bit)", EXT_ID_BITS, True)):
+            group_selected = sorted(mid for mid, ext in self.checked_ids if ext == extended)
+            if group_selected:
+                group_unselected = [self.table.frame_ids[row] for row in range(len(self.table))
+                                    if self.table.extended[row] == extended and self.table.key(row) not in self.checked_ids]
+                groups.append((label, bits, group_selected, group_unselected))
+        return groups
+
+    def group_weights(self):
+        """The engines' traffic weights per ID width ({bits: weights}) for the chosen objective."""
+        objective = OBJECTIVE_NAMES[self.objective_var.get()]
+        return {STD_ID_BITS: self.table.traffic_weights(objective), EXT_ID_BITS: self.table.traffic_weights(objective, True)}
+
     def calculate(self):
         if not self.checked_ids:
             self.set_result_text("Please select at least one ID.")
             return
             
-        selected_ids = sorted(list(self.checked_ids))
-        unselected_ids = []
-        if self.db:
-            for msg in self.db.messages:
-                if msg.frame_id not in self.checked_ids:
-                    unselected_ids.append(msg.frame_id)
-        
+        max_filters, mode_str = self.get_max_filters()
+        engine = self.engine_var.get()
+        groups = self.selection_groups()
+
+        weights = self.group_weights()
+        limits = self.search_limits()
+        if limits is None:
+            return
+        header_info = (len(self.checked_ids), mode_str, engine, self.objective_var.get())
+        bus = self.bus_settings()
+        if bus is None:
+            return
+
+        selected_ids = set(self.checked_ids)
+        show_stats = self.stats_var.get()
+        self.start_calculation(
+            lambda group_progress: self.format_calculation(groups, max_filters, engine, limits, weights, header_info, bus, group_progress, show_stats),
+            lambda value: self.show_calculation(selected_ids, value),
+        )
+
+    def show_calculation(self, selected_ids, value):
+        text, sets = value
+        self.last_results = (selected_ids, sets)
+        filters = []
+        for bits, results in sets.items():
+            prefix = "Ext. set" if bits == EXT_ID_BITS else "Set"
+            filters.extend((f"{prefix} {i + 1}", bits, [pair]) for i, pair in enumerate(results))
+        self.set_result_text(text + self.fifo_text(filters, selected_ids))
+
+    def fifo_text(self, filters, selected_ids):
+        """FIFO assignment of [(label, bits, pairs), ...] for the results, empty with a single FIFO."""
         try:
-            if self.auto_filters_var.get():
-                # In Auto mode, we allow as many filters as needed to avoid collisions
-                # We simply pass a large number (e.g. number of selected IDs or a high hardware limit like 20)
-                # If the algorithm finds 0-collision merges, it takes them. 
-                # If it hits a wall where merging causes collisions, it stops if we are under max_filters.
-                max_filters = 20 # Common hardware limit, or could be len(selected_ids)
-            else:
-                max_filters = int(self.max_filters_var.get())
+            fifos = int(self.fifos_var.get())
         except:
-            max_filters = 1
-            
-        results, collisions = calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters)
-        
-        mode_str = "Auto" if self.auto_filters_var.get() else str(max_filters)
-        res_text = f"Selected IDs: {len(selected_ids)} | Max Filters: {mode_str} | Used: {len(results)}\n\n"
-        
+            fifos = 1
+        if fifos < 2 or not filters:
+            return ""
+        priority_ids = ()
+        below = self.priority_below_var.get().strip()
+        if below:
+            try:
+                limit = int(below, 0)
+            except ValueError:
+                messagebox.showerror("Error", f"Invalid ID for the high-priority FIFO: {below}")
+                limit = 0
+            priority_ids = [key for key in selected_ids if key[0] < limit]
+
+        traffic = {STD_ID_BITS: {}, EXT_ID_BITS: {}}
+        table = self.table
+        for row in range(len(table)):
+            traffic[EXT_ID_BITS if table.extended[row] else STD_ID_BITS][table.frame_ids[row]] = table.frequency[row]
+        return "\n" + format_fifo_assignment(assign_fifos(filters, traffic, fifos, priority_ids, selected_ids))
+
+    def replay_log(self):
+        """Streams a recorded trace through the last calculated filter sets."""
+        if self.last_results is None:
+            messagebox.showerror("Error", "Calculate the mask/filter sets first.")
+            return
+        bus = self.bus_settings()
+        if bus is None:
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("CAN Traces", "*.log *.asc *.csv"), ("All Files", "*.*")])
+        if not file_path:
+            return
+
+        selected_ids, sets = self.last_results
+        std_results = sets.get(STD_ID_BITS, [])
+        ext_results = sets.get(EXT_ID_BITS, [])
+        bitrate, data_bitrate, stuffing = bus
+        self.start_calculation(
+            lambda group_progress: format_replay_report(replay_log(file_path, std_results, ext_results, selected_ids, bitrate=bitrate, data_bitrate=data_bitrate,
+                                                                   stuffing=stuffing, progress=group_progress("Replay"))),
+            self.set_result_text,
+        )
+
+    def calculate_curve(self):
+        """Filter count vs. collisions for every count, from one merge run per ID group."""
+        if not self.checked_ids:
+            self.set_result_text("Please select at least one ID.")
+            return
+
+        groups = self.selection_groups()
+        weights = self.group_weights()
+        bus = self.bus_settings()
+        if bus is None:
+            return
+
+        def task(group_progress):
+            return [(label, bits, len(group_selected), calculate_filter_curve(group_selected, group_unselected, None, bits, weights[bits], group_progress(label)))
+                    for label, bits, group_selected, group_unselected in groups]
+
+        self.start_calculation(task, lambda curves: self.show_curve(curves, bus))
+
+    def plan_banks(self):
+        """Packs the checked IDs into the filter banks of the chosen controller."""
+        if not self.checked_ids:
+            self.set_result_text("Please select at least one ID.")
+            return
+
+        profile = PROFILES[self.bank_profile_var.get()]
+        groups = self.selection_groups()
+        weights = self.group_weights()
+        selected_ids = set(self.checked_ids)
+
+        def show(plan):
+            # Replay Log uses what the banks accept
+            self.last_results = (selected_ids, plan["results"])
+            bits_of = {label: bits for label, bits, _, _ in groups}
+            filters = [(f"{bank['pool']} #{bank['bank']}", bits_of[bank["group"]], bank_pairs(bank, bits_of[bank["group"]])) for bank in plan["banks"]]
+            self.set_result_text(format_bank_plan(plan) + self.fifo_text(filters, selected_ids))
+
+        self.start_calculation(lambda group_progress: plan_filter_banks(profile, groups, weights, group_progress(profile.name)), show)
+
+    def plan_nodes(self):
+        """Filters for the RX set of every receiving node, independent of the checked IDs."""
+        if not len(self.table):
+            messagebox.showerror("Error", "No DBC loaded.")
+            return
+        if not self.table.rx_rows:
+            messagebox.showerror("Error", "The DBC lists no receiving nodes for its signals.")
+            return
+
+        max_filters, _ = self.get_max_filters()
+        engine = ENGINE_NAMES[self.engine_var.get()]
+        objective = OBJECTIVE_NAMES[self.objective_var.get()]
+        limits = self.search_limits()
+        if limits is None:
+            return
+        budget, seed = limits
+        messages = self.session_messages()
+        names = {self.table.key(row): name for row, name in enumerate(self.table.names)}
+
+        def show(plan):
+            self.last_node_plans = plan
+            self.set_result_text(format_node_plans(plan, names))
+
+        self.start_calculation(
+            lambda group_progress: plan_all_nodes(messages, engine, max_filters, budget, objective, progress=group_progress("Nodes"), seed=seed),
+            show,
+        )
+
+    def save_node_plans(self):
+        if self.last_node_plans is None:
+            messagebox.showerror("Error", "Plan all nodes first.")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".h",
+            filetypes=[("Header Files", "*.h"), ("All Files", "*.*")],
+            initialfile="can_node_filters.h"
+        )
+        if not file_path:
+            return
+
+        try:
+            with open(file_path, 'w') as f:
+                f.write(node_plans_header_text(self.last_node_plans))
+            messagebox.showinfo("Success", f"File saved to {file_path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save file: {e}")
+
+    def start_calculation(self, task, on_done):
+        """
+        Runs task(group_progress) on a worker thread and hands its return
+        value to on_done on the Tk thread. A new calculation replaces any
+        one still running.
+        """
+        self.stop_calculation()
+        self.calc_generation += 1
+        self.calc_cancel = threading.Event()
+        results = queue.Queue()
+        worker = threading.Thread(target=self.calculation_worker, args=(task, self.calc_cancel, results), daemon=True)
+        self.set_calculating(True)
+        worker.start()
+        self.root.after(CALC_POLL_MS, self.poll_calculation, self.calc_generation, results, on_done)
+
+    def calculation_worker(self, task, cancel, results):
+        """
+        Runs on a worker thread: never touches Tk, only posts
+        ("progress", label, done, total), ("done", value), ("error", message)
+        or ("cancelled",) to `results`.
+        """
+        last_post = [0.0]
+
+        def group_progress(label):
+            def progress(done, total):
+                if cancel.is_set():
+                    raise CalculationCancelled()
+                now = time.monotonic()
+                if now - last_post[0] >= CALC_POLL_MS / 1000.0:
+                    last_post[0] = now
+                    results.put(("progress", label, done, total))
+            return progress
+
+        try:
+            results.put(("done", task(group_progress)))
+        except CalculationCancelled:
+            results.put(("cancelled",))
+        except Exception as e:
+            results.put(("error", str(e)))
+
+    def poll_calculation(self, generation, results, on_done):
+        if generation != self.calc_generation:
+            return # Cancelled or replaced by a newer calculation
+        try:
+            while True:
+                message = results.get_nowait()
+                kind = message[0]
+                if kind == "progress":
+                    _, label, done, total = message
+                    if total:
+                        percent = min(100.0, 100.0 * done / total)
+                        self.progress_bar.configure(value=percent)
+                        self.progress_var.set(f"{label}: {percent:.0f} %")
+                    else:
+                        self.progress_var.set(f"{label}: {done:.0f}")
+                    continue
+
+                self.set_calculating(False)
+                if kind == "done":
+                    on_done(message[1])
+                elif kind == "error":
+                    messagebox.showerror("Error", f"Calculation failed: {message[1]}")
+                return
+        except queue.Empty:
+            pass
+        self.root.after(CALC_POLL_MS, self.poll_calculation, generation, results, on_done)
+
+    def stop_calculation(self):
+        """Stops the running calculation, if any; its result is discarded. Returns True if one was running."""
+        if self.calc_cancel is None:
+            return False
+        self.calc_cancel.set()
+        self.calc_generation += 1
+        self.set_calculating(False)
+        return True
+
+    def cancel_calculation(self):
+        if self.stop_calculation():
+            self.set_result_text("Calculation cancelled.")
+
+    def set_calculating(self, running):
+        self.cancel_btn.configure(state=tk.NORMAL if running else tk.DISABLED)
+        self.progress_bar.configure(value=0)
+        self.progress_var.set("Calculating..." if running else "")
+        if not running:
+            self.calc_cancel = None
+
+    def format_calculation(self, groups, max_filters, engine, limits, weights, header_info, bus, group_progress, show_stats=False):
+        """
+        Runs the engine on every ID group within `limits` (time budget, seed).
+        Returns the result text and the sets per ID width
+        ({bits: [(mask, filter), ...]}). With `show_stats` every group ends
+        with the engine's CalcStats.
+        """
+        budget, seed = limits
+        objective = OBJECTIVE_NAMES[header_info[3]]
+        group_texts = []
+        sets = {}
+        used = 0
+        for label, bits, group_selected, group_unselected in groups:
+            stats = CalcStats() if show_stats else None
+            results, collisions, gap = run_engine(ENGINE_NAMES[engine], group_selected, group_unselected, max_filters, bits, budget, weights[bits], group_progress(label), stats, seed=seed)
+            used += len(results)
+            sets[bits] = results
+            text = self.format_group(label, bits, len(group_selected), results, collisions, gap, len(groups) > 1, bus, objective)
+            if stats is not None:
+                text += stats.format() + "\n"
+            group_texts.append(text)
+
+        return self.format_header(header_info, used) + "\n".join(group_texts), sets
+
+    def format_header(self, header_info, used):
+        selected_count, mode_str, engine, objective_label = header_info
+        return f"Selected IDs: {selected_count} | Max Filters: {mode_str} | Used: {used} | Engine: {engine} | Minimize: {objective_label}\n\n"
+
+    def unwanted_load(self, bits, collisions, bus):
+        """bus_load of the unselected messages a group's sets accept, for the Bus row settings `bus`."""
+        extended = bits == EXT_ID_BITS
+        return bus_load(self.table, self.table.rows_for((col_id, extended) for col_id in collisions), *bus)
+
+    def format_group(self, label, bits, selected_count, results, collisions, gap, several_groups, bus, objective="collisions"):
+        """
+        Result text of one ID group (standard or extended); `bus` as returned
+        by bus_settings, `objective` the one the exact engine's `gap` is in.
+        """
+        res_text = ""
+        if several_groups or bits == EXT_ID_BITS:
+            res_text += f"{label}: {selected_count} selected\n"
+        if gap is not None:
+            unit = GAP_UNITS[objective]
+            if gap == 0:
+                res_text += f"Exact search: proven minimum {unit}.\n"
+            else:
+                amount = gap if objective == "collisions" else f"{gap:.1f}"
+                res_text += f"Exact search: time budget reached, up to {amount} fewer {unit} may be possible.\n"
+
         for i, (mask, filter_val) in enumerate(results):
             res_text += f"Set {i+1}:\n"
-            res_text += f"  Mask:   {format_hex_bin(mask)}\n"
-            res_text += f"  Filter: {format_hex_bin(filter_val)}\n"
-            
+            res_text += f"  Mask:   {format_hex_bin(mask, bits)}\n"
+            res_text += f"  Filter: {format_hex_bin(filter_val, bits)}\n"
+
         if collisions:
             res_text += f"\nWarning: This accept {len(collisions)} unselected IDs:\n"
             # Get names for collisions
+            extended = bits == EXT_ID_BITS
             for col_id in collisions:
                 name = "?"
-                if self.db:
-                    try:
-                        name = self.db.get_message_by_frame_id(col_id).name
-                    except:
-                        pass
+                if (col_id, extended) in self.table.row_of:
+                    name = self.table.names[self.table.row_of[(col_id, extended)]]
                 res_text += f"  0x{col_id:X} ({name})\n"
+
+            unwanted = self.unwanted_load(bits, collisions, bus)
+            res_text += f"Unwanted traffic: {unwanted['frames_per_sec']:.1f} frames/s, {unwanted['bytes_per_sec']:.1f} B/s, "
+            res_text += f"bus load {unwanted['bus_load_percent']:.2f} %\n"
         else:
-            res_text += "\nPerfect match! No unselected IDs accepted."
-            
-        self.set_result_text(res_text)
+            res_text += "\nPerfect match! No unselected IDs accepted.\n"
+        return res_text
+
+    def show_curve(self, curves, bus):
+        """
+        Lists every point of the trade-off curves in a window; selecting a
+        point shows its sets in the results.
+        """
+        window = tk.Toplevel(self.root)
+        window.title("Filter Sets vs. Collisions")
+        window.geometry("740x400")
+
+        ttk.Label(window, text="One point per number of sets (select a row to show its sets):", padding=5).pack(anchor=tk.W)
+        columns = ("Group", "Sets", "Collisions", "Frames", "Bytes", "Load")
+        tree = ttk.Treeview(window, columns=columns, show="headings", selectmode="browse")
+        tree.heading("Group", text="IDs")
+        tree.heading("Sets", text="Sets")
+        tree.heading("Collisions", text="Unselected IDs accepted")
+        tree.heading("Frames", text="Unwanted frames/s")
+        tree.heading("Bytes", text="Unwanted B/s")
+        tree.heading("Load", text="Unwanted load %")
+        tree.column("Group", width=110)
+        for col in columns[1:]:
+            tree.column(col, width=120, anchor="center")
+        scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        points = {}
+        several_groups = len(curves) > 1
+        for label, bits, selected_count, curve in curves:
+            short_label = "29-bit" if bits == EXT_ID_BITS else "11-bit"
+            for results, collisions in curve:
+                unwanted = self.unwanted_load(bits, collisions, bus)
+                iid = tree.insert("", tk.END, values=(short_label, len(results), len(collisions), f"{unwanted['frames_per_sec']:.1f}",
+                                                      f"{unwanted['bytes_per_sec']:.1f}", f"{unwanted['bus_load_percent']:.2f}"))
+                points[iid] = (label, bits, selected_count, results, collisions)
+
+        def on_select(event):
+            for iid in tree.selection():
+                label, bits, selected_count, results, collisions = points[iid]
+                header = f"Trade-off point: {len(results)} sets | Engine: Incremental | Minimize: {self.objective_var.get()}\n\n"
+                self.set_result_text(header + self.format_group(label, bits, selected_count, results, collisions, None, several_groups, bus))
+
+        tree.bind("<<TreeviewSelect>>", on_select)
+
+    def toggle_live(self):
+        self.live_solvers = {}
+        self.live_settings = None
+        self.live_update()
+
+    def live_update(self, added=(), removed=()):
+        """
+        In Live mode, applies selection changes to the incremental solvers
+        and shows their results. The solvers are rebuilt from the current
+        selection when they do not exist yet or the settings changed.
+        """
+        if not self.live_var.get() or not len(self.table):
+            return
+        max_filters, mode_str = self.get_max_filters()
+        settings = (max_filters, self.objective_var.get())
+
+        if settings != self.live_settings:
+            weights = self.group_weights()
+            table = self.table
+            std_ids = [table.frame_ids[row] for row in range(len(table)) if not table.extended[row]]
+            ext_ids = [table.frame_ids[row] for row in range(len(table)) if table.extended[row]]
+            self.live_solvers = {
+                STD_ID_BITS: IncrementalFilterSolver(std_ids, max_filters, STD_ID_BITS, weights[STD_ID_BITS]),
+                EXT_ID_BITS: IncrementalFilterSolver(ext_ids, max_filters, EXT_ID_BITS, weights[EXT_ID_BITS]),
+            }
+            self.live_settings = settings
+            for bits, solver in self.live_solvers.items():
+                solver.reset([mid for mid, extended in self.checked_ids if extended == (bits == EXT_ID_BITS)])
+        else:
+            for mid, extended in removed:
+                self.live_solvers[EXT_ID_BITS if extended else STD_ID_BITS].remove(mid)
+            for mid, extended in added:
+                self.live_solvers[EXT_ID_BITS if extended else STD_ID_BITS].add(mid)
+
+        if not self.checked_ids:
+            self.set_result_text("Please select at least one ID.")
+            return
+        bus = self.bus_settings()
+        if bus is None:
+            return
+
+        groups = []
+        for label, bits in (("Standard IDs (11-bit)", STD_ID_BITS), ("Extended IDs (29-bit)", EXT_ID_BITS)):
+            solver = self.live_solvers[bits]
+            if solver.owner:
+                groups.append((label, bits, solver))
+
+        group_texts = []
+        used = 0
+        for label, bits, solver in groups:
+            results, collisions = solver.results()
+            used += len(results)
+            group_texts.append(self.format_group(label, bits, len(solver.owner), results, collisions, None, len(groups) > 1, bus))
+
+        header_info = (len(self.checked_ids), mode_str, "Live", self.objective_var.get())
+        self.set_result_text(self.format_header(header_info, used) + "\n".join(group_texts))
 
 if __name__ == "__main__":
+    # The refine engine starts worker processes, also from a frozen .exe
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="CAN Mask/Filter Calculator")
+    parser.add_argument("--lean", action="store_true", default=os.environ.get("CAN_FILTER_LEAN") == "1",
+                        help="Keep only compact per-message columns of a loaded DBC and report memory use (or set CAN_FILTER_LEAN=1)")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = CanFilterApp(root)
+    app = CanFilterApp(root, lean=args.lean)
     root.mainloop()
@@ -0,0 +1,326 @@
+"""
+Command-line front end for CI pipelines: loads one or more DBC files,
+selects messages by node, ID or name regex and prints the mask/filter
+sets, the data rate and (optionally) the generated headers as JSON.
+
+Independent (DBC, node) jobs run in a process pool. Does not import
+tkinter.
+
+Example:
+    python src/can_filter_cli.py vehicle.dbc --per-node --header-dir build/
+    python src/can_filter_cli.py vehicle.dbc --plan-all-nodes --header-dir build/
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from bus_load import DEFAULT_DATA_BITRATE, STUFFING, bus_load
+from dbc_cache import load_messages
+from dbc_model import DEFAULT_BAUD_RATE, OBJECTIVES, MessageTable, build_node_structure, generate_header_text, message_frequency, message_key, traffic_weights
+from filter_banks import PROFILES, bank_pairs, load_profile, plan_filter_banks
+from filter_calculator import ENGINES, CalcStats, EXT_ID_BITS, STD_ID_BITS, calculate_filter_curve, run_engine
+from log_replay import FORMATS, replay_log
+from node_plans import node_plans_header_text, plan_all_nodes
+from response_time import response_times
+from rx_fifo import assign_fifos
+
+AUTO_MAX_FILTERS = 20 # Same limit the GUI uses in Auto mode
+
+_loaded_dbcs = {} # Per-process cache: {path: [MessageInfo, ...]}
+
+
+def load_dbc(path, use_cache=True):
+    """MessageInfo list of a DBC, through the parsed-DBC cache."""
+    if path not in _loaded_dbcs:
+        _loaded_dbcs[path] = load_messages(path, use_cache)[0]
+    return _loaded_dbcs[path]
+
+
+def parse_id_list(values):
+    """Parses IDs given as '0x100,0x101 257' (hex or decimal)."""
+    ids = set()
+    for value in values or []:
+        for part in re.split(r"[,\s]+", value.strip()):
+            if part:
+                ids.add(int(part, 0))
+    return ids
+
+
+def select_messages(messages, node_structure, nodes=None, ids=None, regex=None):
+    """
+    Messages sent by any of `nodes`, with an ID in `ids` or a name matching
+    `regex`. With no criteria at all every message is selected.
+    """
+    if not nodes and not ids and not regex:
+        return list(messages)
+
+    # Keyed by (frame_id, extended): a standard and an extended frame may share an ID
+    selected = {}
+    for node in nodes or []:
+        for msg in node_structure.get(node, []):
+            selected[message_key(msg)] = msg
+    pattern = re.compile(regex) if regex else None
+    for msg in messages:
+        if (ids and msg.frame_id in ids) or (pattern and pattern.search(msg.name)):
+            selected[message_key(msg)] = msg
+    return [selected[key] for key in sorted(selected)]
+
+
+def format_filter_set(results, collisions, gap, bits, collision_messages, bus):
+    """JSON-ready sets and collisions; `bus` is (bitrate, data_bitrate, stuffing) for the unwanted load."""
+    width = (bits + 3) // 4
+    traffic = bus_load(MessageTable(collision_messages), None, *bus)
+    res = {
+        "sets": [{"mask": f"0x{m:0{width}X}", "filter": f"0x{f:0{width}X}"} for m, f in results],
+        "collisions": [f"0x{c:X}" for c in collisions],
+        "unwanted_traffic": {
+            "frames_per_sec": traffic["frames_per_sec"],
+            "bytes_per_sec": traffic["bytes_per_sec"],
+            "bus_load_percent": traffic["bus_load_percent"],
+        },
+    }
+    if gap is not None:
+        res["optimality_gap"] = gap
+    return res
+
+
+def run_job(job):
+    """
+    Runs one (DBC, selection) job and returns its JSON-ready result.
+    Module-level so it can be sent to worker processes.
+    """
+    messages = load_dbc(job["dbc"], job["use_cache"])
+    node_structure = build_node_structure(messages)
+    selected = select_messages(messages, node_structure, job.get("nodes"), job.get("ids"), job.get("regex"))
+    selected_keys = {message_key(msg) for msg in selected}
+    by_key = {message_key(msg): msg for msg in messages}
+    weights = {STD_ID_BITS: traffic_weights(messages, job["objective"]), EXT_ID_BITS: traffic_weights(messages, job["objective"], True)}
+
+    selection = {}
+    if job.get("nodes"):
+        selection["nodes"] = job["nodes"]
+    if job.get("ids"):
+        selection["ids"] = [f"0x{mid:X}" for mid in job["ids"]]
+    if job.get("regex"):
+        selection["regex"] = job["regex"]
+
+    bus = (job["bitrate"], job["data_bitrate"], job["stuffing"])
+    result = {
+        "dbc": job["dbc"],
+        "selection": selection,
+        "selected": [f"0x{msg.frame_id:X}" for msg in selected],
+        "filters": {},
+    }
+
+    sets = {STD_ID_BITS: [], EXT_ID_BITS: []}
+    groups = []
+    for label, bits, extended in (("standard", STD_ID_BITS, False), ("extended", EXT_ID_BITS, True)):
+        group_selected = sorted(msg.frame_id for msg in selected if msg.is_extended_frame == extended)
+        if not group_selected:
+            continue
+        group_unselected = [msg.frame_id for msg in messages if msg.is_extended_frame == extended and message_key(msg) not in selected_keys]
+        groups.append((label, bits, group_selected, group_unselected))
+        stats = CalcStats() if job.get("stats") else None
+        results, collisions, gap = run_engine(job["engine"], group_selected, group_unselected, job["max_filters"], bits, job["time_budget"], weights[bits], stats=stats,
+                                              workers=job.get("workers"), seed=job.get("seed"))
+        sets[bits] = results
+        result["filters"][label] = format_filter_set(results, collisions, gap, bits, [by_key[(c, extended)] for c in collisions], bus)
+        if stats is not None:
+            result["filters"][label]["stats"] = stats.as_dict()
+        if job.get("curve"):
+            result["filters"][label]["curve"] = [
+                format_filter_set(point_results, point_collisions, None, bits, [by_key[(c, extended)] for c in point_collisions], bus)
+                for point_results, point_collisions in calculate_filter_curve(group_selected, group_unselected, None, bits, weights[bits])
+            ]
+
+    # Filters routed to a FIFO: the engine's sets, or whole banks of a plan
+    filters = [(f"{label} set {i + 1}", bits, [pair]) for label, bits, _, _ in groups for i, pair in enumerate(sets[bits])]
+    if job.get("bank_profile"):
+        plan = plan_filter_banks(load_profile(job["bank_profile"]), groups, weights)
+        del plan["results"]
+        result["bank_plan"] = plan
+        bits_of = {label: bits for label, bits, _, _ in groups}
+        filters = [(f"{bank['pool']} #{bank['bank']}", bits_of[bank["group"]], bank_pairs(bank, bits_of[bank["group"]])) for bank in plan["banks"]]
+
+    if job.get("fifos"):
+        traffic = {STD_ID_BITS: {}, EXT_ID_BITS: {}}
+        for msg in messages:
+            traffic[EXT_ID_BITS if msg.is_extended_frame else STD_ID_BITS][msg.frame_id] = message_frequency(msg)
+        below = job.get("priority_below")
+        priority_ids = [key for key in selected_keys if below is not None and key[0] < below]
+        result["fifo_assignment"] = assign_fifos(filters, traffic, job["fifos"], priority_ids, selected_keys)
+
+    result["bus_load"] = bus_load(MessageTable(selected), None, *bus)
+    if job.get("response_times"):
+        # Every message of the DBC competes for the bus
+        table = MessageTable(messages)
+        result["response_times"] = response_times(table, table.rows_for(selected_keys), *bus)
+    if job.get("replay"):
+        result["replay"] = replay_log(job["replay"], sets[STD_ID_BITS], sets[EXT_ID_BITS], selected_keys, job.get("replay_format"),
+                                      bitrate=job["bitrate"], data_bitrate=job["data_bitrate"], stuffing=job["stuffing"])
+    return result
+
+
+def plan_nodes(dbc, args):
+    """
+    RX filters of every receiving node of one DBC. Returns the
+    plan_all_nodes result and its JSON-ready form.
+    """
+    messages = load_dbc(dbc, not args.no_cache)
+    by_key = {message_key(msg): msg for msg in messages}
+    plan = plan_all_nodes(messages, args.engine, args.max_filters, args.time_budget, args.objective, args.node, args.jobs, seed=args.seed)
+    return plan, {
+        "dbc": dbc,
+        "engine": plan["engine"],
+        "max_filters": plan["max_filters"],
+        "objective": plan["objective"],
+        "nodes": [
+            {
+                "node": node_plan["node"],
+                "rx_messages": node_plan["rx_messages"],
+                "sets_used": node_plan["sets_used"],
+                "filters": {
+                    label: dict(format_filter_set(group["results"], group["collisions"], group["gap"], group["bits"],
+                                                  [by_key[(c, group["bits"] == EXT_ID_BITS)] for c in group["collisions"]],
+                                                  (args.bitrate, args.data_bitrate, args.stuffing)),
+                                selected=[f"0x{mid:X}" for mid in group["selected"]])
+                    for label, group in node_plan["groups"].items()
+                },
+            }
+            for node_plan in plan["nodes"]
+        ],
+    }
+
+
+def build_jobs(args):
+    jobs = []
+    ids = parse_id_list(args.ids)
+    for dbc in args.dbc:
+        base = {
+            "dbc": dbc,
+            "ids": sorted(ids),
+            "regex": args.regex,
+            "engine": args.engine,
+            "objective": args.objective,
+            "use_cache": not args.no_cache,
+            "max_filters": args.max_filters,
+            "time_budget": args.time_budget,
+            "seed": args.seed,
+            "curve": args.curve,
+            "replay": args.replay,
+            "replay_format": args.replay_format,
+            "bitrate": args.bitrate,
+            "data_bitrate": args.data_bitrate,
+            "stuffing": args.stuffing,
+            "response_times": args.response_times,
+            "bank_profile": args.bank_profile,
+            "fifos": args.fifos,
+            "stats": args.stats,
+            "priority_below": args.priority_below,
+            # Processes of the refine engine; 1 once the jobs themselves run in a pool
+            "workers": args.jobs,
+        }
+        if args.per_node:
+            nodes = args.node or sorted(build_node_structure(load_dbc(dbc, not args.no_cache)))
+            for node in nodes:
+                jobs.append(dict(base, nodes=[node], ids=[], regex=None))
+        else:
+            jobs.append(dict(base, nodes=args.node or []))
+    return jobs
+
+
+def write_headers(dbcs, header_dir, use_cache=True):
+    """Writes <dbc name>.h for every DBC and returns {dbc: header path}."""
+    os.makedirs(header_dir, exist_ok=True)
+    written = {}
+    for dbc in dbcs:
+        path = os.path.join(header_dir, os.path.splitext(os.path.basename(dbc))[0] + ".h")
+        with open(path, 'w') as f:
+            f.write(generate_header_text(build_node_structure(load_dbc(dbc, use_cache))))
+        written[dbc] = path
+    return written
+
+
+def parse_max_filters(value):
+    if value == "auto":
+        return AUTO_MAX_FILTERS
+    return max(1, int(value))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate CAN mask/filter sets from DBC files.")
+    parser.add_argument("dbc", nargs="+", help="DBC file(s) to process")
+    parser.add_argument("--node", action="append", help="Select messages sent by this node (repeatable)")
+    parser.add_argument("--ids", action="append", help="Select IDs, e.g. '0x100,0x101' (repeatable)")
+    parser.add_argument("--regex", help="Select messages whose name matches this regex")
+    parser.add_argument("--per-node", action="store_true", help="One job per node (all nodes unless --node is given)")
+    parser.add_argument("--plan-all-nodes", action="store_true",
+                        help="Instead of selecting messages, plan the RX filters of every receiving node (or each --node)")
+    parser.add_argument("--engine", choices=ENGINES, default="incremental")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="collisions", help="Minimize unwanted IDs, frames/s or bytes/s")
+    parser.add_argument("--max-filters", type=parse_max_filters, default=AUTO_MAX_FILTERS, help="Number or 'auto' (default)")
+    parser.add_argument("--time-budget", type=float, default=5.0, help="Seconds for the exact and refine engines")
+    parser.add_argument("--seed", type=int, help="Seed for the refine engine: runs every annealing step and ignores "
+                                                 "--time-budget, so the same inputs give the same filters on any machine")
+    parser.add_argument("--curve", action="store_true", help="Also list the sets for every filter count (incremental engine)")
+    parser.add_argument("--replay", help="Replay this CAN trace (candump, ASC or CSV) through every job's filter sets")
+    parser.add_argument("--replay-format", choices=FORMATS, help="Trace format (default: from the file extension)")
+    parser.add_argument("--bitrate", type=float, default=DEFAULT_BAUD_RATE, help="Nominal bitrate for the bus load (bit/s)")
+    parser.add_argument("--data-bitrate", type=float, default=DEFAULT_DATA_BITRATE, help="CAN FD data-phase bitrate (bit/s)")
+    parser.add_argument("--stuffing", choices=STUFFING, default="worst", help="Bit stuffing model for the bus load")
+    parser.add_argument("--response-times", action="store_true", help="Also run worst-case response-time analysis on the selected messages")
+    parser.add_argument("--bank-profile", help=f"Also pack the selection into a controller's filter banks: {', '.join(PROFILES)} or a JSON profile file")
+    parser.add_argument("--fifos", type=int, help="Also assign the filters (or banks) to this many RX FIFOs, balancing frames/s")
+    parser.add_argument("--priority-below", type=lambda value: int(value, 0), help="With --fifos: filters accepting selected IDs below this one get FIFO 0 to themselves")
+    parser.add_argument("--stats", action="store_true", help="Add engine counters and per-phase timings to every filter group")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--header-dir", help="Also write <dbc name>.h headers into this directory")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    parser.add_argument("--no-cache", action="store_true", help="Always parse the DBC files, skip the parsed-DBC cache")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.plan_all_nodes:
+            # Nodes of one DBC are spread over the worker processes
+            output = {"node_plans": []}
+            node_headers = {}
+            for dbc in args.dbc:
+                plan, plan_json = plan_nodes(dbc, args)
+                output["node_plans"].append(plan_json)
+                if args.header_dir:
+                    os.makedirs(args.header_dir, exist_ok=True)
+                    path = os.path.join(args.header_dir, os.path.splitext(os.path.basename(dbc))[0] + "_node_filters.h")
+                    with open(path, 'w') as f:
+                        f.write(node_plans_header_text(plan))
+                    node_headers[dbc] = path
+            if args.header_dir:
+                output["node_filter_headers"] = node_headers
+        else:
+            jobs = build_jobs(args)
+            if args.jobs > 1 and len(jobs) > 1:
+                with ProcessPoolExecutor(max_workers=min(args.jobs, len(jobs))) as pool:
+                    results = list(pool.map(run_job, [dict(job, workers=1) for job in jobs]))
+            else:
+                results = [run_job(job) for job in jobs]
+            output = {"jobs": results}
+
+        if args.header_dir:
+            output["headers"] = write_headers(args.dbc, args.header_dir, not args.no_cache)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    text = json.dumps(output, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+On-disk cache of parsed DBC files.
+
+Parsing a large DBC with cantools takes seconds, but the app only needs a
+few fields per message. The first load stores those fields (see
+dbc_model.MessageInfo) in a packed binary file; later loads of the same
+DBC read them back with struct instead of parsing the DBC again.
+
+A cache file is keyed by the DBC path and is only used while the size,
+mtime and SHA-256 of the DBC still match the ones stored in it.
+
+Layout (little endian):
+    header   magic, version, message count, string count,
+             DBC size, DBC mtime (ns), DBC SHA-256
+    strings  byte length, then NUL-separated UTF-8 names
+    records  frame_id, name index, length, cycle time, flags
+             (extended, CAN FD), first node slot, sender count,
+             receiver count
+    nodes    string index per node slot: the senders of a message,
+             then its receivers
+"""
+import gc
+import hashlib
+import os
+import struct
+import tracemalloc
+
+from dbc_model import MessageInfo, MessageTable, extract_messages
+
+CACHE_MAGIC = b"CMFC"
+CACHE_VERSION = 3
+
+_HEADER = struct.Struct("<4sHIIQQ32s")
+_STRINGS_LEN = struct.Struct("<I")
+_RECORD = struct.Struct("<IIHIBIHH")
+_FLAG_EXTENDED = 0x01
+_FLAG_FD = 0x02
+
+
+def default_cache_dir():
+    """$CAN_FILTER_CACHE_DIR, or a can-mask-filter folder in the user cache dir."""
+    env_dir = os.environ.get("CAN_FILTER_CACHE_DIR")
+    if env_dir:
+        return env_dir
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "can-mask-filter")
+
+
+def cache_path(dbc_path, cache_dir=None):
+    key = hashlib.sha1(os.path.abspath(dbc_path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir or default_cache_dir(), key + ".bin")
+
+
+def _file_digest(data):
+    return hashlib.sha256(data).digest()
+
+
+def pack_messages(messages, size, mtime_ns, digest):
+    """Serializes MessageInfo objects into the cache layout."""
+    strings = {}
+
+    def string_index(text):
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    records = []
+    node_slots = []
+    for msg in messages:
+        flags = (_FLAG_EXTENDED if msg.is_extended_frame else 0) | (_FLAG_FD if msg.is_fd else 0)
+        records.append(_RECORD.pack(
+            msg.frame_id, string_index(msg.name), msg.length, int(msg.cycle_time or 0),
+            flags, len(node_slots), len(msg.senders), len(msg.receivers),
+        ))
+        node_slots.extend(string_index(sender) for sender in msg.senders)
+        node_slots.extend(string_index(receiver) for receiver in msg.receivers)
+
+    string_blob = "\0".join(strings).encode("utf-8")
+    return b"".join([
+        _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(messages), len(strings), size, mtime_ns, digest),
+        _STRINGS_LEN.pack(len(string_blob)),
+        string_blob,
+        b"".join(records),
+        struct.pack(f"<{len(node_slots)}I", *node_slots),
+    ])
+
+
+def unpack_messages(data):
+    """
+    Reads a cache file back. Returns (messages, size, mtime_ns, digest), or
+    None if the data is not a cache file of this version or its sections
+    do not match the counts in the header.
+    """
+    if len(data) < _HEADER.size or data[:4] != CACHE_MAGIC:
+        return None
+    _, version, n_messages, n_strings, size, mtime_ns, digest = _HEADER.unpack_from(data)
+    if version != CACHE_VERSION:
+        return None
+
+    offset = _HEADER.size
+    (strings_len,) = _STRINGS_LEN.unpack_from(data, offset)
+    offset += _STRINGS_LEN.size
+    strings = data[offset:offset + strings_len].decode("utf-8").split("\0") if n_strings else []
+    offset += strings_len
+    if len(strings) != n_strings:
+        return None
+
+    # Truncated or padded files: the node slots must end exactly at the end of the data
+    records_end = offset + n_messages * _RECORD.size
+    if records_end > len(data):
+        return None
+    records = list(_RECORD.iter_unpack(data[offset:records_end]))
+    # Record fields 5-7: first_slot, n_senders, n_receivers
+    n_slots = max((record[5] + record[6] + record[7] for record in records), default=0)
+    if len(data) != records_end + 4 * n_slots:
+        return None
+    slots = struct.unpack_from(f"<{n_slots}I", data, records_end)
+    if any(record[1] >= n_strings for record in records) or any(i >= n_strings for i in slots):
+        return None
+
+    messages = []
+    for frame_id, name_idx, length, cycle_time, flags, first_slot, n_senders, n_receivers in records:
+        senders = [strings[i] for i in slots[first_slot:first_slot + n_senders]]
+        receivers = [strings[i] for i in slots[first_slot + n_senders:first_slot + n_senders + n_receivers]]
+        messages.append(MessageInfo(frame_id, strings[name_idx], length, senders, cycle_time, bool(flags & _FLAG_EXTENDED),
+                                    bool(flags & _FLAG_FD), receivers))
+    return messages, size, mtime_ns, digest
+
+
+def load_messages(dbc_path, use_cache=True, cache_dir=None):
+    """
+    Returns (messages, db): the MessageInfo list for a DBC, and the cantools
+    database if the DBC had to be parsed (None when served from cache).
+    """
+    with open(dbc_path, "rb") as f:
+        data = f.read()
+    stat = os.stat(dbc_path)
+    digest = _file_digest(data)
+
+    path = cache_path(dbc_path, cache_dir)
+    if use_cache:
+        try:
+            with open(path, "rb") as f:
+                cached = unpack_messages(f.read())
+        except (OSError, struct.error, UnicodeDecodeError, IndexError):
+            cached = None
+        if cached is not None:
+            messages, size, mtime_ns, cached_digest = cached
+            if size == stat.st_size and mtime_ns == stat.st_mtime_ns and cached_digest == digest:
+                return messages, None
+
+    import cantools
+    db = cantools.database.load_file(dbc_path)
+    messages = extract_messages(db)
+
+    if use_cache:
+        try:
+            packed = pack_messages(messages, stat.st_size, stat.st_mtime_ns, digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(packed)
+            os.replace(tmp_path, path)
+        except (OSError, struct.error):
+            pass # A read-only cache folder or a value too large for a record field only costs speed
+
+    return messages, db
+
+
+def load_table(dbc_path, use_cache=True, cache_dir=None, measure=False):
+    """
+    Lean loading: the MessageTable of a DBC, with the MessageInfo list and
+    the cantools database released as soon as the table is built.
+
+    Returns (table, memory). With `measure`, memory is {"peak": bytes,
+    "loaded": bytes, "kept": bytes} traced by tracemalloc while loading:
+    the high-water mark, everything alive once the table was built and what
+    is left after the release. Tracing slows parsing down, so memory is
+    None without `measure`.
+    """
+    tracing = measure and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    try:
+        messages, db = load_messages(dbc_path, use_cache, cache_dir)
+        table = MessageTable(messages)
+        if not measure:
+            return table, None
+        loaded, peak = tracemalloc.get_traced_memory()
+        del messages, db
+        gc.collect()
+        return table, {"peak": peak, "loaded": loaded, "kept": tracemalloc.get_traced_memory()[0]}
+    finally:
+        if tracing:
+            tracemalloc.stop()
@@ -0,0 +1,393 @@
+"""
+DBC helpers shared by the GUI and the command-line tool.
+Nothing in here imports tkinter.
+"""
+from array import array
+
+DEFAULT_SENDER = "Vector__XXX"
+# Objectives for the filter engines: what an accepted unwanted ID costs
+OBJECTIVES = ("collisions", "frames", "bytes")
+DEFAULT_BAUD_RATE = 500000.0
+
+
+class MessageInfo:
+    """
+    The parts of a cantools Message the app uses. Attribute names match
+    cantools, so code written against Message objects works unchanged.
+    """
+    __slots__ = ("frame_id", "name", "length", "senders", "cycle_time", "is_extended_frame", "is_fd", "receivers")
+
+    def __init__(self, frame_id, name, length, senders, cycle_time, is_extended_frame, is_fd=False, receivers=None):
+        self.frame_id = frame_id
+        self.name = name
+        self.length = length
+        self.senders = senders
+        self.cycle_time = cycle_time
+        self.is_extended_frame = is_extended_frame
+        self.is_fd = is_fd
+        self.receivers = receivers or []
+
+    def __repr__(self):
+        return f"MessageInfo(0x{self.frame_id:X}, {self.name!r})"
+
+
+def extract_messages(db):
+    """Compact MessageInfo list for every message of a cantools database."""
+    return [
+        MessageInfo(msg.frame_id, msg.name, msg.length, list(msg.senders or []), get_cycle_time(msg), bool(msg.is_extended_frame),
+                    bool(getattr(msg, 'is_fd', False)), message_receivers(msg))
+        for msg in db.messages
+    ]
+
+
+def message_receivers(msg):
+    """
+    Nodes receiving a cantools Message: the receivers of all its signals
+    (and of the message itself where cantools has them), sorted, without
+    the Vector__XXX placeholder.
+    """
+    receivers = set(getattr(msg, 'receivers', None) or [])
+    for signal in getattr(msg, 'signals', None) or []:
+        receivers.update(signal.receivers or [])
+    receivers.discard(DEFAULT_SENDER)
+    return sorted(receivers)
+
+
+def get_cycle_time(msg):
+    """
+    Returns the cycle time of a message in ms, or 0 if it has none.
+    cantools puts it either in msg.cycle_time or in the GenMsgCycleTime
+    attribute, depending on how the DBC was parsed.
+    """
+    if getattr(msg, 'cycle_time', None):
+        return msg.cycle_time
+    attributes = getattr(msg, 'attributes', None)
+    if attributes and 'GenMsgCycleTime' in attributes:
+        try:
+            return int(attributes['GenMsgCycleTime'])
+        except:
+            pass
+    return 0
+
+
+def message_frequency(msg):
+    """Frames per second of a message, 0 if it has no cycle time."""
+    cycle_time = get_cycle_time(msg)
+    if cycle_time > 0:
+        return 1000.0 / cycle_time
+    return 0.0
+
+
+def message_key(msg):
+    """(frame_id, extended): tells a standard and an extended frame with the same ID apart."""
+    return (msg.frame_id, bool(msg.is_extended_frame))
+
+
+def traffic_weights(messages, objective, extended=False):
+    """
+    Per-ID weights for the filter engines of one ID width (29-bit IDs with
+    `extended`): {frame_id: frames/s} for the "frames" objective,
+    {frame_id: bytes/s} for "bytes" and None for "collisions" (every
+    unwanted ID counts the same).
+    """
+    messages = [msg for msg in messages if bool(msg.is_extended_frame) == extended]
+    if objective == "frames":
+        return {msg.frame_id: message_frequency(msg) for msg in messages}
+    if objective == "bytes":
+        return {msg.frame_id: message_frequency(msg) * msg.length for msg in messages}
+    return None
+
+
+def build_node_structure(messages):
+    """
+    Groups messages by sender node: {NodeName: [msg, ...]}, each list
+    sorted by ID. Messages without a sender go under Vector__XXX.
+    """
+    node_structure = {}
+    for msg in messages:
+        senders = msg.senders
+        if not senders:
+            senders = [DEFAULT_SENDER]
+
+        for sender in senders:
+            if sender not in node_structure:
+                node_structure[sender] = []
+            node_structure[sender].append(msg)
+
+    for node in node_structure:
+        node_structure[node].sort(key=lambda x: x.frame_id)
+
+    return node_structure
+
+
+def build_receiver_structure(messages):
+    """
+    Groups messages by receiving node: {NodeName: [msg, ...]}, each list
+    sorted by ID. Messages without receivers are left out.
+    """
+    receiver_structure = {}
+    for msg in messages:
+        for receiver in msg.receivers:
+            receiver_structure.setdefault(receiver, []).append(msg)
+
+    for msgs in receiver_structure.values():
+        msgs.sort(key=lambda x: x.frame_id)
+
+    return receiver_structure
+
+
+def bus_load_status(bus_load_percent):
+    if bus_load_percent <= 30:
+        return "OK (Low Load)"
+    elif bus_load_percent <= 50:
+        return "Standard Load"
+    elif bus_load_percent <= 70:
+        return "Warning: Load is getting high"
+    return "CRITICAL: Bus overload likely!"
+
+
+class MessageTable:
+    """
+    Everything the views need about the messages, computed once at load
+    time and held in parallel arrays indexed by row. Rows follow the
+    message order of the DBC; row_of maps a message key, (frame_id,
+    extended), to its row, so a standard and an extended frame with the
+    same numeric ID stay apart.
+
+    Columns: frame_ids, names, lengths, cycle_ms, frequency (Hz),
+    bytes_per_sec, extended (0/1), fd (0/1)
+    and node_index (first sender, index into node_names). node_rows lists the
+    rows sent by each node, rx_rows the rows each node receives, both
+    sorted by ID, and row_values holds the preformatted Treeview columns of
+    each row. messages() rebuilds MessageInfo objects, so the table alone
+    can stand in for the message list.
+    """
+
+    def __init__(self, messages):
+        self.frame_ids = array('L')
+        self.names = []
+        self.lengths = array('H')
+        self.cycle_ms = array('L')
+        self.frequency = array('d')
+        self.bytes_per_sec = array('d')
+        self.extended = bytearray()
+        self.fd = bytearray()
+        self.node_index = array('l')
+        self.row_values = []
+        self.row_of = {}
+
+        self.node_names = []
+        node_ids = {}
+        self.node_rows = {}
+        self.rx_rows = {}
+
+        for row, msg in enumerate(messages):
+            cycle_time = int(get_cycle_time(msg))
+            freq = 1000.0 / cycle_time if cycle_time > 0 else 0.0
+
+            self.frame_ids.append(msg.frame_id)
+            self.names.append(msg.name)
+            self.lengths.append(msg.length)
+            self.cycle_ms.append(cycle_time)
+            self.frequency.append(freq)
+            self.bytes_per_sec.append(freq * msg.length)
+            self.extended.append(1 if msg.is_extended_frame else 0)
+            self.fd.append(1 if getattr(msg, 'is_fd', False) else 0)
+            self.row_of[message_key(msg)] = row
+
+            senders = msg.senders or [DEFAULT_SENDER]
+            for sender in senders:
+                if sender not in node_ids:
+                    node_ids[sender] = len(self.node_names)
+                    self.node_names.append(sender)
+                    self.node_rows[sender] = []
+                self.node_rows[sender].append(row)
+            self.node_index.append(node_ids[senders[0]])
+            for receiver in msg.receivers:
+                self.rx_rows.setdefault(receiver, []).append(row)
+
+            freq_str = f"{freq:.1f}" if freq > 0 else "-"
+            bytes_str = f"{freq * msg.length:.1f}" if freq > 0 else "-"
+            self.row_values.append((f"0x{msg.frame_id:X}", msg.name, str(cycle_time), freq_str, bytes_str))
+
+        for rows in self.node_rows.values():
+            rows.sort(key=lambda r: self.frame_ids[r])
+        for rows in self.rx_rows.values():
+            rows.sort(key=lambda r: self.frame_ids[r])
+
+    def __len__(self):
+        return len(self.frame_ids)
+
+    def messages(self):
+        """MessageInfo list rebuilt from the columns, in row order."""
+        senders = [[] for _ in range(len(self))]
+        for node, rows in self.node_rows.items():
+            if node != DEFAULT_SENDER:
+                for row in rows:
+                    senders[row].append(node)
+        receivers = [[] for _ in range(len(self))]
+        for node in sorted(self.rx_rows):
+            for row in self.rx_rows[node]:
+                receivers[row].append(node)
+        return [
+            MessageInfo(self.frame_ids[row], self.names[row], self.lengths[row], senders[row], self.cycle_ms[row],
+                        bool(self.extended[row]), bool(self.fd[row]), receivers[row])
+            for row in range(len(self))
+        ]
+
+    def key(self, row):
+        """Message key (frame_id, extended) of a row."""
+        return (self.frame_ids[row], bool(self.extended[row]))
+
+    def rows_for(self, keys):
+        """Rows of the given message keys, skipping keys that are not in the table."""
+        row_of = self.row_of
+        return [row_of[key] for key in keys if key in row_of]
+
+    def traffic_weights(self, objective, extended=False):
+        """traffic_weights for the messages of one ID width in the table."""
+        if objective == "frames":
+            column = self.frequency
+        elif objective == "bytes":
+            column = self.bytes_per_sec
+        else:
+            return None
+        return {self.frame_ids[row]: column[row] for row in range(len(self)) if self.extended[row] == extended}
+
+
+class MessageSearchIndex:
+    """
+    Substring search over the message list, built once per MessageTable.
+
+    Every (node, message) pair the tree shows is an entry, numbered in
+    display order (nodes sorted by name, messages by ID). Each entry is
+    indexed by all 1- to 3-character substrings of its lowercase hex ID
+    and name, so queries up to 3 characters are a single lookup. Longer
+    queries check the entries of their rarest trigram, or the previous
+    result when the new query extends the previous one.
+    """
+    GRAM = 3
+
+    def __init__(self, table):
+        self.node_rows = table.node_rows
+        self.nodes = [(node, node.lower()) for node in sorted(table.node_rows)]
+        self.entry_node = []
+        self.entry_row = array('l')
+        self.texts = []
+        self.grams = {}
+        self.last_query = None
+        self.last_entries = None
+
+        grams = {}
+        for node, _ in self.nodes:
+            for row in table.node_rows[node]:
+                entry = len(self.texts)
+                # Same text filter_list used to match: hex(frame_id) or lowercase name
+                text = hex(table.frame_ids[row]) + "\n" + table.names[row].lower()
+                self.entry_node.append(node)
+                self.entry_row.append(row)
+                self.texts.append(text)
+                seen = set()
+                for size in range(1, self.GRAM + 1):
+                    for i in range(len(text) - size + 1):
+                        seen.add(text[i:i + size])
+                for gram in seen:
+                    if gram in grams:
+                        grams[gram].append(entry)
+                    else:
+                        grams[gram] = [entry]
+
+        for gram, entries in grams.items():
+            self.grams[gram] = array('l', entries)
+
+    def matching_entries(self, query):
+        """Entries whose hex ID or name contains `query`, in display order."""
+        if len(query) <= self.GRAM:
+            return self.grams.get(query, ())
+
+        candidates = None
+        if self.last_query and self.last_query in query:
+            candidates = self.last_entries
+        for i in range(len(query) - self.GRAM + 1):
+            entries = self.grams.get(query[i:i + self.GRAM])
+            if not entries:
+                return ()
+            if candidates is None or len(entries) < len(candidates):
+                candidates = entries
+
+        texts = self.texts
+        return [entry for entry in candidates if query in texts[entry]]
+
+    def search(self, query):
+        """
+        {NodeName: [table row, ...]} of the messages matching `query`: all
+        messages of nodes whose name contains it, plus any message whose
+        hex ID or name contains it.
+        """
+        query = query.lower()
+        entries = self.matching_entries(query)
+        self.last_query = query
+        self.last_entries = entries
+
+        structure = {}
+        entry_node = self.entry_node
+        entry_row = self.entry_row
+        for entry in entries:
+            node = entry_node[entry]
+            if node in structure:
+                structure[node].append(entry_row[entry])
+            else:
+                structure[node] = [entry_row[entry]]
+
+        for node, node_lower in self.nodes:
+            if query in node_lower:
+                structure[node] = self.node_rows[node]
+        return structure
+
+
+def macro_name(node_name, msg_name):
+    """
+    Builds the #define name for a message: CANID_[ModuleName]_[ShortMessageName]
+    """
+    n_str = node_name.upper().replace(" ", "_")
+    m_str = msg_name.upper().replace(" ", "_")
+
+    # Heuristic to avoid duplication (e.g. RCD_RCD_Error -> RCD_ERROR)
+    if m_str.startswith(n_str + "_"):
+        base_name = m_str
+    elif m_str == n_str: # Unusual but possible
+        base_name = m_str
+    else:
+        base_name = f"{n_str}_{m_str}"
+
+    name = f"CANID_{base_name}"
+
+    # Sanitize
+    return "".join(c if c.isalnum() or c == '_' else '_' for c in name)
+
+
+def generate_header_text(node_structure):
+    """Returns the contents of can_id_list.h for the given nodes."""
+    lines = [
+        "/*",
+        " * can_id_list.h",
+        " */",
+        "",
+        "#ifndef INC_CAN_ID_LIST_H_",
+        "#define INC_CAN_ID_LIST_H_",
+        "",
+        "#define SAFE_STATE_ID \t0",
+        "#define ERROR_MSG_ID\t1",
+        "",
+    ]
+
+    for node_name in sorted(node_structure.keys()):
+        lines += ["/*", f" * {node_name}", " */", ""]
+
+        for msg in sorted(node_structure[node_name], key=lambda x: x.frame_id):
+            lines.append(f"#define {macro_name(node_name, msg.name)} 0x{msg.frame_id:X}")
+
+        lines.append("")
+
+    lines.append("#endif /* INC_CAN_ID_LIST_H_ */")
+    return "\n".join(lines) + "\n"
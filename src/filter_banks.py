@@ -0,0 +1,359 @@
+"""
+Hardware filter-bank planning.
+
+A profile describes the acceptance filter hardware of a controller as
+pools of banks. Every bank of a pool is configured in one of the pool's
+modes, and a mode holds `capacity` entries of one kind:
+    mask   mask/filter pairs
+    list   exact IDs
+    range  ID ranges (from..to)
+Modes can be limited to standard or extended frames. Profiles can be
+added with register_profile() or loaded from JSON with load_profile():
+
+    {"name": "my-mcu", "description": "...", "pools": [
+        {"name": "filters", "banks": 14, "modes": [
+            {"name": "32-bit mask", "kind": "mask", "capacity": 1, "frames": ["std", "ext"]},
+            {"name": "32-bit list", "kind": "list", "capacity": 2, "frames": ["std", "ext"]}]}]}
+
+plan_filter_banks walks the sets/collisions curve of the incremental
+engine; at every point each mask/filter set goes to whichever mode needs
+the least bank space for it (exact IDs and ranges never collide), and the
+point with the fewest collisions that fits the banks wins.
+
+Does not import tkinter.
+"""
+import json
+from bisect import bisect_left, bisect_right
+
+from filter_calculator import EXT_ID_BITS, STD_ID_BITS, _integer_weights, calculate_filter_curve, make_id_index
+
+KINDS = ("mask", "list", "range")
+FRAMES = ("std", "ext")
+
+
+class BankMode:
+    """One way to configure a bank: `capacity` entries of `kind`."""
+    __slots__ = ("name", "kind", "capacity", "frames")
+
+    def __init__(self, name, kind, capacity, frames=FRAMES):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown bank mode kind: {kind}")
+        if capacity < 1:
+            raise ValueError(f"Bank mode {name} needs a capacity of at least 1")
+        self.name = name
+        self.kind = kind
+        self.capacity = capacity
+        self.frames = tuple(frames)
+
+
+class BankPool:
+    """`banks` identical banks, each configured in one of `modes`."""
+    __slots__ = ("name", "banks", "modes")
+
+    def __init__(self, name, banks, modes):
+        self.name = name
+        self.banks = banks
+        self.modes = list(modes)
+
+    def modes_for(self, frames):
+        return [mode for mode in self.modes if frames in mode.frames]
+
+
+class BankProfile:
+    __slots__ = ("name", "description", "pools")
+
+    def __init__(self, name, description, pools):
+        self.name = name
+        self.description = description
+        self.pools = list(pools)
+
+    def pool_for(self, frames):
+        """First pool with a mode for "std" or "ext" frames, None if there is none."""
+        for pool in self.pools:
+            if pool.modes_for(frames):
+                return pool
+        return None
+
+
+def _bxcan(name, banks, description):
+    return BankProfile(name, description, [BankPool("filter banks", banks, [
+        BankMode("32-bit mask", "mask", 1),
+        BankMode("32-bit list", "list", 2),
+        BankMode("16-bit mask", "mask", 2, ("std",)),
+        BankMode("16-bit list", "list", 4, ("std",)),
+    ])])
+
+
+def _fdcan(name, std_elements, ext_elements, description):
+    def modes(frames):
+        return [
+            BankMode("classic", "mask", 1, frames),
+            BankMode("dual ID", "list", 2, frames),
+            BankMode("range", "range", 1, frames),
+        ]
+    return BankProfile(name, description, [
+        BankPool("standard elements", std_elements, modes(("std",))),
+        BankPool("extended elements", ext_elements, modes(("ext",))),
+    ])
+
+
+PROFILES = {}
+
+
+def register_profile(profile):
+    PROFILES[profile.name] = profile
+    return profile
+
+
+register_profile(_bxcan("bxcan", 14, "STM32 bxCAN, 14 banks (single CAN)"))
+register_profile(_bxcan("bxcan-dual", 28, "STM32 bxCAN, 28 banks shared by CAN1/CAN2"))
+register_profile(_fdcan("fdcan-g4", 28, 8, "STM32G4 FDCAN, 28 standard and 8 extended filter elements"))
+register_profile(_fdcan("fdcan-h7", 128, 64, "STM32H7 FDCAN, 128 standard and 64 extended filter elements"))
+
+
+def profile_from_dict(data):
+    return BankProfile(data["name"], data.get("description", ""), [
+        BankPool(pool["name"], int(pool["banks"]), [
+            BankMode(mode["name"], mode["kind"], int(mode["capacity"]), mode.get("frames", FRAMES))
+            for mode in pool["modes"]
+        ])
+        for pool in data["pools"]
+    ])
+
+
+def load_profile(name_or_path):
+    """A registered profile by name, or a profile read from a JSON file."""
+    if name_or_path in PROFILES:
+        return PROFILES[name_or_path]
+    try:
+        with open(name_or_path) as f:
+            return profile_from_dict(json.load(f))
+    except OSError:
+        raise ValueError(f"Unknown filter bank profile: {name_or_path}")
+
+
+def _id_runs(members, unselected):
+    """Splits sorted `members` wherever an unselected ID lies between two of them."""
+    runs = [[members[0], members[0]]]
+    for can_id in members[1:]:
+        last = runs[-1][1]
+        if bisect_left(unselected, can_id) > bisect_right(unselected, last):
+            runs.append([can_id, can_id])
+        else:
+            runs[-1][1] = can_id
+    return runs
+
+
+class _GroupPlanner:
+    """Cheapest mode per mask/filter set of one ID group, memoized across curve points."""
+
+    def __init__(self, selected_ids, unselected_ids, bits, modes, weights):
+        self.selected = make_id_index(selected_ids, bits)
+        self.unselected = make_id_index(unselected_ids, bits)
+        self.unselected_sorted = sorted(unselected_ids)
+        self.modes = modes
+        # Integer units as the engines score them, so no accepted ID is free
+        self.weights = _integer_weights(weights)
+        self.memo = {}
+
+    def cost(self, collisions):
+        if self.weights is None:
+            return len(collisions)
+        return sum(self.weights.get(can_id, 1) for can_id in collisions)
+
+    def entries(self, mask, filter_val):
+        """(mode, entries, collisions) that takes the least bank space for one set."""
+        key = (mask, filter_val)
+        choice = self.memo.get(key)
+        if choice is not None:
+            return choice
+        members = sorted(self.selected.matches(mask, filter_val))
+        collisions = self.unselected.matches(mask, filter_val)
+        runs = None
+        best = None
+        for mode in self.modes:
+            if mode.kind == "mask":
+                entries = [("mask", mask, filter_val)]
+                mode_collisions = collisions
+            elif mode.kind == "list":
+                entries = [("list", can_id) for can_id in members]
+                mode_collisions = []
+            else:
+                if runs is None:
+                    runs = _id_runs(members, self.unselected_sorted)
+                entries = [("range", low, high) for low, high in runs]
+                mode_collisions = []
+            score = (len(entries) / mode.capacity, self.cost(mode_collisions))
+            if best is None or score < best[0]:
+                best = (score, mode, entries, mode_collisions)
+        choice = self.memo[key] = best[1:]
+        return choice
+
+    def option(self, results):
+        """(banks, collision cost, {mode name: entries}, collisions) for one curve point."""
+        by_mode = {}
+        collisions = set()
+        for mask, filter_val in results:
+            mode, entries, mode_collisions = self.entries(mask, filter_val)
+            by_mode.setdefault(mode.name, []).extend(entries)
+            collisions.update(mode_collisions)
+        capacity = {mode.name: mode.capacity for mode in self.modes}
+        banks = sum(-(-len(entries) // capacity[name]) for name, entries in by_mode.items())
+        return banks, self.cost(collisions), by_mode, sorted(collisions)
+
+
+def _pareto(options):
+    """Options no other option beats on both banks and collision cost, fewest banks first."""
+    front = []
+    for option in sorted(options, key=lambda o: (o[0], o[1])):
+        if not front or option[1] < front[-1][1]:
+            front.append(option)
+    return front
+
+
+def _range_pairs(low, high, bits):
+    """Mask/filter pairs accepting exactly the IDs low..high (aligned power-of-two blocks)."""
+    full = (1 << bits) - 1
+    pairs = []
+    while low <= high:
+        size = low & -low if low else 1 << bits
+        while size > high - low + 1:
+            size >>= 1
+        pairs.append((full & ~(size - 1), low))
+        low += size
+    return pairs
+
+
+def entry_pairs(entry, bits):
+    """Mask/filter pairs that accept the same IDs as a bank entry."""
+    if entry[0] == "mask":
+        return [(entry[1], entry[2])]
+    if entry[0] == "list":
+        return [((1 << bits) - 1, entry[1])]
+    return _range_pairs(entry[1], entry[2], bits)
+
+
+def _format_entry(entry, bits):
+    width = (bits + 3) // 4
+    if entry[0] == "mask":
+        return {"mask": f"0x{entry[1]:0{width}X}", "filter": f"0x{entry[2]:0{width}X}"}
+    if entry[0] == "list":
+        return {"id": f"0x{entry[1]:X}"}
+    return {"from": f"0x{entry[1]:X}", "to": f"0x{entry[2]:X}"}
+
+
+def bank_pairs(bank, bits):
+    """Mask/filter pairs that accept the same IDs as one bank of a plan_filter_banks result."""
+    pairs = []
+    for entry in bank["entries"]:
+        if "mask" in entry:
+            pairs.append((int(entry["mask"], 16), int(entry["filter"], 16)))
+        elif "id" in entry:
+            pairs.append(((1 << bits) - 1, int(entry["id"], 16)))
+        else:
+            pairs.extend(_range_pairs(int(entry["from"], 16), int(entry["to"], 16), bits))
+    return pairs
+
+
+def plan_filter_banks(profile, groups, weights=None, progress=None):
+    """
+    Packs the ID groups [(label, bits, selected, unselected), ...] (as
+    built for the filter engines) into the banks of `profile`, trading
+    collisions for bank space only when the banks run out. `weights` holds
+    the engines' traffic weights per ID width ({bits: weights});
+    `progress(done, total)` goes to the curve calculation of every group.
+
+    Returns a dict with profile, banks_used, banks_available, fits,
+    collisions (per group label), results ({bits: [(mask, filter), ...]}
+    accepting exactly what the banks accept, as the engines return them,
+    with list and range entries written as exact pairs) and banks: one
+    entry per used bank with pool, mode, group and its entries.
+    """
+    planned = []
+    for label, bits, selected, unselected in groups:
+        if not selected:
+            continue
+        frames = "ext" if bits == EXT_ID_BITS else "std"
+        pool = profile.pool_for(frames)
+        if pool is None:
+            raise ValueError(f"Profile {profile.name} has no banks for {label}")
+        group_weights = (weights or {}).get(bits)
+        planner = _GroupPlanner(selected, unselected, bits, pool.modes_for(frames), group_weights)
+        options = []
+        for results, _ in calculate_filter_curve(selected, unselected, None, bits, group_weights, progress):
+            options.append(planner.option(results) + (results,))
+        planned.append((label, bits, pool, planner, _pareto(options)))
+
+    # Groups that share a pool compete for its banks
+    chosen = {}
+    fits = True
+    for pool in profile.pools:
+        members = [p for p in planned if p[2] is pool]
+        if not members:
+            continue
+        best = None
+        combos = [[]]
+        for member in members:
+            combos = [combo + [option] for combo in combos for option in member[4]]
+        for combo in combos:
+            banks = sum(option[0] for option in combo)
+            score = (banks > pool.banks, sum(option[1] for option in combo) if banks <= pool.banks else banks, banks)
+            if best is None or score < best[0]:
+                best = (score, combo)
+        if best[0][0]:
+            fits = False
+        for member, option in zip(members, best[1]):
+            chosen[member[0]] = option
+
+    banks = []
+    collisions = {}
+    results = {STD_ID_BITS: [], EXT_ID_BITS: []}
+    used = {pool.name: 0 for pool in profile.pools}
+    for label, bits, pool, planner, _ in planned:
+        _, _, by_mode, group_collisions, _ = chosen[label]
+        collisions[label] = [f"0x{can_id:X}" for can_id in group_collisions]
+        for mode in planner.modes:
+            entries = by_mode.get(mode.name, [])
+            for entry in entries:
+                results[bits].extend(entry_pairs(entry, bits))
+            for start in range(0, len(entries), mode.capacity):
+                banks.append({
+                    "pool": pool.name,
+                    "bank": used[pool.name],
+                    "mode": mode.name,
+                    "group": label,
+                    "entries": [_format_entry(entry, bits) for entry in entries[start:start + mode.capacity]],
+                })
+                used[pool.name] += 1
+
+    return {
+        "profile": profile.name,
+        "banks_used": len(banks),
+        "banks_available": sum(pool.banks for pool in profile.pools if any(p[2] is pool for p in planned)),
+        "fits": fits,
+        "collisions": collisions,
+        "results": results,
+        "banks": banks,
+    }
+
+
+def format_bank_plan(plan):
+    """Plain-text listing of a plan_filter_banks result for the GUI."""
+    lines = [
+        f"Filter bank plan for {plan['profile']}: {plan['banks_used']} of {plan['banks_available']} banks used"
+        + ("" if plan["fits"] else " (DOES NOT FIT)"),
+    ]
+    for label, group_collisions in plan["collisions"].items():
+        lines.append(f"{label}: {len(group_collisions)} collisions" + (f" ({', '.join(group_collisions)})" if group_collisions else ""))
+    lines.append("")
+    for bank in plan["banks"]:
+        entries = []
+        for entry in bank["entries"]:
+            if "mask" in entry:
+                entries.append(f"mask {entry['mask']} filter {entry['filter']}")
+            elif "id" in entry:
+                entries.append(entry["id"])
+            else:
+                entries.append(f"{entry['from']}..{entry['to']}")
+        lines.append(f"{bank['pool']} #{bank['bank']} [{bank['mode']}]: " + ", ".join(entries))
+    return "\n".join(lines) + "\n"
@@ -1,13 +1,281 @@
-def calculate_mask_filter(selected_ids):
+import heapq
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+STD_ID_BITS = 11
+STD_ID_MASK = (1 << STD_ID_BITS) - 1
+EXT_ID_BITS = 29
+EXT_ID_MASK = (1 << EXT_ID_BITS) - 1
+
+# Traffic weights are scored in integer units of 1/WEIGHT_SCALE
+WEIGHT_SCALE = 1000
+
+class CalculationCancelled(Exception):
+    """Raised from a progress callback to abandon a running calculation."""
+
+
+class CalcStats:
+    """
+    Counters and per-phase wall time of an engine run. Pass one as `stats`
+    to an engine (or run_engine) and read it afterwards; engines only touch
+    it between phases and add up plain local counts, so runs without one
+    pay nothing.
+
+    counters: merge_iterations, pairs_scored, collision_checks (mask/filter
+    pairs tested against the unselected IDs) and engine specific ones.
+    phases: {phase name: seconds}, in the order the phases first ran.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.phases = {}
+        self.last = time.perf_counter()
+
+    def start(self):
+        """Called by the engines on entry, so time between runs is not charged."""
+        self.last = time.perf_counter()
+
+    def add(self, name, count=1):
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def lap(self, phase):
+        """Charges the time since the previous lap (or creation) to `phase`."""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    @property
+    def total_time(self):
+        return sum(self.phases.values())
+
+    def as_dict(self):
+        return {
+            "counters": dict(self.counters),
+            "phases_s": dict(self.phases),
+            "total_s": self.total_time,
+        }
+
+    def format(self):
+        """One-line summary for the results pane."""
+        counters = ", ".join(f"{name.replace('_', ' ')} {count}" for name, count in self.counters.items())
+        phases = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items())
+        return f"Stats: {self.total_time * 1000:.1f} ms ({phases}); {counters}"
+
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(value):
+        return bin(value).count("1")
+
+
+@lru_cache(maxsize=65536)
+def _cube_bitmap(mask, filter_val, bits=STD_ID_BITS):
+    """
+    Returns a bitmap of the ID space (bit N set = ID N) holding every ID
+    accepted by the (mask, filter_val) pair.
+    """
+    cube = 1 << (filter_val & mask)
+    free = ~mask & ((1 << bits) - 1)
+    bit = 0
+    while free:
+        if free & 1:
+            # Every accepted ID with this bit cleared has a twin with it set
+            cube |= cube << (1 << bit)
+        free >>= 1
+        bit += 1
+    return cube
+
+
+class IdBitmap:
+    """
+    Holds a list of 11-bit CAN IDs as bitmaps over the 2048-entry ID space,
+    so the number of IDs accepted by a mask/filter pair is a popcount.
+
+    IDs listed more than once are kept in stacked layers (layer N holds the
+    IDs listed more than N times) so counts match a plain loop over the list.
+    With `weights` ({ID: weight}) counts become sums of the weights instead.
+    """
+
+    def __init__(self, ids, weights=None):
+        self.layers = []
+        self.ids_by_key = {}
+        self.key_weights = None if weights is None else {}
+        for can_id in ids:
+            key = can_id & STD_ID_MASK
+            self.ids_by_key.setdefault(key, []).append(can_id)
+            if weights is not None:
+                self.key_weights[key] = self.key_weights.get(key, 0) + weights.get(can_id, 0)
+            bit = 1 << key
+            for i, layer in enumerate(self.layers):
+                if not layer & bit:
+                    self.layers[i] = layer | bit
+                    break
+            else:
+                self.layers.append(bit)
+
+    def __bool__(self):
+        return bool(self.layers)
+
+    def count(self, mask, filter_val):
+        """Number of IDs (with repeats) accepted by the pair."""
+        if not self.layers:
+            return 0
+        return self.count_set(_cube_bitmap(mask, filter_val & mask))
+
+    def match_set(self, mask, filter_val):
+        """IDs accepted by the pair, as a bitmap that can be OR-ed with others."""
+        if not self.layers:
+            return 0
+        return self.layers[0] & _cube_bitmap(mask, filter_val & mask)
+
+    def count_set(self, id_set):
+        """Number of IDs (with repeats) inside a bitmap from match_set."""
+        if not self.layers:
+            return 0
+        if self.key_weights is not None:
+            key_weights = self.key_weights
+            return sum(key_weights[key] for key in _set_positions(self.layers[0] & id_set))
+        if len(self.layers) == 1:
+            return _popcount(self.layers[0] & id_set)
+        total = 0
+        for layer in self.layers:
+            hits = layer & id_set
+            if not hits:
+                break
+            total += _popcount(hits)
+        return total
+
+    def matches(self, mask, filter_val):
+        """Distinct IDs accepted by the pair."""
+        return self.ids_in_set(self.match_set(mask, filter_val))
+
+    def ids_in_set(self, id_set):
+        """Distinct IDs inside a bitmap from match_set, lowest first."""
+        found = []
+        while id_set:
+            low = id_set & -id_set
+            found.extend(self.ids_by_key[low.bit_length() - 1])
+            id_set ^= low
+        return found
+
+
+class SortedIdIndex:
+    """
+    Holds a list of CAN IDs of any width (29-bit extended IDs in practice)
+    as a sorted array of distinct IDs plus one bit slice per ID bit: slice
+    N has a bit set for every array position whose ID has bit N set.
+    IDs accepted by a mask/filter pair are an AND of at most 29 slices, so
+    the cost follows the number of stored IDs, not the size of the ID
+    space. Sets of IDs are bitmaps over positions in the sorted array.
+    With `weights` ({ID: weight}) counts become sums of the weights instead.
+    """
+
+    def __init__(self, ids, bits=EXT_ID_BITS, weights=None):
+        self.bits = bits
+        full = (1 << bits) - 1
+        self.ids_by_key = {}
+        for can_id in ids:
+            self.ids_by_key.setdefault(can_id & full, []).append(can_id)
+        self.keys = sorted(self.ids_by_key)
+        self.all = (1 << len(self.keys)) - 1
+        self.key_weights = None
+        if weights is not None:
+            self.key_weights = [sum(weights.get(can_id, 0) for can_id in self.ids_by_key[key]) for key in self.keys]
+
+        self.ones = [0] * bits
+        # Repeat layers over positions, as in IdBitmap
+        self.layers = []
+        for pos, key in enumerate(self.keys):
+            bit = 1 << pos
+            for b in range(bits):
+                if key >> b & 1:
+                    self.ones[b] |= bit
+            for depth in range(len(self.ids_by_key[key])):
+                if depth == len(self.layers):
+                    self.layers.append(0)
+                self.layers[depth] |= bit
+        self.zeros = [self.all ^ ones for ones in self.ones]
+
+    def __bool__(self):
+        return bool(self.keys)
+
+    def count(self, mask, filter_val):
+        """Number of IDs (with repeats) accepted by the pair."""
+        return self.count_set(self.match_set(mask, filter_val))
+
+    def match_set(self, mask, filter_val):
+        """IDs accepted by the pair, as a bitmap over sorted positions."""
+        id_set = self.all
+        mask &= (1 << self.bits) - 1
+        while mask and id_set:
+            bit = mask & -mask
+            b = bit.bit_length() - 1
+            id_set &= self.ones[b] if filter_val & bit else self.zeros[b]
+            mask ^= bit
+        return id_set
+
+    def count_set(self, id_set):
+        """Number of IDs (with repeats) inside a bitmap from match_set."""
+        if self.key_weights is not None:
+            key_weights = self.key_weights
+            return sum(key_weights[pos] for pos in _set_positions(id_set))
+        total = 0
+        for layer in self.layers:
+            hits = layer & id_set
+            if not hits:
+                break
+            total += _popcount(hits)
+        return total
+
+    def matches(self, mask, filter_val):
+        """Distinct IDs accepted by the pair."""
+        return self.ids_in_set(self.match_set(mask, filter_val))
+
+    def ids_in_set(self, id_set):
+        """Distinct IDs inside a bitmap from match_set, lowest first."""
+        found = []
+        for pos in _set_positions(id_set):
+            found.extend(self.ids_by_key[self.keys[pos]])
+        return found
+
+
+def _set_positions(id_set):
+    while id_set:
+        low = id_set & -id_set
+        yield low.bit_length() - 1
+        id_set ^= low
+
+def make_id_index(ids, bits=STD_ID_BITS, weights=None):
+    """IdBitmap for 11-bit IDs, SortedIdIndex for wider ones."""
+    if bits <= STD_ID_BITS:
+        return IdBitmap(ids, weights)
+    return SortedIdIndex(ids, bits, weights)
+
+def _integer_weights(weights):
     """
-    Calculates the mask and filter for a list of 11-bit CAN IDs.
+    Scales traffic weights ({ID: frames/s or bytes/s}) to integer units so
+    merge costs stay exact. Every ID costs at least one unit, so accepting
+    an event-driven frame without a known rate is never free.
+    """
+    if weights is None:
+        return None
+    return {can_id: int(round(w * WEIGHT_SCALE)) + 1 for can_id, w in weights.items()}
+
+
+def calculate_mask_filter(selected_ids, bits=STD_ID_BITS):
+    """
+    Calculates the mask and filter for a list of CAN IDs, 11-bit by
+    default or 29-bit with bits=EXT_ID_BITS.
     Returns a tuple (mask, filter_val).
     """
     if not selected_ids:
         return 0, 0
 
-    # Initialize mask to all 1s (11 bits)
-    mask = 0x7FF
+    # Initialize mask to all 1s (11 or 29 bits)
+    mask = (1 << bits) - 1
     # Initialize filter to the first ID (will be adjusted)
     filter_val = selected_ids[0]
 
@@ -25,15 +293,24 @@ def calculate_mask_filter(selected_ids):
 
     return mask, filter_val
 
-def calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters=1):
+def calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters=1, bits=STD_ID_BITS, weights=None, progress=None, stats=None):
     """
     Calculates up to `max_filters` mask/filter pairs to cover `selected_ids`
-    while minimizing collisions with `unselected_ids`.
+    while minimizing collisions with `unselected_ids`. `bits` is the ID
+    width (STD_ID_BITS or EXT_ID_BITS). With `weights` ({unselected ID:
+    frames/s or bytes/s}) merges are scored by the traffic they let in
+    instead of the number of collisions.
+
+    `progress(done, total)` is called after every merge; it may raise
+    CalculationCancelled to stop the calculation. `stats` is an optional
+    CalcStats.
     
     Returns:
        results: List of tuples (mask, filter_val)
        collisions: List of unselected_ids that are wrongly accepted
     """
+    if stats is not None:
+        stats.start()
     if not selected_ids:
         return [], []
         
@@ -44,16 +321,19 @@ def calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters=1
     
     # Helper to calculate mask/filter for a cluster
     def calc_mf(ids):
-        return calculate_mask_filter(ids)
+        return calculate_mask_filter(ids, bits)
         
+    # Unselected IDs as a bitmap of the 11-bit ID space (sorted index for 29-bit)
+    unselected_map = make_id_index(unselected_ids, bits, _integer_weights(weights))
+    if stats is not None:
+        stats.lap("index")
+    iterations = 0
+    scored = 0
+
     # Helper to count collisions for a cluster
     def count_collisions(cluster_ids):
         m, f = calc_mf(cluster_ids)
-        cols = 0
-        for uid in unselected_ids:
-            if (uid & m) == (f & m):
-                cols += 1
-        return cols
+        return unselected_map.count(m, f)
         
     # 2. Greedy merge loop
     # We want to reduce len(clusters) to <= max_filters
@@ -61,6 +341,9 @@ def calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters=1
     # If we are under max_filters, we stop.
     
     while len(clusters) > 1:
+        if progress is not None:
+            progress(len(selected_ids) - len(clusters), len(selected_ids) - 1)
+        iterations += 1
         best_merge = None
         min_added_collisions = float('inf')
         
@@ -70,6 +353,7 @@ def calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters=1
                 new_cluster = clusters[i] + clusters[j]
                 
                 cols = count_collisions(new_cluster)
+                scored += 1
                 
                 
                 if cols < min_added_collisions:
@@ -97,6 +381,12 @@ def calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters=1
         else:
             # We are safe to stop
             break
+
+    if stats is not None:
+        stats.lap("pair scan")
+        stats.add("merge_iterations", iterations)
+        stats.add("pairs_scored", scored)
+        stats.add("collision_checks", scored + len(clusters))
             
     # 3. Calculate final results
     results = []
@@ -106,11 +396,766 @@ def calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters=1
         m, f = calc_mf(cluster)
         results.append((m, f))
         # Collect actual collisions
-        for uid in unselected_ids:
-            if (uid & m) == (f & m):
-                final_collisions.add(uid)
+        final_collisions.update(unselected_map.matches(m, f))
+
+    if stats is not None:
+        stats.lap("collect")
                 
     return results, sorted(list(final_collisions))
 
-def format_hex_bin(value, bits=11):
-    return f"0x{value:03X} (bin: {value:0{bits}b})"
+def cluster_mask_filter(and_val, or_val, bits=STD_ID_BITS):
+    """
+    Mask and filter of a cluster given the AND and OR of all its IDs.
+    Bits where AND and OR agree are shared by every ID in the cluster.
+    """
+    mask = ~(and_val ^ or_val) & ((1 << bits) - 1)
+    return mask, and_val & mask
+
+def _merge_clusters(clusters, unselected_map, max_filters, bits=STD_ID_BITS, progress=None, record=None, stats=None):
+    """
+    Greedily merges (and, or) cluster aggregates, cheapest merge first.
+    Merge costs live in a heap; after a merge only the pairs involving the
+    new cluster are scored. Returns the remaining aggregates.
+
+    `progress(done, total)` counts clusters scored, then merges made.
+    `record(aggregates)` is called before every merge that accepts more
+    IDs and once at the end: each call is what a run whose max_filters is
+    at least len(aggregates) (and below the previous call's) returns.
+    `stats` (a CalcStats) gets the "initial scoring" and "merging" phases.
+    """
+    if not unselected_map:
+        # Nothing to collide with, every merge is free
+        and_val, or_val = clusters[0]
+        for a, o in clusters[1:]:
+            and_val &= a
+            or_val |= o
+        if record is not None:
+            record([(and_val, or_val)])
+        if stats is not None:
+            stats.add("merge_iterations", len(clusters) - 1)
+            stats.lap("merging")
+        return [(and_val, or_val)]
+
+    alive = dict(enumerate(clusters))
+    next_key = len(clusters)
+    count = unselected_map.count
+    full = (1 << bits) - 1
+    layer = None
+    if isinstance(unselected_map, IdBitmap) and unselected_map.key_weights is None and len(unselected_map.layers) == 1:
+        layer = unselected_map.layers[0]
+
+    def cost(a, b):
+        and_val = a[0] & b[0]
+        mask = ~(and_val ^ (a[1] | b[1])) & full
+        if layer is not None:
+            # Common case of no repeated IDs, skip the method call
+            return _popcount(layer & _cube_bitmap(mask, and_val & mask))
+        return count(mask, and_val & mask)
+
+    # Heap entries are packed as cost << 40 | i << 20 | j, which orders
+    # like (cost, i, j) but compares much faster than tuples
+    keys = list(alive)
+    total = 2 * len(keys) - 1
+    heap = []
+    for pos, i in enumerate(keys):
+        if progress is not None:
+            progress(pos, total)
+        ci = alive[i]
+        for j in keys[pos + 1:]:
+            heap.append((cost(ci, alive[j]) << 40) | (i << 20) | j)
+    heapq.heapify(heap)
+    scored = len(heap)
+    merges = 0
+    stale = 0
+    if stats is not None:
+        stats.lap("initial scoring")
+
+    while heap and len(alive) > 1:
+        entry = heapq.heappop(heap)
+        i = (entry >> 20) & 0xFFFFF
+        j = entry & 0xFFFFF
+        if i not in alive or j not in alive:
+            stale += 1
+            continue # Stale entry, one side was merged already
+
+        # Zero-collision merges are always taken, others only while over budget
+        if entry >> 40:
+            if len(alive) <= max_filters:
+                break
+            if record is not None:
+                record(list(alive.values()))
+
+        if progress is not None:
+            progress(next_key, total)
+
+        a = alive.pop(i)
+        b = alive.pop(j)
+        merged = (a[0] & b[0], a[1] | b[1])
+        for k, other in alive.items():
+            heapq.heappush(heap, (cost(other, merged) << 40) | (k << 20) | next_key)
+        scored += len(alive)
+        merges += 1
+        alive[next_key] = merged
+        next_key += 1
+
+        # Drop stale entries once they clearly outnumber the live pairs
+        live_pairs = len(alive) * (len(alive) - 1) // 2
+        if len(heap) > 4 * live_pairs + 1024:
+            heap = [e for e in heap if (e >> 20) & 0xFFFFF in alive and e & 0xFFFFF in alive]
+            heapq.heapify(heap)
+
+    if record is not None:
+        record(list(alive.values()))
+    if stats is not None:
+        stats.lap("merging")
+        stats.add("merge_iterations", merges)
+        stats.add("pairs_scored", scored)
+        stats.add("collision_checks", scored)
+        stats.add("stale_heap_entries", stale)
+    return list(alive.values())
+
+def calculate_incremental_masks_filters(selected_ids, unselected_ids, max_filters=1, bits=STD_ID_BITS, weights=None, progress=None, stats=None):
+    """
+    Same contract as calculate_multiple_masks_filters, but each cluster is
+    kept as the running AND/OR of its IDs and merge costs are kept in a
+    priority queue, so large selections finish in a fraction of a second.
+    Ties between equally cheap merges may be broken differently.
+
+    Returns:
+       results: List of tuples (mask, filter_val)
+       collisions: List of unselected_ids that are wrongly accepted
+    """
+    if stats is not None:
+        stats.start()
+    if not selected_ids:
+        return [], []
+
+    selected_ids = sorted(set(selected_ids))
+    unselected_map = make_id_index(unselected_ids, bits, _integer_weights(weights))
+    if stats is not None:
+        stats.lap("index")
+
+    clusters = _merge_clusters([(sid, sid) for sid in selected_ids], unselected_map, max_filters, bits, progress, stats=stats)
+
+    results = []
+    final_collisions = set()
+    for and_val, or_val in clusters:
+        m, f = cluster_mask_filter(and_val, or_val, bits)
+        results.append((m, f))
+        final_collisions.update(unselected_map.matches(m, f))
+
+    if stats is not None:
+        stats.add("collision_checks", len(clusters))
+        stats.lap("collect")
+    return results, sorted(final_collisions)
+
+def calculate_filter_curve(selected_ids, unselected_ids, max_filters=None, bits=STD_ID_BITS, weights=None, progress=None, stats=None):
+    """
+    Trade-off between the number of mask/filter sets and collisions, from
+    a single run of the incremental engine merged all the way down to one
+    set. Every point is exactly what calculate_incremental_masks_filters
+    returns for a max_filters between its set count and the next larger
+    point's. With `max_filters`, only points with at most that many sets
+    are kept. `stats` is an optional CalcStats.
+
+    Returns:
+       A list of (results, collisions) tuples, most sets (fewest
+       collisions) first
+    """
+    if stats is not None:
+        stats.start()
+    if not selected_ids:
+        return []
+
+    selected_ids = sorted(set(selected_ids))
+    unselected_map = make_id_index(unselected_ids, bits, _integer_weights(weights))
+
+    curve = []
+
+    def record(clusters):
+        if max_filters is not None and len(clusters) > max_filters:
+            return
+        results = []
+        final_collisions = set()
+        for and_val, or_val in clusters:
+            m, f = cluster_mask_filter(and_val, or_val, bits)
+            results.append((m, f))
+            final_collisions.update(unselected_map.matches(m, f))
+        curve.append((results, sorted(final_collisions)))
+
+    if stats is not None:
+        stats.lap("index")
+    _merge_clusters([(sid, sid) for sid in selected_ids], unselected_map, 1, bits, progress, record, stats)
+    return curve
+
+def calculate_exact_masks_filters(selected_ids, unselected_ids, max_filters=1, time_budget=5.0, bits=STD_ID_BITS, weights=None, progress=None, stats=None):
+    """
+    Branch-and-bound search for up to `max_filters` mask/filter pairs that
+    cover `selected_ids` and accept the fewest distinct `unselected_ids`
+    (or the least traffic, given `weights`).
+
+    Selected IDs are assigned one by one to an existing set or a new one;
+    a branch is pruned as soon as the collisions of its partial sets reach
+    the best complete solution (seeded from the incremental engine).
+    The search stops after `time_budget` seconds (None for no limit).
+    `progress(done, total)` reports the seconds spent out of the budget
+    (total is None without a budget). `stats` is an optional CalcStats.
+
+    Returns:
+       results: List of tuples (mask, filter_val)
+       collisions: List of unselected_ids that are wrongly accepted
+       gap: How many fewer collisions (or how much less traffic) an
+            unexplored solution could still reach, 0 when proven optimal
+    """
+    if stats is not None:
+        stats.start()
+    if not selected_ids:
+        return [], [], 0
+
+    max_filters = max(1, max_filters)
+    selected_ids = sorted(set(selected_ids))
+    int_weights = _integer_weights(weights)
+    unselected_map = make_id_index(set(unselected_ids), bits, int_weights)
+    if stats is not None:
+        stats.lap("index")
+
+    def union_set(blocks):
+        id_set = 0
+        for and_val, or_val in blocks:
+            id_set |= unselected_map.match_set(*cluster_mask_filter(and_val, or_val, bits))
+        return id_set
+
+    # Incumbent from the heuristic engine
+    best_results, _ = calculate_incremental_masks_filters(selected_ids, unselected_ids, max_filters, bits, weights)
+    start = time.perf_counter()
+    id_set = 0
+    for m, f in best_results:
+        id_set |= unselected_map.match_set(m, f)
+    best_cost = unselected_map.count_set(id_set)
+    if stats is not None:
+        stats.lap("incumbent")
+
+    deadline = None if time_budget is None else start + time_budget
+    # Stack of (bound, next index, blocks); every unexplored solution lies
+    # below one of these nodes, so their bounds give the optimality gap
+    stack = [(0, 0, ())]
+    visited = 0
+    checks = 0
+    timed_out = False
+
+    while stack and best_cost > 0:
+        visited += 1
+        if visited % 256 == 0:
+            now = time.perf_counter()
+            if deadline is not None and now > deadline:
+                timed_out = True
+                break
+            if progress is not None:
+                progress(now - start, time_budget)
+
+        bound, idx, blocks = stack.pop()
+        if bound >= best_cost:
+            continue
+
+        if idx == len(selected_ids):
+            best_cost = bound
+            best_results = [cluster_mask_filter(a, o, bits) for a, o in blocks]
+            continue
+
+        sid = selected_ids[idx]
+        children = []
+        for pos, (and_val, or_val) in enumerate(blocks):
+            child = blocks[:pos] + ((and_val & sid, or_val | sid),) + blocks[pos + 1:]
+            children.append(child)
+        if len(blocks) < max_filters:
+            children.append(blocks + ((sid, sid),))
+
+        scored = []
+        checks += len(children) * len(blocks) + len(children)
+        for child in children:
+            cost = unselected_map.count_set(union_set(child))
+            if cost < best_cost:
+                scored.append((cost, child))
+        # Cheapest child is explored first
+        scored.sort(key=lambda item: item[0], reverse=True)
+        for cost, child in scored:
+            stack.append((cost, idx + 1, child))
+
+    if stats is not None:
+        stats.lap("search")
+        stats.add("nodes_visited", visited)
+        stats.add("collision_checks", checks)
+
+    gap = 0
+    if timed_out:
+        open_bounds = [bound for bound, _, _ in stack if bound < best_cost]
+        if open_bounds:
+            gap = best_cost - min(open_bounds)
+            if weights is not None:
+                gap /= WEIGHT_SCALE
+
+    final_collisions = set()
+    for m, f in best_results:
+        final_collisions.update(unselected_map.matches(m, f))
+
+    if stats is not None:
+        stats.lap("collect")
+    return best_results, sorted(final_collisions), gap
+
+def _expand_prime(key, on_map, on_set, off_map, bits=STD_ID_BITS, stats=None):
+    """
+    Grows the single-ID cube `key` into a prime implicant. First the
+    nearest IDs of `on_set` are pulled in while the supercube stays clear
+    of the OFF-set, then the remaining mask bits are cleared one at a time,
+    preferring the bit that pulls in the most of `on_set`.
+    Returns the (mask, filter_val) pair of the prime. OFF-set checks are
+    added to `stats` (a CalcStats) if given.
+    """
+    full = (1 << bits) - 1
+    and_val = or_val = key
+    # A supercube that hits the OFF-set keeps hitting it as the cube
+    # grows, so a single pass in distance order is enough
+    others = sorted({other & full for other in on_map.ids_in_set(on_set)}, key=lambda other: (_popcount(other ^ key), other))
+    checks = len(others)
+    for other in others:
+        m, f = cluster_mask_filter(and_val & other, or_val | other, bits)
+        if not off_map.count(m, f):
+            and_val &= other
+            or_val |= other
+
+    mask = cluster_mask_filter(and_val, or_val, bits)[0]
+    while True:
+        best_bit = None
+        best_gain = -1
+        free_bits = mask
+        while free_bits:
+            bit = free_bits & -free_bits
+            free_bits ^= bit
+            cand = mask ^ bit
+            checks += 1
+            if off_map.count(cand, key & cand):
+                continue
+            gain = _popcount(on_map.match_set(cand, key & cand) & on_set)
+            if gain > best_gain:
+                best_gain = gain
+                best_bit = bit
+        if best_bit is None:
+            if stats is not None:
+                stats.add("collision_checks", checks)
+            return mask, key & mask
+        mask ^= best_bit
+
+def calculate_prime_cover_masks_filters(selected_ids, unselected_ids, max_filters=None, bits=STD_ID_BITS, weights=None, progress=None, stats=None):
+    """
+    Treats mask/filter selection as two-level logic minimization: selected
+    IDs are the ON-set, unselected IDs the OFF-set and every unused ID of
+    the ID space is a don't-care. Each uncovered ON-set ID is expanded
+    into a prime implicant (Espresso EXPAND), then a greedy cover is taken
+    and redundant primes are dropped (IRREDUNDANT).
+
+    The cover accepts no unselected ID unless one shares its ID with a
+    selected one. If it needs more than `max_filters` sets, the primes are
+    merged down with the incremental engine (scored by `weights` if given).
+    `progress(done, total)` counts selected IDs covered by EXPAND, then
+    follows the merge. `stats` is an optional CalcStats.
+
+    Returns:
+       results: List of tuples (mask, filter_val)
+       collisions: List of unselected_ids that are wrongly accepted
+    """
+    if stats is not None:
+        stats.start()
+    if not selected_ids:
+        return [], []
+
+    full = (1 << bits) - 1
+    unselected_map = make_id_index(unselected_ids, bits, _integer_weights(weights))
+    on_map = make_id_index(set(selected_ids), bits)
+    # An ID that is both selected and unselected cannot be avoided anyway
+    on_keys = {sid & full for sid in selected_ids}
+    off_map = make_id_index([uid for uid in set(unselected_ids) if uid & full not in on_keys], bits)
+
+    all_on = on_map.match_set(0, 0)
+    if stats is not None:
+        stats.lap("index")
+
+    # EXPAND: one prime per ON-set ID not yet covered
+    primes = {}
+    uncovered = all_on
+    while uncovered:
+        if progress is not None:
+            progress(_popcount(all_on & ~uncovered), _popcount(all_on))
+        key = on_map.ids_in_set(uncovered & -uncovered)[0] & full
+        m, f = _expand_prime(key, on_map, uncovered, off_map, bits, stats)
+        covered = on_map.match_set(m, f)
+        primes[(m, f)] = covered
+        uncovered &= ~covered
+    if stats is not None:
+        stats.lap("expand")
+        stats.add("primes", len(primes))
+
+    # Greedy cover, largest ON-set coverage first
+    cover = []
+    uncovered = all_on
+    while uncovered:
+        pair = max(primes, key=lambda p: _popcount(primes[p] & uncovered))
+        cover.append(pair)
+        uncovered &= ~primes[pair]
+
+    # IRREDUNDANT: drop primes whose ON-set IDs are all covered elsewhere
+    for pair in sorted(cover, key=lambda p: _popcount(primes[p])):
+        rest = 0
+        for other in cover:
+            if other != pair:
+                rest |= primes[other]
+        if primes[pair] & ~rest == 0:
+            cover.remove(pair)
+    if stats is not None:
+        stats.lap("cover")
+
+    if max_filters is not None and len(cover) > max_filters:
+        # A cube is the cluster whose AND is the filter and whose OR also
+        # sets every don't-care bit
+        clusters = [(f, f | (~m & full)) for m, f in cover]
+        merged = _merge_clusters(clusters, unselected_map, max_filters, bits, progress, stats=stats)
+        cover = [cluster_mask_filter(a, o, bits) for a, o in merged]
+
+    final_collisions = set()
+    for m, f in cover:
+        final_collisions.update(unselected_map.matches(m, f))
+
+    if stats is not None:
+        stats.add("collision_checks", len(cover))
+        stats.lap("collect")
+    return cover, sorted(final_collisions)
+
+def _or_all(id_sets):
+    union = 0
+    for id_set in id_sets:
+        union |= id_set
+    return union
+
+
+class _ExcludingIndex:
+    """
+    View of an IdBitmap/SortedIdIndex without the IDs in `excluded` (a set
+    from match_set), for _merge_clusters over a changing selection.
+    """
+
+    def __init__(self, index, excluded):
+        self.index = index
+        self.excluded = excluded
+
+    def __bool__(self):
+        return bool(self.index.match_set(0, 0) & ~self.excluded)
+
+    def count(self, mask, filter_val):
+        return self.index.count_set(self.index.match_set(mask, filter_val) & ~self.excluded)
+
+
+class IncrementalFilterSolver:
+    """
+    Keeps a mask/filter solution up to date while IDs are selected and
+    deselected one at a time, for live results in the GUI.
+
+    `all_ids` are all IDs of one width (selected or not); every ID that is
+    not selected counts as unselected. A newly selected ID joins the set
+    it costs least to grow, or gets a set of its own while fewer than
+    `max_filters` are used. Deselecting an ID re-clusters only the members
+    of the set that held it.
+    """
+
+    def __init__(self, all_ids, max_filters=1, bits=STD_ID_BITS, weights=None):
+        self.bits = bits
+        self.full = (1 << bits) - 1
+        self.max_filters = max(1, max_filters)
+        self.index = make_id_index(all_ids, bits, _integer_weights(weights))
+        self.selected_set = 0
+        # Clusters are [and_val, or_val, members, accepted unselected set]
+        self.clusters = []
+        self.owner = {}
+
+    def _match(self, and_val, or_val):
+        m, f = cluster_mask_filter(and_val, or_val, self.bits)
+        return self.index.match_set(m, f) & ~self.selected_set
+
+    def _union(self, skip=None):
+        id_set = 0
+        for cluster in self.clusters:
+            if cluster is not skip:
+                id_set |= cluster[3]
+        return id_set
+
+    def _assign(self, aggregates, members):
+        """Adds clusters for (and, or) aggregates and hands each member to the first one covering it."""
+        new_clusters = [[and_val, or_val, [], self._match(and_val, or_val)] for and_val, or_val in aggregates]
+        for can_id in members:
+            for cluster in new_clusters:
+                mask = ~(cluster[0] ^ cluster[1]) & self.full
+                if can_id & mask == cluster[0] & mask:
+                    cluster[2].append(can_id)
+                    self.owner[can_id] = cluster
+                    break
+        self.clusters.extend(new_clusters)
+
+    def reset(self, selected_ids):
+        """Replaces the selection and clusters it from scratch."""
+        selected_ids = sorted(set(selected_ids))
+        self.selected_set = 0
+        for sid in selected_ids:
+            self.selected_set |= self.index.match_set(self.full, sid)
+        self.clusters = []
+        self.owner = {}
+        if selected_ids:
+            aggregates = _merge_clusters([(sid, sid) for sid in selected_ids], _ExcludingIndex(self.index, self.selected_set), self.max_filters, self.bits)
+            self._assign(aggregates, selected_ids)
+
+    def add(self, can_id):
+        """Selects `can_id`."""
+        if can_id in self.owner:
+            return
+        id_bit = self.index.match_set(self.full, can_id)
+        self.selected_set |= id_bit
+        for cluster in self.clusters:
+            cluster[3] &= ~id_bit
+
+        count_set = self.index.count_set
+        union = self._union()
+        base = count_set(union)
+
+        # Cheapest set to grow
+        best_extra = None
+        best_cluster = None
+        for cluster in self.clusters:
+            extra = count_set(union | self._match(cluster[0] & can_id, cluster[1] | can_id)) - base
+            if best_extra is None or extra < best_extra:
+                best_extra = extra
+                best_cluster = cluster
+
+        if best_cluster is not None and (best_extra == 0 or len(self.clusters) >= self.max_filters):
+            # At the limit a new set only fits if two others merge instead
+            pair = None
+            if best_extra > 0:
+                for pos, a in enumerate(self.clusters):
+                    for b in self.clusters[pos + 1:]:
+                        extra = count_set(union | self._match(a[0] & b[0], a[1] | b[1])) - base
+                        if extra < best_extra:
+                            best_extra = extra
+                            pair = (a, b)
+            if pair is not None:
+                self._merge(*pair)
+                self._assign([(can_id, can_id)], [can_id])
+                return
+            best_cluster[0] &= can_id
+            best_cluster[1] |= can_id
+            best_cluster[2].append(can_id)
+            best_cluster[3] = self._match(best_cluster[0], best_cluster[1])
+            self.owner[can_id] = best_cluster
+            self._merge_free(best_cluster)
+        else:
+            self._assign([(can_id, can_id)], [can_id])
+
+    def _merge(self, a, b):
+        a[0] &= b[0]
+        a[1] |= b[1]
+        a[2].extend(b[2])
+        a[3] = self._match(a[0], a[1])
+        for can_id in b[2]:
+            self.owner[can_id] = a
+        self.clusters.remove(b)
+
+    def _merge_free(self, cluster):
+        """Merges `cluster` with any set it can join without accepting more IDs."""
+        count_set = self.index.count_set
+        merged = True
+        while merged:
+            merged = False
+            union = self._union()
+            base = count_set(union)
+            for other in self.clusters:
+                if other is not cluster and count_set(union | self._match(cluster[0] & other[0], cluster[1] | other[1])) == base:
+                    self._merge(cluster, other)
+                    merged = True
+                    break
+
+    def remove(self, can_id):
+        """Deselects `can_id`."""
+        cluster = self.owner.pop(can_id, None)
+        if cluster is None:
+            return
+        self.selected_set &= ~self.index.match_set(self.full, can_id)
+        self.clusters.remove(cluster)
+        members = [m for m in cluster[2] if m != can_id]
+        for other in self.clusters:
+            other[3] = self._match(other[0], other[1])
+
+        if members:
+            self._assign(self._split(members, max(1, self.max_filters - len(self.clusters))), members)
+
+    def _split(self, members, budget):
+        """
+        Aggregates for `members` in at most `budget` sets: the shrunk set,
+        cut along single ID bits for as long as a cut accepts fewer IDs.
+        """
+        def aggregate(ids):
+            and_val = or_val = ids[0]
+            for can_id in ids[1:]:
+                and_val &= can_id
+                or_val |= can_id
+            return and_val, or_val
+
+        count_set = self.index.count_set
+        outside = self._union()
+        parts = [members]
+        matches = [self._match(*aggregate(members))]
+        while len(parts) < budget:
+            base = count_set(outside | _or_all(matches))
+            best = None
+            for pos, part in enumerate(parts):
+                rest = outside | _or_all(matches[:pos] + matches[pos + 1:])
+                and_val, or_val = aggregate(part)
+                free_bits = and_val ^ or_val
+                while free_bits:
+                    bit = free_bits & -free_bits
+                    free_bits ^= bit
+                    low = [can_id for can_id in part if not can_id & bit]
+                    high = [can_id for can_id in part if can_id & bit]
+                    low_match = self._match(*aggregate(low))
+                    high_match = self._match(*aggregate(high))
+                    cost = count_set(rest | low_match | high_match)
+                    if cost < base and (best is None or cost < best[0]):
+                        best = (cost, pos, low, high, low_match, high_match)
+            if best is None:
+                break
+            _, pos, low, high, low_match, high_match = best
+            parts[pos:pos + 1] = [low, high]
+            matches[pos:pos + 1] = [low_match, high_match]
+        return [aggregate(part) for part in parts]
+
+    def selected(self):
+        return sorted(self.owner)
+
+    def results(self):
+        """Returns (results, collisions) like the other engines."""
+        results = [cluster_mask_filter(and_val, or_val, self.bits) for and_val, or_val, _, _ in self.clusters]
+        return results, sorted(self.index.ids_in_set(self._union()))
+
+class AcceptanceTable:
+    """
+    A mask/filter result set compiled for classifying received IDs.
+
+    11-bit sets become a dense 2048-entry table holding, for every ID, the
+    number of the first set that accepts it (0 = rejected). 29-bit sets are
+    grouped by mask into {filter: set number} dicts, so an ID costs one
+    dict lookup per distinct mask. Like a hardware filter bank, a frame
+    accepted by several sets is credited to the first one.
+    """
+
+    def __init__(self, results, bits=STD_ID_BITS):
+        self.results = list(results)
+        self.bits = bits
+        self.full = (1 << bits) - 1
+        self.table = None
+        self.by_mask = {}
+        for number, (mask, filter_val) in enumerate(self.results, 1):
+            filters = self.by_mask.setdefault(mask & self.full, {})
+            filters.setdefault(filter_val & mask & self.full, number)
+
+        if bits <= STD_ID_BITS:
+            self.table = array('H', bytes(2 << bits))
+            for number in range(len(self.results), 0, -1):
+                mask, filter_val = self.results[number - 1]
+                for key in _set_positions(_cube_bitmap(mask & self.full, filter_val & mask & self.full, bits)):
+                    self.table[key] = number
+
+    def match(self, can_id):
+        """Number of the first set accepting `can_id` (1-based), 0 if none does."""
+        if self.table is not None:
+            return self.table[can_id & self.full]
+        can_id &= self.full
+        number = 0
+        for mask, filters in self.by_mask.items():
+            found = filters.get(can_id & mask)
+            if found and (not number or found < number):
+                number = found
+        return number
+
+    def accepts(self, can_id):
+        return self.match(can_id) != 0
+
+    def classify(self, ids):
+        """
+        Classifies a whole stream of IDs (any iterable, or a numpy array).
+
+        Returns (codes, hits): codes holds the match() value of every ID in
+        order (an array('H'), or a numpy array for numpy input), hits the
+        number of IDs credited to each set.
+        """
+        if hasattr(ids, "dtype"):
+            return self._classify_numpy(ids)
+
+        # Logs repeat a few hundred distinct IDs, so each is matched once
+        counts = Counter(ids)
+        lookup = {can_id: self.match(can_id) for can_id in counts}
+        hits = [0] * (len(self.results) + 1)
+        for can_id, count in counts.items():
+            hits[lookup[can_id]] += count
+        codes = array('H', map(lookup.__getitem__, ids))
+        return codes, hits[1:]
+
+    def _classify_numpy(self, ids):
+        import numpy
+
+        if self.table is not None:
+            codes = numpy.frombuffer(self.table, dtype=numpy.uint16)[ids & self.full]
+        else:
+            distinct, inverse = numpy.unique(ids, return_inverse=True)
+            distinct_codes = numpy.fromiter((self.match(int(can_id)) for can_id in distinct), dtype=numpy.uint16, count=len(distinct))
+            codes = distinct_codes[inverse]
+        hits = numpy.bincount(codes, minlength=len(self.results) + 1)[1:]
+        return codes, [int(count) for count in hits]
+
+
+def compile_acceptance_table(results, bits=STD_ID_BITS):
+    """Compiles (mask, filter_val) pairs from any engine into an AcceptanceTable."""
+    return AcceptanceTable(results, bits)
+
+ENGINES = ("incremental", "prime_cover", "greedy", "exact", "refine")
+
+def run_engine(engine, selected_ids, unselected_ids, max_filters=1, bits=STD_ID_BITS, time_budget=5.0, weights=None, progress=None, stats=None,
+               workers=None, seed=None):
+    """
+    Runs one of ENGINES by name. Returns (results, collisions, gap), where
+    gap is None for every engine but "exact". `time_budget` bounds the
+    "exact" and "refine" engines. `progress(done, total)` is called while
+    the engine runs and may raise CalculationCancelled. `stats` is an
+    optional CalcStats filled in by the engine. `workers` is the number of
+    processes of the "refine" engine (all CPUs when None); pass 1 when the
+    caller already runs in a worker process. With a `seed`, "refine" runs
+    all its annealing steps and ignores `time_budget`, so the result is
+    reproducible; without one it uses seed 0 within the budget.
+    """
+    if engine == "exact":
+        return calculate_exact_masks_filters(selected_ids, unselected_ids, max_filters, time_budget, bits, weights, progress, stats)
+    if engine == "refine":
+        # filter_refine builds on this module
+        from filter_refine import refine_masks_filters
+        if seed is None:
+            results, collisions = refine_masks_filters(selected_ids, unselected_ids, max_filters, bits, weights, time_budget,
+                                                       workers=workers, progress=progress, stats=stats)
+        else:
+            results, collisions = refine_masks_filters(selected_ids, unselected_ids, max_filters, bits, weights,
+                                                       workers=workers, seed=seed, progress=progress, stats=stats)
+        return results, collisions, None
+    if engine == "prime_cover":
+        results, collisions = calculate_prime_cover_masks_filters(selected_ids, unselected_ids, max_filters, bits, weights, progress, stats)
+    elif engine == "greedy":
+        results, collisions = calculate_multiple_masks_filters(selected_ids, unselected_ids, max_filters, bits, weights, progress, stats)
+    elif engine == "incremental":
+        results, collisions = calculate_incremental_masks_filters(selected_ids, unselected_ids, max_filters, bits, weights, progress, stats)
+    else:
+        raise ValueError(f"Unknown engine: {engine}")
+    return results, collisions, None
+
+def format_hex_bin(value, bits=STD_ID_BITS):
+    return f"0x{value:0{(bits + 3) // 4}X} (bin: {value:0{bits}b})"
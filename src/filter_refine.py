@@ -0,0 +1,340 @@
+"""
+Local-search refinement of the incremental engine's mask/filter sets.
+
+The greedy merge commits to the cheapest merge at every step and breaks
+ties by ID order, so with a tight max_filters it often ends in a poor
+local optimum. Every restart here starts from a greedy run (the first one
+on sorted IDs, the others on shuffled IDs, which breaks ties differently)
+and improves it by simulated annealing over two moves:
+
+    move    one selected ID goes to another set (or a new one)
+    split   a set is split on one of its free bits and the two cheapest
+            sets to join are merged again, keeping the set count
+
+followed by single-ID moves until none lowers the cost. Restarts run in a
+process pool and the best result (fewest collisions or least traffic,
+then fewest sets, then lowest restart number) wins.
+
+Each restart draws from its own generator seeded with (seed, restart) and
+runs its full step count, so without a time budget the result depends only
+on the inputs and `seed`, never on the machine or the number of workers.
+A time budget is an opt-in cap that trades this for a bounded run time.
+
+Does not import tkinter.
+"""
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from filter_calculator import (STD_ID_BITS, _integer_weights, _merge_clusters,
+                               cluster_mask_filter, make_id_index)
+
+DEFAULT_RESTARTS = 8
+# Annealing steps per restart; an optional time budget may stop it earlier
+DEFAULT_STEPS = 20000
+# Share of annealing steps that try a split instead of a single move
+SPLIT_RATE = 0.1
+# Start and end temperature relative to the starting cost
+START_TEMPERATURE = 0.05
+END_TEMPERATURE = 0.0005
+# How often the workers are polled for progress and cancellation (s)
+POLL_INTERVAL = 0.1
+
+
+class _Solution:
+    """
+    Selected IDs split into sets, with the (AND, OR) aggregate and the
+    accepted unselected IDs (a match_set bitmap) of every set.
+    """
+
+    __slots__ = ("index", "bits", "members", "aggregates", "id_sets", "checks")
+
+    def __init__(self, index, bits, members):
+        self.index = index
+        self.bits = bits
+        self.members = []
+        self.aggregates = []
+        self.id_sets = []
+        self.checks = 0
+        for ids in members:
+            self.members.append(list(ids))
+            aggregate = self.aggregate(ids)
+            self.aggregates.append(aggregate)
+            self.id_sets.append(self.match_set(aggregate))
+
+    @staticmethod
+    def aggregate(ids):
+        and_val = or_val = ids[0]
+        for can_id in ids[1:]:
+            and_val &= can_id
+            or_val |= can_id
+        return and_val, or_val
+
+    def match_set(self, aggregate):
+        self.checks += 1
+        return self.index.match_set(*cluster_mask_filter(aggregate[0], aggregate[1], self.bits))
+
+    def cost(self, id_sets=None):
+        union = 0
+        for id_set in self.id_sets if id_sets is None else id_sets:
+            union |= id_set
+        return self.index.count_set(union)
+
+    def key(self, cost):
+        return cost, len(self.members)
+
+    def results(self):
+        return [cluster_mask_filter(and_val, or_val, self.bits) for and_val, or_val in self.aggregates]
+
+    def try_move(self, src, pos, dst):
+        """
+        Cost after moving members[src][pos] to set `dst` (len(members) for
+        a new set), with what apply_move needs to make it.
+        """
+        can_id = self.members[src][pos]
+        rest = self.members[src][:pos] + self.members[src][pos + 1:]
+        src_aggregate = self.aggregate(rest) if rest else None
+        src_set = self.match_set(src_aggregate) if rest else 0
+        if dst == len(self.members):
+            dst_aggregate = (can_id, can_id)
+        else:
+            dst_aggregate = (self.aggregates[dst][0] & can_id, self.aggregates[dst][1] | can_id)
+        dst_set = self.match_set(dst_aggregate)
+
+        id_sets = list(self.id_sets) + [0]
+        id_sets[src] = src_set
+        id_sets[dst] = dst_set
+        return self.cost(id_sets), (src, pos, dst, rest, src_aggregate, src_set, dst_aggregate, dst_set)
+
+    def apply_move(self, move):
+        src, pos, dst, rest, src_aggregate, src_set, dst_aggregate, dst_set = move
+        can_id = self.members[src][pos]
+        if dst == len(self.members):
+            self.members.append([])
+            self.aggregates.append(None)
+            self.id_sets.append(0)
+        self.members[dst].append(can_id)
+        self.aggregates[dst] = dst_aggregate
+        self.id_sets[dst] = dst_set
+        if rest:
+            self.members[src] = rest
+            self.aggregates[src] = src_aggregate
+            self.id_sets[src] = src_set
+        else:
+            del self.members[src], self.aggregates[src], self.id_sets[src]
+
+    def try_split(self, target, rng, max_filters):
+        """
+        Splits set `target` on a random bit its IDs disagree on; over
+        `max_filters`, the pair of sets that is cheapest to join is merged.
+        Returns (cost, members) of the new solution, or None.
+        """
+        and_val, or_val = self.aggregates[target]
+        free = and_val ^ or_val
+        if not free:
+            return None
+        bits = [b for b in range(self.bits) if free >> b & 1]
+        bit = 1 << rng.choice(bits)
+        low = [can_id for can_id in self.members[target] if not can_id & bit]
+        high = [can_id for can_id in self.members[target] if can_id & bit]
+        members = self.members[:target] + self.members[target + 1:] + [low, high]
+        aggregates = self.aggregates[:target] + self.aggregates[target + 1:] + [self.aggregate(low), self.aggregate(high)]
+        id_sets = self.id_sets[:target] + self.id_sets[target + 1:] + [self.match_set(aggregates[-2]), self.match_set(aggregates[-1])]
+        if len(members) <= max_filters:
+            return self.cost(id_sets), members
+
+        best = None
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                # The split halves are only joined with other sets
+                if i == len(members) - 2 and j == len(members) - 1:
+                    continue
+                joined = self.match_set((aggregates[i][0] & aggregates[j][0], aggregates[i][1] | aggregates[j][1]))
+                cost = self.cost(id_sets[:i] + id_sets[i + 1:j] + id_sets[j + 1:] + [joined])
+                if best is None or cost < best[0]:
+                    best = (cost, i, j)
+        if best is None:
+            return None
+        cost, i, j = best
+        return cost, members[:i] + members[i + 1:j] + members[j + 1:] + [members[i] + members[j]]
+
+
+def _start_members(selected, index, max_filters, bits, rng):
+    """Sets of a greedy run over `selected` (shuffled by `rng` if given)."""
+    order = list(selected)
+    if rng is not None:
+        rng.shuffle(order)
+    aggregates = _merge_clusters([(sid, sid) for sid in order], index, max_filters, bits)
+    pairs = [cluster_mask_filter(and_val, or_val, bits) for and_val, or_val in aggregates]
+    members = [[] for _ in pairs]
+    for can_id in order:
+        for i, (mask, filter_val) in enumerate(pairs):
+            if can_id & mask == filter_val:
+                members[i].append(can_id)
+                break
+    return [ids for ids in members if ids]
+
+
+def _descend(solution, cost, max_filters, deadline):
+    """Makes improving single-ID moves until none is left. Returns the cost."""
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for src in range(len(solution.members)):
+            for pos in range(len(solution.members[src])):
+                targets = len(solution.members) + (len(solution.members) < max_filters)
+                for dst in range(targets):
+                    if dst == src:
+                        continue
+                    new_cost, move = solution.try_move(src, pos, dst)
+                    new_sets = len(solution.members) - (len(solution.members[src]) == 1) + (dst == len(solution.members))
+                    if (new_cost, new_sets) < solution.key(cost):
+                        solution.apply_move(move)
+                        cost = new_cost
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    return cost
+
+
+def _refine_restart(task):
+    """
+    One restart: greedy start, annealing, descent. Module-level so it can
+    run in a worker process. Returns (cost, sets, restart, results, counters).
+    """
+    selected, unselected, max_filters, bits, int_weights, seed, restart, steps, budget = task
+    deadline = time.perf_counter() + budget
+    rng = random.Random(f"{seed}-{restart}")
+    index = make_id_index(unselected, bits, int_weights)
+    solution = _Solution(index, bits, _start_members(selected, index, max_filters, bits, rng if restart else None))
+    cost = solution.cost()
+    best = (solution.key(cost), [list(ids) for ids in solution.members])
+    start_temperature = max(cost, 1) * START_TEMPERATURE
+    end_temperature = max(cost, 1) * END_TEMPERATURE
+    cooling = (end_temperature / start_temperature) ** (1.0 / max(steps, 1))
+    temperature = start_temperature
+    accepted = 0
+    done = 0
+
+    while done < steps and cost > 0:
+        if done % 256 == 0 and time.perf_counter() > deadline:
+            break
+        done += 1
+        temperature *= cooling
+        count = len(solution.members)
+        if rng.random() < SPLIT_RATE:
+            split = solution.try_split(rng.randrange(count), rng, max_filters)
+            if split is None:
+                continue
+            new_cost, members = split
+            new_sets = len(members)
+            move = None
+        else:
+            src = rng.randrange(count)
+            pos = rng.randrange(len(solution.members[src]))
+            dst = rng.randrange(count + (count < max_filters))
+            if dst == src:
+                continue
+            new_cost, move = solution.try_move(src, pos, dst)
+            new_sets = count - (len(solution.members[src]) == 1) + (dst == count)
+
+        delta = new_cost - cost
+        if (new_cost, new_sets) <= solution.key(cost) or rng.random() < math.exp(-delta / temperature):
+            if move is None:
+                checks = solution.checks
+                solution = _Solution(index, bits, members)
+                solution.checks += checks
+            else:
+                solution.apply_move(move)
+            cost = new_cost
+            accepted += 1
+            if solution.key(cost) < best[0]:
+                best = (solution.key(cost), [list(ids) for ids in solution.members])
+
+    checks = solution.checks
+    solution = _Solution(index, bits, best[1])
+    solution.checks += checks
+    cost = _descend(solution, best[0][0], max_filters, deadline)
+    counters = {"annealing_steps": done, "moves_accepted": accepted, "collision_checks": solution.checks}
+    return cost, len(solution.members), restart, solution.results(), counters
+
+
+def refine_masks_filters(selected_ids, unselected_ids, max_filters=1, bits=STD_ID_BITS, weights=None, time_budget=None,
+                         restarts=DEFAULT_RESTARTS, workers=None, seed=0, steps=DEFAULT_STEPS, progress=None, stats=None):
+    """
+    Same contract as calculate_incremental_masks_filters, but the greedy
+    sets are improved by `restarts` randomized local searches of at most
+    `steps` annealing steps each, spread over `workers` processes (all
+    CPUs when None, none with 1). The result is never worse than the
+    incremental engine's. With `time_budget` None every restart runs all
+    its steps and the result is reproducible for a given `seed` on any
+    machine and worker count; a `time_budget` (seconds) caps the whole run
+    instead, each restart getting budget / restarts, and may then end the
+    search early.
+
+    `progress(done, total)` counts finished restarts; it may raise
+    CalculationCancelled, which abandons the restarts still queued.
+    `stats` is an optional CalcStats.
+
+    Returns:
+       results: List of tuples (mask, filter_val)
+       collisions: List of unselected_ids that are wrongly accepted
+    """
+    if stats is not None:
+        stats.start()
+    if not selected_ids:
+        return [], []
+
+    max_filters = max(1, max_filters)
+    selected_ids = sorted(set(selected_ids))
+    unselected_ids = list(unselected_ids)
+    int_weights = _integer_weights(weights)
+    restarts = max(1, restarts)
+    workers = min(restarts, max(1, workers or os.cpu_count() or 1))
+    # An equal share per restart, so a cap cuts every restart the same way whatever `workers` is
+    budget = float("inf") if time_budget is None else time_budget / restarts
+    tasks = [(selected_ids, unselected_ids, max_filters, bits, int_weights, seed, restart, steps, budget)
+             for restart in range(restarts)]
+
+    outcomes = []
+    if workers == 1:
+        for done, task in enumerate(tasks):
+            if progress is not None:
+                progress(done, restarts)
+            outcomes.append(_refine_restart(task))
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        pending = {pool.submit(_refine_restart, task) for task in tasks}
+        try:
+            while pending:
+                if progress is not None:
+                    progress(len(outcomes), restarts)
+                finished, pending = wait(pending, POLL_INTERVAL, FIRST_COMPLETED)
+                outcomes.extend(future.result() for future in finished)
+        finally:
+            # Cancelled or failed: drop queued restarts, do not wait for running ones
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=not pending)
+    if stats is not None:
+        stats.lap("search")
+
+    cost, _, _, results, _ = min(outcomes, key=lambda outcome: outcome[:3])
+    index = make_id_index(unselected_ids, bits)
+    final_collisions = set()
+    for mask, filter_val in results:
+        final_collisions.update(index.matches(mask, filter_val))
+
+    if stats is not None:
+        stats.add("restarts", restarts)
+        for outcome in outcomes:
+            for name, count in outcome[4].items():
+                stats.add(name, count)
+        stats.add("collision_checks", len(results))
+        stats.lap("collect")
+    return results, sorted(final_collisions)
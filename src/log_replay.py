@@ -0,0 +1,313 @@
+"""
+Replays recorded CAN traffic through computed mask/filter sets to measure
+what they really let through: accepted/rejected frame rates, the load of
+every unwanted ID that passes and the busiest sliding windows.
+
+Traces are read in chunks, so file size does not matter. Supported
+formats:
+    candump  candump -L "(time) can0 123#DATA" and candump -ta
+             "(time) can0 123 [8] DA TA" lines
+    asc      Vector ASCII logs (classic CAN frame lines)
+    csv      a header row with a time and an ID column (hex IDs), plus
+             optional extended, DLC/length or data columns
+
+Does not import tkinter.
+"""
+import csv
+import os
+import re
+
+from bus_load import DEFAULT_DATA_BITRATE, frame_time
+from dbc_model import DEFAULT_BAUD_RATE
+from filter_calculator import EXT_ID_BITS, STD_ID_BITS, STD_ID_MASK, compile_acceptance_table
+
+FORMATS = ("candump", "asc", "csv")
+CHUNK_SIZE = 4 << 20 # Bytes read per chunk
+CSV_ROWS_PER_CHUNK = 50000
+DEFAULT_WINDOW = 0.1 # Seconds
+# Windows slide in steps of window / WINDOW_STEPS
+WINDOW_STEPS = 10
+
+_CANDUMP_LINE = re.compile(
+    rb"^[ \t]*\((\d+(?:\.\d+)?)\)[ \t]+\S+[ \t]+([0-9A-Fa-f]+)(?:#(?:#[0-9A-Fa-f])?([0-9A-Fa-f]*)|[ \t]+\[(\d+)\])",
+    re.M,
+)
+_ASC_LINE = re.compile(
+    rb"^[ \t]*(\d+\.\d+)[ \t]+\d+[ \t]+([0-9A-Fa-f]+)(x?)[ \t]+(?:Rx|Tx)[ \t]+(?:d[ \t]+(\d+)|r)",
+    re.M,
+)
+
+_CSV_TIME = ("time", "timestamp", "time_s", "t")
+_CSV_ID = ("id", "can_id", "arbitration_id", "identifier", "frame_id")
+_CSV_EXTENDED = ("extended", "is_extended", "is_extended_id", "ide")
+_CSV_DLC = ("dlc", "length", "len")
+_CSV_DATA = ("data", "payload")
+
+
+def detect_format(path):
+    """Guesses the trace format from the file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".asc":
+        return "asc"
+    if ext == ".csv":
+        return "csv"
+    return "candump"
+
+
+def _read_chunks(f, chunk_size):
+    """Yields whole lines of a binary file, about chunk_size bytes at a time."""
+    rest = b""
+    while True:
+        block = f.read(chunk_size)
+        if not block:
+            if rest:
+                yield rest
+            return
+        block = rest + block
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            rest = block
+            continue
+        rest = block[cut:]
+        yield block[:cut]
+
+
+def _candump_frames(f, chunk_size):
+    """Lists of (time, frame_id, extended, dlc) per chunk of a candump log."""
+    for chunk in _read_chunks(f, chunk_size):
+        frames = []
+        for ts, ident, data, dlc in _CANDUMP_LINE.findall(chunk):
+            # candump prints extended IDs with 8 digits
+            frames.append((ts, ident, len(ident) > 3, int(dlc) if dlc else len(data) >> 1))
+        yield frames, len(chunk)
+
+
+def _asc_frames(f, chunk_size):
+    """Lists of (time, frame_id, extended, dlc) per chunk of a Vector ASC log."""
+    for chunk in _read_chunks(f, chunk_size):
+        frames = []
+        for ts, ident, x, dlc in _ASC_LINE.findall(chunk):
+            frames.append((ts, ident, x == b"x", int(dlc) if dlc else 0))
+        yield frames, len(chunk)
+
+
+def _csv_column(header, names):
+    for i, name in enumerate(header):
+        if name.strip().lower() in names:
+            return i
+    return None
+
+
+def _csv_frames(f, chunk_size):
+    """Lists of (time, frame_id, extended, dlc) per batch of CSV rows."""
+    lines = (line.decode("utf-8", "replace") for line in f)
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    time_col = _csv_column(header, _CSV_TIME)
+    id_col = _csv_column(header, _CSV_ID)
+    if time_col is None or id_col is None:
+        raise ValueError("CSV trace needs a time and an ID column")
+    ext_col = _csv_column(header, _CSV_EXTENDED)
+    dlc_col = _csv_column(header, _CSV_DLC)
+    data_col = _csv_column(header, _CSV_DATA)
+
+    frames = []
+    size = 0
+    for row in reader:
+        if len(row) <= max(time_col, id_col):
+            continue
+        ident = row[id_col].strip()
+        if ext_col is not None and ext_col < len(row):
+            extended = row[ext_col].strip().lower() in ("1", "true", "x", "yes")
+        else:
+            extended = int(ident, 16) > STD_ID_MASK
+        if dlc_col is not None and dlc_col < len(row) and row[dlc_col].strip():
+            dlc = int(row[dlc_col])
+        elif data_col is not None and data_col < len(row):
+            dlc = len(row[data_col].replace(" ", "")) >> 1
+        else:
+            dlc = 0
+        frames.append((row[time_col], ident, extended, dlc))
+        size += sum(len(cell) + 1 for cell in row)
+        if len(frames) >= CSV_ROWS_PER_CHUNK:
+            yield frames, size
+            frames = []
+            size = 0
+    if frames:
+        yield frames, size
+
+
+_READERS = {
+    "candump": _candump_frames,
+    "asc": _asc_frames,
+    "csv": _csv_frames,
+}
+
+
+class _WindowPeak:
+    """Highest frame count in any window of WINDOW_STEPS consecutive buckets."""
+
+    def __init__(self):
+        self.buckets = [0] * WINDOW_STEPS
+        self.total = 0
+        self.peak = 0
+
+    def close(self, count, skipped):
+        """Adds a finished bucket, then the `skipped` empty ones that follow it."""
+        self.total += count - self.buckets.pop(0)
+        self.buckets.append(count)
+        if self.total > self.peak:
+            self.peak = self.total
+        for _ in range(min(skipped, WINDOW_STEPS)):
+            self.total -= self.buckets.pop(0)
+            self.buckets.append(0)
+
+
+def replay_log(path, std_results, ext_results, selected_ids, fmt=None, window=DEFAULT_WINDOW, bitrate=DEFAULT_BAUD_RATE,
+               data_bitrate=DEFAULT_DATA_BITRATE, stuffing="worst", chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Streams a trace through the mask/filter sets `std_results` (11-bit) and
+    `ext_results` (29-bit). Frames whose (frame_id, extended) key is not in
+    `selected_ids` but pass a filter are unwanted. `progress(bytes_read, file_size)` may raise
+    CalculationCancelled. The unwanted bus load uses the bus_load frame
+    model with `bitrate`, `data_bitrate` and `stuffing`; frames with more
+    than 8 data bytes count as CAN FD.
+
+    Returns a dict with frame counts and rates (accepted, rejected,
+    unwanted), the peak accepted and unwanted frames in any `window`
+    seconds, hits per filter set and the unwanted IDs with their load,
+    busiest first.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in _READERS:
+        raise ValueError(f"Unknown trace format: {fmt}")
+    tables = {
+        False: compile_acceptance_table(std_results, STD_ID_BITS),
+        True: compile_acceptance_table(ext_results, EXT_ID_BITS),
+    }
+    selected_ids = set(selected_ids)
+    file_size = os.path.getsize(path)
+
+    # Per raw ID token: [set number, frames, payload bytes, frame_id, extended, unwanted, {dlc: frames} if unwanted]
+    ids = {}
+    scale = WINDOW_STEPS / window
+    accepted_peak = _WindowPeak()
+    unwanted_peak = _WindowPeak()
+    bucket = None
+    accepted_in_bucket = 0
+    unwanted_in_bucket = 0
+    first_ts = None
+    last_ts = None
+    bytes_read = 0
+
+    with open(path, "rb") as f:
+        for frames, chunk_bytes in _READERS[fmt](f, chunk_size):
+            bytes_read += chunk_bytes
+            if progress is not None:
+                progress(bytes_read, file_size)
+            if not frames:
+                continue
+            if first_ts is None:
+                first_ts = float(frames[0][0])
+            last_ts = float(frames[-1][0])
+
+            for ts, ident, extended, dlc in frames:
+                key = (ident, extended)
+                info = ids.get(key)
+                if info is None:
+                    frame_id = int(ident, 16)
+                    number = tables[extended].match(frame_id)
+                    is_unwanted = bool(number) and (frame_id, extended) not in selected_ids
+                    info = ids[key] = [number, 0, 0, frame_id, extended, is_unwanted, {} if is_unwanted else None]
+                info[1] += 1
+                info[2] += dlc
+                if info[0]:
+                    b = int(float(ts) * scale)
+                    if b != bucket:
+                        if bucket is not None and b > bucket:
+                            accepted_peak.close(accepted_in_bucket, b - bucket - 1)
+                            unwanted_peak.close(unwanted_in_bucket, b - bucket - 1)
+                            accepted_in_bucket = 0
+                            unwanted_in_bucket = 0
+                        # Out of order timestamps stay in the current bucket
+                        if bucket is None or b > bucket:
+                            bucket = b
+                    accepted_in_bucket += 1
+                    if info[5]:
+                        unwanted_in_bucket += 1
+                        info[6][dlc] = info[6].get(dlc, 0) + 1
+
+    if bucket is not None:
+        accepted_peak.close(accepted_in_bucket, 0)
+        unwanted_peak.close(unwanted_in_bucket, 0)
+
+    duration = (last_ts - first_ts) if first_ts is not None else 0.0
+    per_sec = (1.0 / duration) if duration > 0 else 0.0
+
+    total = accepted = unwanted = 0
+    unwanted_busy = 0.0
+    set_hits = {"standard": [0] * len(std_results), "extended": [0] * len(ext_results)}
+    unwanted_ids = []
+    for number, frames, payload, frame_id, extended, is_unwanted, lengths in ids.values():
+        total += frames
+        if not number:
+            continue
+        accepted += frames
+        set_hits["extended" if extended else "standard"][number - 1] += frames
+        if is_unwanted:
+            busy = sum(count * frame_time(frame_id, extended, length, length > 8, bitrate, data_bitrate, stuffing)
+                       for length, count in lengths.items())
+            unwanted += frames
+            unwanted_busy += busy
+            unwanted_ids.append({
+                "id": f"0x{frame_id:X}",
+                "extended": extended,
+                "frames": frames,
+                "frames_per_sec": frames * per_sec,
+                "bytes_per_sec": payload * per_sec,
+                "bus_load_percent": busy * per_sec * 100.0,
+            })
+    unwanted_ids.sort(key=lambda item: item["frames"], reverse=True)
+
+    return {
+        "format": fmt,
+        "frames": total,
+        "duration_s": duration,
+        "accepted": accepted,
+        "rejected": total - accepted,
+        "unwanted_accepted": unwanted,
+        "accepted_per_sec": accepted * per_sec,
+        "rejected_per_sec": (total - accepted) * per_sec,
+        "unwanted_per_sec": unwanted * per_sec,
+        "unwanted_bus_load_percent": unwanted_busy * per_sec * 100.0,
+        "window_s": window,
+        "peak_accepted_in_window": accepted_peak.peak,
+        "peak_unwanted_in_window": unwanted_peak.peak,
+        "set_hits": set_hits,
+        "unwanted_ids": unwanted_ids,
+    }
+
+
+def format_replay_report(report):
+    """Plain-text summary of a replay_log result for the GUI."""
+    lines = [
+        f"Replayed {report['frames']} frames over {report['duration_s']:.2f} s ({report['format']})",
+        "",
+        f"Accepted: {report['accepted']} ({report['accepted_per_sec']:.1f} frames/s)",
+        f"Rejected: {report['rejected']} ({report['rejected_per_sec']:.1f} frames/s)",
+        f"Unwanted accepted: {report['unwanted_accepted']} ({report['unwanted_per_sec']:.1f} frames/s, "
+        f"bus load {report['unwanted_bus_load_percent']:.2f} %)",
+        f"Peak in {report['window_s'] * 1000:.0f} ms: {report['peak_accepted_in_window']} accepted, "
+        f"{report['peak_unwanted_in_window']} unwanted",
+    ]
+    for label, hits in report["set_hits"].items():
+        if hits:
+            lines.append(f"{label.capitalize()} set hits: " + ", ".join(f"Set {i + 1}: {n}" for i, n in enumerate(hits)))
+    if report["unwanted_ids"]:
+        lines += ["", "Unwanted IDs passing the filters:"]
+        for item in report["unwanted_ids"]:
+            lines.append(f"  {item['id']}: {item['frames']} frames, {item['frames_per_sec']:.1f} frames/s, "
+                         f"{item['bytes_per_sec']:.1f} B/s, bus load {item['bus_load_percent']:.2f} %")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,195 @@
+"""
+Incremental view of a MessageTable in a ttk.Treeview.
+
+Rows are inserted once and then only detached and reattached
+(Treeview.set_children) when the visible set changes, so filtering a
+large DBC does not recreate thousands of items. Nodes of large tables
+start collapsed and their message rows are inserted the first time
+they are opened.
+"""
+
+# Tables with more messages than this start with collapsed nodes
+LAZY_FILL_ROWS = 1000
+
+CHECKED = "☑"
+UNCHECKED = "☐"
+MIXED = "☒"
+
+
+class MessageTreeView:
+    """
+    Keeps `tree` in sync with a {NodeName: [table row, ...]} structure.
+    `checked_ids` is the selection set of message keys, (frame_id,
+    extended), owned by the app; it is read, never replaced.
+    """
+
+    def __init__(self, tree, checked_ids, lazy_fill_rows=LAZY_FILL_ROWS):
+        self.tree = tree
+        self.checked_ids = checked_ids
+        self.lazy_fill_rows = lazy_fill_rows
+        self.table = None
+        self.node_order = []
+        self.visible = {} # {node: [rows]} currently shown
+        self.iid_row = {} # {message iid: table row}
+        self.iids_of_key = {} # {message key: [message iids]}, one per sender node
+        self.inserted = {} # {node: set of inserted message iids}, only for filled nodes
+        self.shown_checked = {} # {message iid: check state last written}
+
+    def load(self, table):
+        """Drops every item and shows all messages of `table`."""
+        self.tree.delete(*self.tree.get_children())
+        self.table = table
+        self.node_order = sorted(table.node_rows)
+        self.visible = {}
+        self.iid_row = {}
+        self.iids_of_key = {}
+        self.inserted = {}
+        self.shown_checked = {}
+
+        start_open = len(table) <= self.lazy_fill_rows
+        for node in self.node_order:
+            self.tree.insert("", "end", iid=self.node_iid(node), values=("", "", "", "", "", ""), open=start_open, tags=('node_row',))
+            for row in table.node_rows[node]:
+                iid = self.row_iid(node, row)
+                self.iid_row[iid] = row
+                self.iids_of_key.setdefault(table.key(row), []).append(iid)
+
+        self.show(table.node_rows)
+
+    @staticmethod
+    def node_iid(node):
+        return f"NODE_{node}"
+
+    def row_iid(self, node, row):
+        """
+        str(frame_id) under the first sender, frame_id@node under the others;
+        extended frames get an "x" after the ID.
+        """
+        mid = f"{self.table.frame_ids[row]}x" if self.table.extended[row] else str(self.table.frame_ids[row])
+        if self.table.node_names[self.table.node_index[row]] == node:
+            return mid
+        return f"{mid}@{node}"
+
+    def node_of(self, item_id):
+        """Node name of a node iid, None for anything else."""
+        if item_id.startswith("NODE_"):
+            return item_id[5:]
+        return None
+
+    def key(self, item_id):
+        """Message key (frame_id, extended) of a message iid, None for nodes and placeholders."""
+        row = self.iid_row.get(item_id)
+        if row is None:
+            return None
+        return self.table.key(row)
+
+    def show(self, structure, expand=False):
+        """
+        Makes `structure` the visible set. Only nodes that are open (or that
+        were opened before) get their message rows inserted; with `expand`
+        every visible node is opened.
+        """
+        self.visible = structure
+        nodes = [node for node in self.node_order if structure.get(node)]
+        wanted = tuple(self.node_iid(node) for node in nodes)
+        if self.tree.get_children() != wanted:
+            self.tree.set_children("", *wanted)
+
+        for node in nodes:
+            if expand:
+                self.tree.item(self.node_iid(node), open=True)
+            self.sync_node(node)
+
+    def sync_node(self, node):
+        node_iid = self.node_iid(node)
+        rows = self.visible.get(node, [])
+        if node in self.inserted or self.tree.item(node_iid, "open"):
+            self.fill(node)
+        elif not self.tree.get_children(node_iid):
+            # Unfilled node: a placeholder child keeps the expand arrow
+            self.tree.insert(node_iid, "end", iid=f"PENDING_{node}", values=("", "", "", "", "", ""))
+        self.refresh_node(node)
+
+    def fill(self, node):
+        """Inserts the missing visible rows of `node` and reorders its children."""
+        node_iid = self.node_iid(node)
+        table = self.table
+        inserted = self.inserted.get(node)
+        if inserted is None:
+            inserted = self.inserted[node] = set()
+            pending = f"PENDING_{node}"
+            if self.tree.exists(pending):
+                self.tree.delete(pending)
+
+        wanted = []
+        for row in self.visible.get(node, []):
+            iid = self.row_iid(node, row)
+            if iid not in inserted:
+                is_checked = table.key(row) in self.checked_ids
+                self.tree.insert(node_iid, "end", iid=iid, values=(CHECKED if is_checked else UNCHECKED,) + table.row_values[row], tags=('checked',) if is_checked else ())
+                self.shown_checked[iid] = is_checked
+                inserted.add(iid)
+            wanted.append(iid)
+
+        wanted = tuple(wanted)
+        if self.tree.get_children(node_iid) != wanted:
+            self.tree.set_children(node_iid, *wanted)
+
+    def on_open(self, event=None):
+        """<<TreeviewOpen>> handler: fills a node the first time it is expanded."""
+        node = self.node_of(self.tree.focus())
+        if node is not None and node not in self.inserted:
+            self.fill(node)
+            self.refresh_node(node)
+
+    def visible_keys(self, node=None):
+        """Message keys shown under `node`, or under every visible node."""
+        if self.table is None:
+            return []
+        nodes = [node] if node is not None else self.visible
+        return [self.table.key(row) for n in nodes for row in self.visible.get(n, [])]
+
+    def refresh_row(self, item_id):
+        """Rewrites the check mark of one message row if it is out of date."""
+        row = self.iid_row.get(item_id)
+        if row is None or not self.tree.exists(item_id):
+            return
+        is_checked = self.table.key(row) in self.checked_ids
+        if self.shown_checked.get(item_id) == is_checked:
+            return
+        self.shown_checked[item_id] = is_checked
+        self.tree.item(item_id, values=(CHECKED if is_checked else UNCHECKED,) + self.table.row_values[row], tags=('checked',) if is_checked else ())
+
+    def refresh_key(self, key):
+        """Refreshes every row of a message and the nodes that show it."""
+        for iid in self.iids_of_key.get(key, []):
+            self.refresh_row(iid)
+            node = iid.partition("@")[2] or self.table.node_names[self.table.node_index[self.iid_row[iid]]]
+            if self.visible.get(node):
+                self.refresh_node(node, rows=False)
+
+    def refresh_node(self, node, rows=True):
+        """Updates the node header (check state, count, Bytes/s) and, with `rows`, its message rows."""
+        table = self.table
+        visible_rows = self.visible.get(node, [])
+        child_keys = [table.key(r) for r in visible_rows]
+        all_checked = all(key in self.checked_ids for key in child_keys)
+        any_checked = any(key in self.checked_ids for key in child_keys)
+
+        node_check = UNCHECKED
+        if all_checked and child_keys:
+            node_check = CHECKED
+        elif any_checked:
+            node_check = MIXED
+
+        node_bytes_per_sec = sum(table.bytes_per_sec[r] for r in visible_rows)
+        node_s_str = f"{node_bytes_per_sec:.1f}" if node_bytes_per_sec > 0 else "-"
+        self.tree.item(self.node_iid(node), values=(node_check, "", f"Node: {node} ({len(visible_rows)} msgs)", "", "", node_s_str))
+
+        if rows and node in self.inserted:
+            for row in visible_rows:
+                self.refresh_row(self.row_iid(node, row))
+
+    def refresh_all(self):
+        for node in self.visible:
+            self.refresh_node(node)
@@ -0,0 +1,197 @@
+"""
+Mask/filter plans for every receiving node (ECU) of a bus in one run.
+
+A node's RX set is every message with a signal it receives (see
+dbc_model.build_receiver_structure); all other messages of the same ID
+width count as unselected. The ID-space structures are built once per ID
+width and shared by all nodes: the incremental engine reuses one
+IncrementalFilterSolver per width, the other engines run one node per
+worker process and build each worker's ID lists once.
+
+Does not import tkinter.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from dbc_model import build_receiver_structure, traffic_weights
+from filter_calculator import EXT_ID_BITS, STD_ID_BITS, IncrementalFilterSolver, run_engine
+
+# (label, bits, extended) of the ID groups every node is planned for
+ID_GROUPS = (("standard", STD_ID_BITS, False), ("extended", EXT_ID_BITS, True))
+# How often the workers are polled for progress and cancellation (s)
+POLL_INTERVAL = 0.1
+
+# Set in every worker process by _init_worker: ({bits: all IDs}, {bits: weights})
+_shared = None
+
+
+def node_rx_sets(messages, nodes=None):
+    """{node: {bits: sorted RX IDs}} for `nodes` (every receiving node when None)."""
+    receiver_structure = build_receiver_structure(messages)
+    rx_sets = {}
+    for node in sorted(receiver_structure) if nodes is None else nodes:
+        msgs = receiver_structure.get(node, [])
+        rx_sets[node] = {
+            bits: sorted({msg.frame_id for msg in msgs if msg.is_extended_frame == extended})
+            for _, bits, extended in ID_GROUPS
+        }
+    return rx_sets
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def _plan_task(task):
+    """Filters of one (node, ID width); module-level so it can run in a worker process."""
+    node, bits, selected, engine, max_filters, time_budget, seed = task
+    all_ids, weights = _shared
+    selected_set = set(selected)
+    unselected = [can_id for can_id in all_ids[bits] if can_id not in selected_set]
+    # Nodes are already spread over the processes
+    results, collisions, gap = run_engine(engine, selected, unselected, max_filters, bits, time_budget, weights[bits], workers=1, seed=seed)
+    return node, bits, results, collisions, gap
+
+
+def plan_all_nodes(messages, engine="incremental", max_filters=1, time_budget=5.0, objective="collisions", nodes=None,
+                   workers=None, progress=None, seed=None):
+    """
+    Runs `engine` for the RX set of every node in `nodes` (all receiving
+    nodes when None). Engines other than "incremental" run on `workers`
+    processes (all CPUs when None). `progress(done, total)` counts planned
+    (node, ID width) pairs and may raise CalculationCancelled. `seed` goes
+    to the refine engine (see run_engine).
+
+    Returns a dict with engine, max_filters, objective and nodes (in name
+    order, each with node, rx_messages, sets_used, collisions and groups:
+    {label: {bits, selected, results, collisions, gap}} for every ID width
+    the node receives).
+    """
+    rx_sets = node_rx_sets(messages, nodes)
+    weights = {bits: traffic_weights(messages, objective, extended) for _, bits, extended in ID_GROUPS}
+    all_ids = {bits: [msg.frame_id for msg in messages if msg.is_extended_frame == extended] for _, bits, extended in ID_GROUPS}
+    tasks = [(node, bits, ids, engine, max_filters, time_budget, seed) for node, by_bits in rx_sets.items()
+             for bits, ids in by_bits.items() if ids]
+
+    outcomes = []
+    if engine == "incremental":
+        # One ID-space index per width, re-clustered for every node
+        solvers = {}
+        for done, (node, bits, selected, _, _, _, _) in enumerate(tasks):
+            if progress is not None:
+                progress(done, len(tasks))
+            if bits not in solvers:
+                solvers[bits] = IncrementalFilterSolver(all_ids[bits], max_filters, bits, weights[bits])
+            solvers[bits].reset(selected)
+            results, collisions = solvers[bits].results()
+            outcomes.append((node, bits, results, collisions, None))
+    else:
+        workers = min(len(tasks), max(1, workers or os.cpu_count() or 1))
+        if workers <= 1:
+            _init_worker((all_ids, weights))
+            for done, task in enumerate(tasks):
+                if progress is not None:
+                    progress(done, len(tasks))
+                outcomes.append(_plan_task(task))
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=((all_ids, weights),))
+            pending = {pool.submit(_plan_task, task) for task in tasks}
+            try:
+                while pending:
+                    if progress is not None:
+                        progress(len(outcomes), len(tasks))
+                    finished, pending = wait(pending, POLL_INTERVAL, FIRST_COMPLETED)
+                    outcomes.extend(future.result() for future in finished)
+            finally:
+                # Cancelled or failed: drop queued nodes, do not wait for running ones
+                for future in pending:
+                    future.cancel()
+                pool.shutdown(wait=not pending)
+
+    by_node = {node: {} for node in rx_sets}
+    for node, bits, results, collisions, gap in outcomes:
+        by_node[node][bits] = (results, collisions, gap)
+
+    plans = []
+    for node, by_bits in rx_sets.items():
+        groups = {}
+        for label, bits, _ in ID_GROUPS:
+            if bits in by_node[node]:
+                results, collisions, gap = by_node[node][bits]
+                groups[label] = {"bits": bits, "selected": by_bits[bits], "results": results, "collisions": collisions, "gap": gap}
+        plans.append({
+            "node": node,
+            "rx_messages": sum(len(ids) for ids in by_bits.values()),
+            "sets_used": sum(len(group["results"]) for group in groups.values()),
+            "collisions": sum(len(group["collisions"]) for group in groups.values()),
+            "groups": groups,
+        })
+
+    return {
+        "engine": engine,
+        "max_filters": max_filters,
+        "objective": objective,
+        "nodes": plans,
+    }
+
+
+def format_node_plans(plan, names=None):
+    """
+    Plain-text summary of a plan_all_nodes result for the GUI: one line per
+    node, then each node's sets. `names` ({(frame_id, extended): name})
+    labels the accepted unselected IDs.
+    """
+    names = names or {}
+    lines = [
+        f"RX filter plans for {len(plan['nodes'])} nodes | Engine: {plan['engine']} | "
+        f"Max Filters: {plan['max_filters']} | Minimize: {plan['objective']}",
+        "",
+        f"{'Node':<24} {'RX msgs':>8} {'Sets':>5} {'Collisions':>11}",
+    ]
+    for node_plan in plan["nodes"]:
+        lines.append(f"{node_plan['node'][:24]:<24} {node_plan['rx_messages']:8d} {node_plan['sets_used']:5d} {node_plan['collisions']:11d}")
+
+    for node_plan in plan["nodes"]:
+        lines += ["", f"{node_plan['node']}:"]
+        for label, group in node_plan["groups"].items():
+            width = (group["bits"] + 3) // 4
+            lines.append(f"  {label.capitalize()} IDs ({group['bits']}-bit): {len(group['selected'])} received")
+            for i, (mask, filter_val) in enumerate(group["results"]):
+                lines.append(f"    Set {i + 1}: Mask 0x{mask:0{width}X}  Filter 0x{filter_val:0{width}X}")
+            if group["collisions"]:
+                extended = group["bits"] == EXT_ID_BITS
+                accepted = ", ".join(f"0x{can_id:X} ({names.get((can_id, extended), '?')})" for can_id in group["collisions"])
+                lines.append(f"    Also accepts: {accepted}")
+    return "\n".join(lines) + "\n"
+
+
+def node_plans_header_text(plan):
+    """
+    Returns the contents of can_node_filters.h: for every node and ID
+    width a set count and a {mask, filter} initializer list.
+    """
+    lines = [
+        "/*",
+        " * can_node_filters.h",
+        " */",
+        "",
+        "#ifndef INC_CAN_NODE_FILTERS_H_",
+        "#define INC_CAN_NODE_FILTERS_H_",
+        "",
+    ]
+
+    for node_plan in plan["nodes"]:
+        lines += ["/*", f" * {node_plan['node']}: {node_plan['rx_messages']} RX messages, "
+                  f"{node_plan['collisions']} unwanted IDs accepted", " */"]
+        for group in node_plan["groups"].values():
+            name = f"CANFILTER_{node_plan['node'].upper()}_{'STD' if group['bits'] == STD_ID_BITS else 'EXT'}"
+            prefix = "".join(c if c.isalnum() or c == '_' else '_' for c in name)
+            width = (group["bits"] + 3) // 4
+            pairs = ", ".join(f"{{0x{mask:0{width}X}, 0x{filter_val:0{width}X}}}" for mask, filter_val in group["results"])
+            lines.append(f"#define {prefix}_COUNT {len(group['results'])}")
+            lines.append(f"#define {prefix}_SETS {{ {pairs} }}")
+        lines.append("")
+
+    lines.append("#endif /* INC_CAN_NODE_FILTERS_H_ */")
+    return "\n".join(lines) + "\n"
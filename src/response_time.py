@@ -0,0 +1,138 @@
+"""
+Worst-case response-time analysis of periodic CAN messages.
+
+Follows the revised analysis of Davis, Burns, Bril and Lukkien (2007) with
+the sufficient test for deadlines no longer than the period:
+
+    w = max(B, C) + sum over hp(m) of ceil((w + J + tau_bit) / T_k) * C_k
+    R = J + w + C
+
+B is the longest lower-priority frame (a frame that already won
+arbitration cannot be preempted), C the worst-case transmission time
+including bit stuffing and hp(m) the periodic messages that win
+arbitration against m. Deadlines equal the cycle time.
+
+Does not import tkinter.
+"""
+import math
+
+from bus_load import DEFAULT_DATA_BITRATE, frame_times
+from dbc_model import DEFAULT_BAUD_RATE
+
+# Tolerance for the fixed-point iteration and ceil() on float times
+_EPSILON = 1e-12
+
+
+def arbitration_key(frame_id, extended):
+    """
+    Sort key in arbitration order: lower wins. A standard frame beats an
+    extended frame with the same base ID (its RTR bit is dominant, the SRR
+    bit of the extended frame is recessive).
+    """
+    if extended:
+        return (frame_id >> 18, 1, frame_id & 0x3FFFF)
+    return (frame_id, 0, 0)
+
+
+def response_times(table, rows=None, bitrate=DEFAULT_BAUD_RATE, data_bitrate=DEFAULT_DATA_BITRATE,
+                   stuffing="worst", jitter=0.0):
+    """
+    Worst-case response times of the MessageTable rows `rows` (all rows
+    when None). Every message of the table takes part in arbitration;
+    messages without a cycle time only count as blocking and are not
+    analysed. `jitter` is the queuing jitter (seconds) of every message.
+
+    Returns a dict with the settings, utilization (periodic traffic),
+    misses, unanalysed (selected messages without a cycle time) and
+    messages in priority order, each with id, name, node, period_ms,
+    transmission_ms, blocking_ms, queuing_ms, response_ms, slack_ms and
+    schedulable. When a message misses its deadline the iteration stops
+    there, so its response time is a lower bound.
+    """
+    n = len(table)
+    order = sorted(range(n), key=lambda r: arbitration_key(table.frame_ids[r], table.extended[r]))
+    times = frame_times(table, order, bitrate, data_bitrate, stuffing)
+    tau = 1.0 / bitrate
+    wanted = set(range(n) if rows is None else rows)
+
+    # blocking[i]: longest frame after position i in arbitration order
+    blocking = [0.0] * n
+    longest = 0.0
+    for i in range(n - 1, -1, -1):
+        blocking[i] = longest
+        longest = max(longest, times[i])
+
+    # Higher-priority periodic load grouped by period: {period: sum of C}
+    hp = {}
+    utilization = 0.0
+    messages = []
+    misses = 0
+    unanalysed = 0
+    for i, row in enumerate(order):
+        cycle_ms = table.cycle_ms[row]
+        c = times[i]
+        if row in wanted:
+            if cycle_ms <= 0:
+                unanalysed += 1
+            else:
+                period = cycle_ms / 1000.0
+                b = blocking[i]
+                start = max(b, c)
+                w = start
+                while True:
+                    if jitter + w + c > period + _EPSILON:
+                        break
+                    new = start
+                    for t, c_sum in hp.items():
+                        new += math.ceil((w + jitter + tau) / t - _EPSILON) * c_sum
+                    if new <= w + _EPSILON:
+                        break
+                    w = new
+                response = jitter + w + c
+                schedulable = response <= period + _EPSILON
+                if not schedulable:
+                    misses += 1
+                messages.append({
+                    "id": f"0x{table.frame_ids[row]:X}",
+                    "name": table.names[row],
+                    "node": table.node_names[table.node_index[row]],
+                    "period_ms": float(cycle_ms),
+                    "transmission_ms": c * 1000.0,
+                    "blocking_ms": b * 1000.0,
+                    "queuing_ms": w * 1000.0,
+                    "response_ms": response * 1000.0,
+                    "slack_ms": (period - response) * 1000.0,
+                    "schedulable": schedulable,
+                })
+        if cycle_ms > 0:
+            period = cycle_ms / 1000.0
+            hp[period] = hp.get(period, 0.0) + c
+            utilization += c / period
+
+    return {
+        "bitrate": bitrate,
+        "data_bitrate": data_bitrate,
+        "stuffing": stuffing,
+        "jitter_ms": jitter * 1000.0,
+        "utilization_percent": utilization * 100.0,
+        "misses": misses,
+        "unanalysed": unanalysed,
+        "messages": messages,
+    }
+
+
+def format_response_times(report):
+    """Plain-text table of a response_times result for the GUI."""
+    lines = [
+        f"Response times @ {report['bitrate'] / 1000:g} kbit/s, {report['stuffing']} bit stuffing, "
+        f"bus utilization {report['utilization_percent']:.1f} %",
+        f"{len(report['messages'])} messages analysed, {report['misses']} deadline misses"
+        + (f", {report['unanalysed']} without cycle time skipped" if report["unanalysed"] else ""),
+        "",
+        f"{'ID':>12} {'Name':<24} {'T (ms)':>8} {'C (ms)':>8} {'Queue':>8} {'R (ms)':>8} {'Slack':>8}",
+    ]
+    for item in report["messages"]:
+        mark = "" if item["schedulable"] else "  MISS"
+        lines.append(f"{item['id']:>12} {item['name'][:24]:<24} {item['period_ms']:8.1f} {item['transmission_ms']:8.3f} "
+                     f"{item['queuing_ms']:8.3f} {item['response_ms']:8.3f} {item['slack_ms']:8.3f}{mark}")
+    return "\n".join(lines) + "\n"
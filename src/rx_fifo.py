@@ -0,0 +1,163 @@
+"""
+Assigns computed filters to the receive FIFOs of a controller so that the
+expected frame rate, including frames of unselected IDs a filter lets
+through, is spread evenly. Filters that accept high-priority IDs can be
+kept on a dedicated FIFO of their own.
+
+A filter is a list of (mask, filter) pairs routed to one FIFO together:
+one engine set, or all entries of a hardware bank. As in hardware, a
+frame accepted by several filters is credited to the first one.
+
+Does not import tkinter.
+"""
+from filter_calculator import EXT_ID_BITS, compile_acceptance_table
+
+DEFAULT_FIFOS = 2
+
+
+def filter_traffic(filters, traffic, selected_ids=()):
+    """
+    Expected frames/s through each of `filters` ([(label, bits, pairs), ...])
+    given `traffic` ({bits: {frame_id: frames/s}}). `selected_ids` holds
+    message keys, (frame_id, extended). Returns a list of (frames/s,
+    collision frames/s, accepted keys) in filter order.
+    """
+    loads = [[0.0, 0.0, []] for _ in filters]
+    for bits, id_rates in traffic.items():
+        owners = []
+        pairs = []
+        for i, (_, filter_bits, filter_pairs) in enumerate(filters):
+            if filter_bits == bits:
+                owners.extend([i] * len(filter_pairs))
+                pairs.extend(filter_pairs)
+        if not pairs:
+            continue
+        table = compile_acceptance_table(pairs, bits)
+        extended = bits == EXT_ID_BITS
+        for frame_id, rate in id_rates.items():
+            number = table.match(frame_id)
+            if not number:
+                continue
+            load = loads[owners[number - 1]]
+            load[0] += rate
+            load[2].append((frame_id, extended))
+            if (frame_id, extended) not in selected_ids:
+                load[1] += rate
+    return [tuple(load) for load in loads]
+
+
+def _balance(items, fifos):
+    """
+    Spreads (load, index) items over the FIFO numbers in `fifos`: largest
+    load first onto the emptiest FIFO, then single moves and swaps while
+    they lower the busiest FIFO. Returns {index: fifo}.
+    """
+    fill = {fifo: 0.0 for fifo in fifos}
+    placed = {}
+    for load, index in sorted(items, reverse=True):
+        fifo = min(fifos, key=lambda f: (fill[f], f))
+        fill[fifo] += load
+        placed[index] = fifo
+    loads = {index: load for load, index in items}
+
+    improved = len(fifos) > 1
+    while improved:
+        improved = False
+        high = max(fifos, key=lambda f: fill[f])
+        low = min(fifos, key=lambda f: fill[f])
+        gap = fill[high] - fill[low]
+        best = None
+        for index, fifo in placed.items():
+            if fifo != high:
+                continue
+            # Move: helps if the filter is lighter than the gap
+            if 0 < loads[index] < gap:
+                delta = abs(gap - 2 * loads[index])
+                if best is None or delta < best[0]:
+                    best = (delta, index, None)
+            for other, other_fifo in placed.items():
+                if other_fifo != low:
+                    continue
+                diff = loads[index] - loads[other]
+                if 0 < diff < gap:
+                    delta = abs(gap - 2 * diff)
+                    if best is None or delta < best[0]:
+                        best = (delta, index, other)
+        if best is not None:
+            _, index, other = best
+            fill[high] -= loads[index]
+            fill[low] += loads[index]
+            placed[index] = low
+            if other is not None:
+                fill[low] -= loads[other]
+                fill[high] += loads[other]
+                placed[other] = high
+            improved = True
+    return placed
+
+
+def assign_fifos(filters, traffic, fifos=DEFAULT_FIFOS, priority_ids=(), selected_ids=()):
+    """
+    Maps each of `filters` ([(label, bits, pairs), ...]) to a FIFO number
+    (0-based), balancing expected frames/s from `traffic` ({bits:
+    {frame_id: frames/s}}). With `priority_ids` and more than one FIFO,
+    every filter accepting one of them goes to FIFO 0 and the rest share
+    the other FIFOs. IDs not in `selected_ids` count as collision traffic;
+    both hold message keys, (frame_id, extended).
+
+    Returns a dict with fifos (per FIFO: fifo, dedicated, filters,
+    frames_per_sec, share_percent) and filters (per filter in input order:
+    filter, fifo, frames_per_sec, collision_frames_per_sec, priority).
+    """
+    if fifos < 1:
+        raise ValueError("At least one FIFO is needed")
+    selected_ids = set(selected_ids)
+    priority_ids = set(priority_ids)
+    loads = filter_traffic(filters, traffic, selected_ids)
+
+    priority = [bool(priority_ids) and any(key in priority_ids for key in accepted) for _, _, accepted in loads]
+    dedicated = fifos > 1 and any(priority)
+    shared = list(range(1, fifos)) if dedicated else list(range(fifos))
+    placed = _balance([(load[0], i) for i, load in enumerate(loads) if not (dedicated and priority[i])], shared)
+    if dedicated:
+        placed.update((i, 0) for i in range(len(filters)) if priority[i])
+
+    total = sum(load[0] for load in loads)
+    fifo_rows = []
+    for fifo in range(fifos):
+        members = [i for i in range(len(filters)) if placed[i] == fifo]
+        rate = sum(loads[i][0] for i in members)
+        fifo_rows.append({
+            "fifo": fifo,
+            "dedicated": dedicated and fifo == 0,
+            "filters": len(members),
+            "frames_per_sec": rate,
+            "share_percent": rate * 100.0 / total if total > 0 else 0.0,
+        })
+
+    return {
+        "fifos": fifo_rows,
+        "filters": [
+            {
+                "filter": label,
+                "fifo": placed[i],
+                "frames_per_sec": loads[i][0],
+                "collision_frames_per_sec": loads[i][1],
+                "priority": priority[i],
+            }
+            for i, (label, _, _) in enumerate(filters)
+        ],
+    }
+
+
+def format_fifo_assignment(assignment):
+    """Plain-text summary of an assign_fifos result for the GUI."""
+    lines = ["RX FIFO assignment:"]
+    for row in assignment["fifos"]:
+        note = " (dedicated to high-priority IDs)" if row["dedicated"] else ""
+        lines.append(f"  FIFO {row['fifo']}: {row['frames_per_sec']:.1f} frames/s ({row['share_percent']:.1f} %), "
+                     f"{row['filters']} filters{note}")
+    for row in assignment["filters"]:
+        collisions = f", {row['collision_frames_per_sec']:.1f} unwanted" if row["collision_frames_per_sec"] else ""
+        lines.append(f"  {row['filter']} -> FIFO {row['fifo']}: {row['frames_per_sec']:.1f} frames/s{collisions}")
+    return "\n".join(lines) + "\n"
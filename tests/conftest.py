@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live flat in src/, as the GUI and CLI import them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
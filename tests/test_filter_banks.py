@@ -0,0 +1,9 @@
+from filter_banks import _GroupPlanner
+from filter_calculator import STD_ID_BITS
+
+
+def test_unwanted_ids_without_traffic_still_cost():
+    planner = _GroupPlanner([0x100], [0x101, 0x102], STD_ID_BITS, [], {0x101: 0.0})
+    assert planner.cost([0x101]) > 0
+    assert planner.cost([0x102]) > 0
+    assert planner.cost([0x101, 0x102]) > planner.cost([0x101])
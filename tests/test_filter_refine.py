@@ -0,0 +1,9 @@
+from filter_refine import refine_masks_filters
+
+SELECTED = [0x101, 0x123, 0x1A5, 0x240, 0x2F3, 0x314, 0x377, 0x455, 0x4C0, 0x5AA, 0x61E, 0x7F0]
+UNSELECTED = [can_id for can_id in range(0x100, 0x800, 7) if can_id not in SELECTED]
+
+
+def test_seeded_result_does_not_depend_on_workers():
+    runs = [refine_masks_filters(SELECTED, UNSELECTED, 3, workers=workers, seed=7, steps=2000) for workers in (1, 4)]
+    assert runs[0] == runs[1]
@@ -0,0 +1,40 @@
+import pytest
+
+from bus_load import frame_time
+from log_replay import replay_log
+
+# Mask 0 accepts every standard ID
+ACCEPT_ALL = [(0x000, 0x000)]
+
+
+def write_candump(path, frames):
+    path.write_text("".join(f"({ts:.6f}) can0 {frame_id:03X}#0011223344556677\n" for ts, frame_id in frames))
+    return str(path)
+
+
+def test_peak_survives_gap_after_burst(tmp_path):
+    # Two adjacent 10 ms buckets with 5 frames each, then a long gap
+    frames = [(0.001 * i, 0x100) for i in range(1, 6)]
+    frames += [(0.010 + 0.001 * i, 0x100) for i in range(1, 6)]
+    frames.append((5.0, 0x100))
+    report = replay_log(write_candump(tmp_path / "burst.log", frames), ACCEPT_ALL, [], {(0x100, False)})
+    assert report["accepted"] == 11
+    assert report["peak_accepted_in_window"] == 10
+
+
+def test_unwanted_frames_are_counted(tmp_path):
+    frames = [(0.001 * i, 0x100 + i % 2) for i in range(10)]
+    report = replay_log(write_candump(tmp_path / "mixed.log", frames), ACCEPT_ALL, [], {(0x100, False)})
+    assert report["unwanted_accepted"] == 5
+    assert report["peak_unwanted_in_window"] == 5
+    assert [item["id"] for item in report["unwanted_ids"]] == ["0x101"]
+
+
+def test_unwanted_load_uses_bus_settings(tmp_path):
+    # 0x101 is unwanted: 5 frames in 0.009 s
+    frames = [(0.001 * i, 0x100 + i % 2) for i in range(10)]
+    path = write_candump(tmp_path / "mixed.log", frames)
+    report = replay_log(path, ACCEPT_ALL, [], {(0x100, False)}, bitrate=250000.0, stuffing="none")
+    expected = 5 * frame_time(0x101, False, 8, False, 250000.0, stuffing="none") / 0.009 * 100.0
+    assert report["unwanted_bus_load_percent"] == pytest.approx(expected)
+    assert report["unwanted_ids"][0]["bus_load_percent"] == pytest.approx(expected)